@@ -44,6 +44,8 @@ from .export_presets import *
 from .export_menu import *
 from .ui_operators import *
 from .packscript_operators import *
+from . import export_cli
+from .update import update_list
 
 import rna_keymap_ui
 
@@ -144,12 +146,76 @@ class CAP_AddonPreferences(AddonPreferences):
         default = True,
     )
 
+    skip_unchanged_exports: BoolProperty(
+        name = "Skip Unchanged Exports",
+        description = "Keeps a record of every export alongside the .blend file, and skips exports whose objects, presets and file path haven't changed since they were last exported.  \n\nThe .blend file must be saved for this to work",
+        default = False,
+    )
+
+    keep_unchanged_files: BoolProperty(
+        name = "Keep Unchanged Files",
+        description = "Exports each file to a temporary folder first, and only replaces the existing file if its contents changed.  Unchanged files keep their modification time, so other tools watching the export folders won't reimport them",
+        default = True,
+    )
+
+    export_without_selecting: BoolProperty(
+        name = "Export Without Selecting",
+        description = "FBX and GLTF exports gather their objects into a temporary collection and export that, instead of selecting and unhiding every object.  Much faster for exports with many objects, but hidden objects that can't be selected will be exported too",
+        default = False,
+    )
+
+    record_manifest: BoolProperty(
+        name = "Record Export Manifest",
+        description = "Keeps a record of every file exported alongside the .blend file, including what it was exported from, its size, contents hash and how long it took.  The record is shown in the Export Manifest panel.  \n\nThe .blend file must be saved for this to work",
+        default = False,
+    )
+
+    prune_exports: EnumProperty(
+        name = "Prune Old Exports",
+        description = "When exporting everything, removes files that earlier exports created but nothing exports anymore, such as those from renamed or untagged objects.  Files are found using the Export Manifest, which is recorded while this is enabled.  \n\nThe .blend file must be saved for this to work",
+        items = [
+            ('OFF', "Off", "Never remove old exported files"),
+            ('QUARANTINE', "Quarantine", "Moves old exported files to a dated folder beside the .blend file"),
+            ('DELETE', "Delete", "Deletes old exported files"),
+            ],
+        default = 'OFF',
+    )
+
+    snapshot_mode: EnumProperty(
+        name = "Scene Snapshot",
+        description = "Defines what Capsule records and prepares in the scene before exporting",
+        items = [
+            ('SCOPED', "Export Targets Only", "Only records and prepares the objects being exported and anything they depend on through parents, constraints and modifiers.  Much faster in large scenes"),
+            ('GLOBAL', "Entire Scene", "Records and prepares every object in the scene.  Use this if your Pack Scripts change objects that aren't part of the export"),
+            ('STAGING', "Staging Scene", "Exports from a temporary scene that only links the objects being exported and anything they depend on, leaving the selection and visibility of your scene alone.  Pack Scripts can only use objects in the staging scene"),
+            ],
+        default = 'SCOPED',
+    )
+
+    profile_exports: BoolProperty(
+        name = "Profile Exports",
+        description = "Times every stage of each export and records operator calls, memory use and file sizes.  The results are saved as JSON and CSV files alongside the exports and shown in the Export Profile panel",
+        default = False,
+    )
+
+    export_workers: IntProperty(
+        name = "Export Workers",
+        description = "The number of background Blender processes exports are split between.  Set to 1 to export everything in this Blender session.  \n\nThe .blend file must be saved with no unsaved changes for workers to be used",
+        default = 1,
+        min = 1,
+        max = 64,
+    )
+
+    export_worker_chunk_size: IntProperty(
+        name = "Worker Chunk Size",
+        description = "The number of exports given to a worker at a time.  Larger chunks reduce the cost of starting new workers, smaller chunks spread the work more evenly",
+        default = 8,
+        min = 1,
+    )
+
 
     data_missing : BoolProperty(default = False)
     plugin_is_ready : BoolProperty(default = False)
-    prev_selected_obj : StringProperty(default= '')
-    prev_selected_obj_count : IntProperty(default= 0)
-    prev_selected_col : StringProperty(default= '')
 
     def draw(self, context):
         layout = self.layout
@@ -396,6 +462,18 @@ class CAP_AddonPreferences(AddonPreferences):
 
             extras_content.prop(addon_prefs, "substitute_directories")
             extras_content.prop(addon_prefs, "use_pack_scripts")
+            extras_content.prop(addon_prefs, "skip_unchanged_exports")
+            extras_content.prop(addon_prefs, "keep_unchanged_files")
+            extras_content.prop(addon_prefs, "export_without_selecting")
+            extras_content.prop(addon_prefs, "record_manifest")
+            extras_content.prop(addon_prefs, "prune_exports")
+            extras_content.prop(addon_prefs, "snapshot_mode")
+            extras_content.prop(addon_prefs, "profile_exports")
+            extras_content.separator()
+
+            worker_options = extras_content.row(align= True)
+            worker_options.prop(addon_prefs, "export_workers")
+            worker_options.prop(addon_prefs, "export_worker_chunk_size")
             extras_content.separator()
             extras_content.separator()
 
@@ -442,27 +520,130 @@ def CreateDefaultData(scene):
 
 
 @persistent
-def CheckSelectedObject(scene):
+def ClearSceneIndexes(*args):
+    """
+    A handler used to clear the stored scene collection indexes, dependency graphs and export list indexes 
+    when a new file is loaded, or an undo step is taken.
+    """
+
+    search_utils.ClearSceneCollectionIndexes()
+    dependencies.ClearDependencyGraphs()
+    update_list.ClearListIndexes()
+
+
+@persistent
+def CheckCollectionChanges(scene, depsgraph):
+    """
+    A scene handler used to clear the stored scene collection indexes when any collections or scenes change.
+    """
+
+    if depsgraph.id_type_updated('COLLECTION') or depsgraph.id_type_updated('SCENE'):
+        search_utils.ClearSceneCollectionIndexes()
+
+
+# How long to wait after a scene update before syncing the selection with the proxy properties, in seconds.
+SELECTION_SYNC_DELAY = 0.1
+
+# The selection that was last synced with the proxy properties, so they're only updated when it changes.
+selection_state = {'active_object': None, 'selected_count': -1, 'active_collection': None}
+
+# The owner of Capsule's message bus subscriptions, so they can be removed together.
+selection_msgbus_owner = object()
+
+
+def QueueSelectionSync(*args):
+    """
+    Schedules the selection to be synced with the proxy properties once things have been quiet for the sync delay.
+    A sync that's already scheduled is pushed back, so a burst of updates ends in a single sync.
+    """
+
+    if bpy.app.timers.is_registered(SyncSelectedObject):
+        bpy.app.timers.unregister(SyncSelectedObject)
+
+    bpy.app.timers.register(SyncSelectedObject, first_interval = SELECTION_SYNC_DELAY)
+
+
+@persistent
+def CheckObjectChanges(scene, depsgraph):
+    """
+    A scene handler used to clear the stored dependency graphs when any objects change, as their modifiers,
+    constraints or parents may now point somewhere else.  The graphs are built again when they're next needed.
+    """
+
+    if dependencies.IsHoldingDependencyGraphs() is False and depsgraph.id_type_updated('OBJECT'):
+        dependencies.ClearDependencyGraphs()
+
+
+@persistent
+def CheckSelectedObject(scene, depsgraph):
     """
     A scene handler used to configure the status of previously selected objects and multi-edit opportunities behind the scenes.
+    This runs on every depsgraph update, so it only schedules the work.  Updates that keep arriving (like every 
+    tick of a transform) keep pushing the sync back until they stop.
     """
 
-    preferences = bpy.context.preferences
-    addon_prefs = preferences.addons[__name__].preferences
-    proxy = bpy.context.scene.CAPProxy
-    #print("SCENE UPDATE")
+    QueueSelectionSync()
+
+
+@persistent
+def SubscribeSelectionChanges(*args):
+    """
+    A handler used to subscribe to active object changes, so the proxy properties follow them straight away.
+    Blender removes these subscriptions whenever a file is loaded, so this is called again on load.
+    """
+
+    bpy.msgbus.clear_by_owner(selection_msgbus_owner)
+    bpy.msgbus.subscribe_rna(
+        key = (bpy.types.LayerObjects, "active"),
+        owner = selection_msgbus_owner,
+        args = (),
+        notify = QueueSelectionSync,
+    )
+
+    selection_state['active_object'] = None
+    selection_state['selected_count'] = -1
+    selection_state['active_collection'] = None
+
+
+def SyncSelectedObject():
+    """
+    A timer used to sync the proxy properties with the current selection.
+    Timers don't have a window, so the first one is borrowed to make the selection context available.
+    """
+
+    windows = bpy.context.window_manager.windows
+    if len(windows) == 0:
+        return None
+
+    with bpy.context.temp_override(window = windows[0]):
+        UpdateSelectionProxy(bpy.context)
+
+    return None
+
+
+def UpdateSelectionProxy(context):
+    """
+    Updates the edit toggles and proxy properties if the active object, the selection or the active collection
+    changed since they were last synced.
+    """
+
+    proxy = context.scene.CAPProxy
+    active_object = context.view_layer.objects.active
+
+    # Counting the selection doesn't build a list of it, which is only needed once something has changed.
+    selected_count = len(context.view_layer.objects.selected)
 
     # If the active selected object changes or anything else about the selection, we need to update the edit toggles
-    if bpy.context.active_object is not None:
-        if bpy.context.active_object.name != addon_prefs.prev_selected_obj or len(bpy.context.selected_objects) != addon_prefs.prev_selected_obj_count:
-            addon_prefs.prev_selected_obj = bpy.context.active_object.name
-            addon_prefs.prev_selected_obj_count = len(bpy.context.selected_objects)
+    if active_object is not None:
+        if active_object.name != selection_state['active_object'] or selected_count != selection_state['selected_count']:
+            selection_state['active_object'] = active_object.name
+            selection_state['selected_count'] = selected_count
 
-            for item in bpy.context.selected_objects:
+            for item in context.view_layer.objects.selected:
                 item.CAPObj.enable_edit = True
             
             # update the proxy objects with the current selection
-            obj = bpy.context.active_object.CAPObj
+            obj = active_object.CAPObj
 
             # Disable updates before editing, enable afterwards
             proxy.disable_updates = True
@@ -476,15 +657,15 @@ def CheckSelectedObject(scene):
 
             proxy.disable_updates = False
     
-    elif len(bpy.context.selected_objects) != addon_prefs.prev_selected_obj_count:
-        addon_prefs.prev_selected_obj_count = len(bpy.context.selected_objects)
+    elif selected_count != selection_state['selected_count']:
+        selection_state['selected_count'] = selected_count
         return
     
     current_col = search_utils.GetActiveCollection() 
     if current_col is not None:
-        if current_col.name != addon_prefs.prev_selected_col:
+        if current_col.name != selection_state['active_collection']:
 
-            addon_prefs.prev_selected_col = current_col.name
+            selection_state['active_collection'] = current_col.name
             col = current_col.CAPCol
             col.enable_edit = True
 
@@ -590,6 +771,7 @@ classes = (
 
     CAPSULE_OT_Clear_List,
     CAPSULE_OT_Refresh_List,
+    CAPSULE_OT_Refresh_Manifest,
     CAPSULE_OT_Reset_Properties,
     CAPSULE_OT_Create_ExportData,
     CAPSULE_OT_Add_Stored_Presets,
@@ -616,6 +798,8 @@ classes = (
     CAPSULE_PT_Selection,
     CAPSULE_PT_List,
     CAPSULE_PT_Location,
+    CAPSULE_PT_Profile,
+    CAPSULE_PT_Manifest,
 
     # init
     CAP_AddonPreferences,
@@ -646,8 +830,17 @@ def register():
     # export_presets.CreatePresets()
     bpy.app.handlers.load_pre.append(CreateDefaultData)
     bpy.app.handlers.depsgraph_update_post.append(CheckSelectedObject)
+    bpy.app.handlers.depsgraph_update_post.append(CheckCollectionChanges)
+    bpy.app.handlers.depsgraph_update_post.append(CheckObjectChanges)
+    bpy.app.handlers.load_post.append(ClearSceneIndexes)
+    bpy.app.handlers.load_post.append(SubscribeSelectionChanges)
+    bpy.app.handlers.undo_post.append(ClearSceneIndexes)
+    bpy.app.handlers.redo_post.append(ClearSceneIndexes)
+
+    SubscribeSelectionChanges()
 
     add_hotkeys()
+    export_cli.RegisterCommand()
 
 
 def unregister():
@@ -656,10 +849,24 @@ def unregister():
     """
 
     remove_hotkeys()
+    export_cli.UnregisterCommand()
     
     # export_presets.DeletePresets()
     bpy.app.handlers.load_pre.remove(CreateDefaultData)
     bpy.app.handlers.depsgraph_update_post.remove(CheckSelectedObject)
+    bpy.app.handlers.depsgraph_update_post.remove(CheckCollectionChanges)
+    bpy.app.handlers.depsgraph_update_post.remove(CheckObjectChanges)
+    bpy.app.handlers.load_post.remove(ClearSceneIndexes)
+    bpy.app.handlers.load_post.remove(SubscribeSelectionChanges)
+    bpy.msgbus.clear_by_owner(selection_msgbus_owner)
+
+    if bpy.app.timers.is_registered(SyncSelectedObject):
+        bpy.app.timers.unregister(SyncSelectedObject)
+
+    bpy.app.handlers.undo_post.remove(ClearSceneIndexes)
+    bpy.app.handlers.redo_post.remove(ClearSceneIndexes)
+    search_utils.ClearSceneCollectionIndexes()
+    dependencies.ClearDependencyGraphs()
 
 
     # Delete custom datablocks
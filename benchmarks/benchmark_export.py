@@ -0,0 +1,401 @@
+# ///////////////////////////////////////////////////////////////////
+# Benchmarks the hot paths of the Capsule export pipeline.
+# ///////////////////////////////////////////////////////////////////
+
+# Generates a scene of the given size and times scene recording and restoring, task building,
+# origin point moves, file path creation and every export format on it.  Run it in background mode
+# with Capsule enabled, and don't save the file afterwards:
+#
+#   blender -b --addons Capsule --python benchmarks/benchmark_export.py --
+#       --objects 5000 --collection-depth 3 --output results.json
+#
+# The results are written as JSON so runs from different versions can be compared.
+
+import bpy, argparse, importlib, json, os, random, shutil, statistics, sys, tempfile, time
+
+from mathutils import Vector
+
+FORMAT_TYPES = ['Alembic', 'Collada', 'FBX', 'GLTF', 'OBJ', 'STL', 'USD']
+
+
+def BuildArgumentParser():
+    """
+    Creates the parser for all benchmark arguments.
+    """
+
+    parser = argparse.ArgumentParser(prog = "benchmark_export",
+        description = "Benchmarks the Capsule export pipeline on a generated scene.")
+
+    parser.add_argument("--package", default = "Capsule", help = "The module name Capsule is installed under.")
+    parser.add_argument("--objects", type = int, default = 1000, help = "The number of mesh objects to generate.")
+    parser.add_argument("--collection-depth", type = int, default = 3, help = "How many levels of collections to generate.")
+    parser.add_argument("--collection-branches", type = int, default = 3, help = "How many child collections each collection has.")
+    parser.add_argument("--parent-ratio", type = float, default = 0.2, help = "The fraction of objects parented to another object.")
+    parser.add_argument("--constraint-density", type = float, default = 0.1, help = "The fraction of objects with a constraint.")
+    parser.add_argument("--modifier-density", type = float, default = 0.2, help = "The fraction of objects with an object-referencing modifier.")
+    parser.add_argument("--armatures", type = int, default = 5, help = "The number of armatures to generate.")
+    parser.add_argument("--bones", type = int, default = 20, help = "The number of bones in each armature.")
+    parser.add_argument("--export-ratio", type = float, default = 0.1, help = "The fraction of objects enabled for export.")
+    parser.add_argument("--origin-ratio", type = float, default = 0.5, help = "The fraction of exported objects using an Object origin point.")
+    parser.add_argument("--formats", nargs = '+', default = FORMAT_TYPES, choices = FORMAT_TYPES, help = "The export formats to time.")
+    parser.add_argument("--format-exports", type = int, default = 5, help = "How many files to export with each format.")
+    parser.add_argument("--repeat", type = int, default = 3, help = "How many times each measurement is repeated.")
+    parser.add_argument("--seed", type = int, default = 0, help = "The random seed used to generate the scene.")
+    parser.add_argument("--output", default = None, help = "The file to write results to.  If not given, they're printed.")
+
+    return parser
+
+
+# ////////////////////////////////////////
+# SCENE GENERATION
+
+def PopulateBenchmarkScene(scene, args):
+    """
+    Fills the given scene with objects, collections, constraints, modifiers and armatures.
+    Must be called with the scene as the context scene.
+    """
+
+    rng = random.Random(args.seed)
+
+    # Build the collection tree
+    collections = [scene.collection]
+    parents = [scene.collection]
+    for depth in range(args.collection_depth):
+        children = []
+        for parent in parents:
+            for branch in range(args.collection_branches):
+                collection = bpy.data.collections.new("Bench Collection %d.%d" % (depth, len(children)))
+                parent.children.link(collection)
+                children.append(collection)
+        collections += children
+        parents = children
+
+    # All objects share one mesh to keep the scene quick to build.
+    mesh = bpy.data.meshes.new("Bench Mesh")
+    mesh.from_pydata([(-1, -1, -1), (1, -1, -1), (1, 1, -1), (-1, 1, -1), (-1, -1, 1), (1, -1, 1), (1, 1, 1), (-1, 1, 1)], [],
+        [(0, 1, 2, 3), (4, 7, 6, 5), (0, 4, 5, 1), (1, 5, 6, 2), (2, 6, 7, 3), (3, 7, 4, 0)])
+    mesh.update()
+
+    objects = []
+    for i in range(args.objects):
+        item = bpy.data.objects.new("Bench Object %d" % i, mesh)
+        item.location = Vector((rng.uniform(-100, 100), rng.uniform(-100, 100), rng.uniform(-10, 10)))
+        collections[i % len(collections)].objects.link(item)
+
+        if i > 0 and rng.random() < args.parent_ratio:
+            item.parent = objects[rng.randrange(len(objects))]
+
+        objects.append(item)
+
+    for item in objects:
+        if rng.random() < args.modifier_density:
+            modifier = item.modifiers.new("Bench Mirror", 'MIRROR')
+            modifier.mirror_object = objects[rng.randrange(len(objects))]
+
+        if rng.random() < args.constraint_density:
+            constraint = item.constraints.new('COPY_ROTATION')
+            constraint.target = objects[rng.randrange(len(objects))]
+
+    armatures = []
+    for i in range(args.armatures):
+        armatures.append(CreateBenchmarkArmature(scene, "Bench Armature %d" % i, args.bones, rng))
+
+    return {'scene': scene, 'collections': collections[1:], 'objects': objects, 'armatures': armatures}
+
+
+def CreateBenchmarkArmature(scene, name, bone_count, rng):
+    """
+    Creates an armature with a chain of bones, some of which have constraints.
+    """
+
+    armature = bpy.data.objects.new(name, bpy.data.armatures.new(name))
+    scene.collection.objects.link(armature)
+
+    bpy.context.view_layer.objects.active = armature
+    bpy.ops.object.mode_set(mode = 'EDIT')
+
+    parent = None
+    for i in range(bone_count):
+        bone = armature.data.edit_bones.new("Bone %d" % i)
+        bone.head = (0.0, 0.0, i)
+        bone.tail = (0.0, 0.0, i + 1)
+        bone.parent = parent
+        parent = bone
+
+    bpy.ops.object.mode_set(mode = 'OBJECT')
+
+    for pose_bone in armature.pose.bones:
+        if rng.random() < 0.25:
+            constraint = pose_bone.constraints.new('COPY_ROTATION')
+            constraint.target = armature
+            constraint.subtarget = armature.pose.bones[0].name
+
+    return armature
+
+
+def SetupCapsuleData(context, args, generated, export_directory):
+    """
+    Creates the Capsule presets used by the benchmark and marks objects and collections for export.
+    Returns the Capsule file data.
+    """
+
+    addon_prefs = context.preferences.addons[args.package].preferences
+
+    datablock = bpy.data.objects.get(addon_prefs.default_datablock)
+    if datablock is None:
+        datablock = bpy.data.objects.new(addon_prefs.default_datablock, None)
+        datablock.CAPFile.is_storage_object = True
+
+    if datablock.name not in generated['scene'].objects:
+        generated['scene'].collection.objects.link(datablock)
+
+    cap_file = datablock.CAPFile
+
+    export_preset = cap_file.export_presets.add()
+    export_preset.name = "Benchmark Preset"
+    export_preset_enum = str(len(cap_file.export_presets))
+
+    location_preset = cap_file.location_presets.add()
+    location_preset.name = "Benchmark Location"
+    location_preset.path = export_directory
+    location_preset_enum = str(len(cap_file.location_presets))
+
+    rng = random.Random(args.seed)
+    for item in generated['objects']:
+        if rng.random() < args.export_ratio:
+            item.CAPObj.enable_export = True
+            item.CAPObj.export_preset = export_preset_enum
+            item.CAPObj.location_preset = location_preset_enum
+            item.CAPObj.object_children = 'All'
+            item.CAPObj.origin_point = 'Object' if rng.random() < args.origin_ratio else 'Scene'
+
+    for collection in generated['collections'][:args.collection_branches]:
+        collection.CAPCol.enable_export = True
+        collection.CAPCol.export_preset = export_preset_enum
+        collection.CAPCol.location_preset = location_preset_enum
+        collection.CAPCol.collection_children = 'All'
+
+    return cap_file
+
+
+# ////////////////////////////////////////
+# TIMING
+
+def Measure(results, name, repeat, function, setup = None, teardown = None):
+    """
+    Times a function several times and adds the timings to the results.
+    The setup and teardown functions aren't timed.
+    """
+
+    runs = []
+    for i in range(repeat):
+        state = setup() if setup is not None else None
+
+        start = time.perf_counter()
+        value = function(state)
+        runs.append(time.perf_counter() - start)
+
+        if teardown is not None:
+            teardown(value)
+
+    results[name] = {
+        'runs': runs,
+        'min': min(runs),
+        'mean': statistics.mean(runs),
+        'median': statistics.median(runs),
+    }
+
+    print("%-40s min %.4fs  median %.4fs" % (name, results[name]['min'], results[name]['median']))
+
+
+def RunBenchmarks(context, args, modules, cap_file, export_directory):
+    """
+    Times every stage of the export pipeline on the current scene.
+    """
+
+    export_operators = modules['export_operators']
+    record_utils = modules['record']
+    object_transform = modules['object_transform']
+    path_utils = modules['paths']
+
+    results = {}
+    repeat = args.repeat
+
+    export_objects, export_collections = export_operators.GetExportTargets(context, 'ALL')
+
+
+    # Task building
+    def BuildObjectTasks(state):
+        return export_operators.BuildObjectExportTasks(context, cap_file, export_objects, None,
+            export_operators.CreateExportStats())
+
+    def BuildCollectionTasks(state):
+        return export_operators.BuildCollectionExportTasks(context, cap_file, export_collections, None,
+            export_operators.CreateExportStats())
+
+    Measure(results, 'build_object_export_tasks', repeat, BuildObjectTasks)
+    Measure(results, 'build_collection_export_tasks', repeat, BuildCollectionTasks)
+
+    export_tasks = BuildObjectTasks(None)[0] + BuildCollectionTasks(None)[0]
+
+
+    # Scene context
+    Measure(results, 'build_scene_context_global', repeat,
+        lambda state: record_utils.BuildSceneContext(context),
+        teardown = lambda record: record_utils.RestoreSceneContext(context, record))
+
+    Measure(results, 'restore_scene_context_global', repeat,
+        lambda record: record_utils.RestoreSceneContext(context, record),
+        setup = lambda: record_utils.BuildSceneContext(context))
+
+    scope = export_operators.GetExportTaskScope(export_tasks)
+
+    Measure(results, 'build_scene_context_scoped', repeat,
+        lambda state: record_utils.BuildSceneContext(context, scope),
+        teardown = lambda record: record_utils.RestoreSceneContext(context, record))
+
+    Measure(results, 'restore_scene_context_scoped', repeat,
+        lambda record: record_utils.RestoreSceneContext(context, record),
+        setup = lambda: record_utils.BuildSceneContext(context, scope))
+
+
+    # File paths
+    def CreateFilePaths(state):
+        for export_task in export_tasks:
+            path_utils.CreateFilePath(export_task['location_preset'], export_task['targets'], None, True, export_task)
+
+    Measure(results, 'create_file_path', repeat, CreateFilePaths)
+
+    Measure(results, 'export_task_directories', repeat,
+        lambda state: export_operators.GetExportTaskDirectories(context, export_tasks))
+
+
+    # Origin point moves
+    origin_tasks = [t for t in export_tasks if t['origin_object'] is not None]
+
+    def RelocateOrigins(state):
+        for export_task in origin_tasks:
+            record = object_transform.RelocateObjects(context, export_task['origin_object'],
+                [0.0, 0.0, 0.0], export_task['targets'])
+            object_transform.RestoreRelocatedObjects(context, record)
+
+    Measure(results, 'relocate_objects', repeat, RelocateOrigins)
+
+    # The full scene move needs a 3D View, which background mode doesn't have.
+    if context.window is not None and len(origin_tasks) > 0:
+        def MoveAllOrigins(state):
+            for export_task in origin_tasks:
+                origin = export_task['origin_object'].matrix_world.translation.copy()
+                object_transform.MoveAllFailsafe(context, export_task['origin_object'], [0.0, 0.0, 0.0])
+                object_transform.MoveAllFailsafe(context, export_task['origin_object'], origin)
+
+        Measure(results, 'move_all_failsafe', repeat, MoveAllOrigins)
+
+    else:
+        results['move_all_failsafe'] = {'skipped': "Requires a 3D View, which isn't available in background mode."}
+
+
+    # Export formats
+    format_tasks = export_tasks[:args.format_exports]
+    scene_record = record_utils.BuildSceneContext(context, scope)
+
+    try:
+        for format_type in args.formats:
+            for export_task in format_tasks:
+                export_task['export_preset'].format_type = format_type
+
+            def ExportFormat(state):
+                for export_task in format_tasks:
+                    for item in list(context.view_layer.objects.selected):
+                        item.select_set(False)
+                    for item in export_task['targets']:
+                        item.select_set(True)
+
+                    export_operators.CallFormatExport(context, export_task['export_preset'],
+                        export_task['export_directory'], export_task['export_name'])
+
+            try:
+                Measure(results, 'export_' + format_type.lower(), repeat, ExportFormat)
+            except Exception as e:
+                results['export_' + format_type.lower()] = {'error': repr(e)}
+                print("Export format", format_type, "failed -", repr(e))
+
+            if format_type not in export_operators.ACTIVE_COLLECTION_FORMATS:
+                continue
+
+            def ExportFormatCollection(state):
+                for export_task in format_tasks:
+                    collection_record = export_operators.CreateExportCollection(context, export_task['targets'])
+                    export_operators.CallFormatExport(context, export_task['export_preset'],
+                        export_task['export_directory'], export_task['export_name'], True)
+                    export_operators.RemoveExportCollection(context, collection_record)
+
+            try:
+                Measure(results, 'export_' + format_type.lower() + '_collection', repeat, ExportFormatCollection)
+            except Exception as e:
+                results['export_' + format_type.lower() + '_collection'] = {'error': repr(e)}
+                print("Export format", format_type, "from a collection failed -", repr(e))
+
+    finally:
+        record_utils.RestoreSceneContext(context, scene_record)
+
+    return results
+
+
+def main(argv = None):
+    """
+    Generates a benchmark scene, times the export pipeline on it and reports the results.
+    """
+
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    args = BuildArgumentParser().parse_args(argv)
+
+    capsule = importlib.import_module(args.package)
+    modules = {}
+    modules['export_operators'] = importlib.import_module(args.package + ".export_operators")
+    modules['record'] = importlib.import_module(args.package + ".tk_utils.record")
+    modules['object_transform'] = importlib.import_module(args.package + ".tk_utils.object_transform")
+    modules['paths'] = importlib.import_module(args.package + ".tk_utils.paths")
+
+    export_directory = tempfile.mkdtemp(prefix = "capsule_benchmark_")
+    scene = bpy.data.scenes.new("Capsule Benchmark")
+
+    try:
+        with bpy.context.temp_override(scene = scene, view_layer = scene.view_layers[0]):
+            context = bpy.context
+
+            generation_start = time.perf_counter()
+            generated = PopulateBenchmarkScene(scene, args)
+            generation_time = time.perf_counter() - generation_start
+
+            cap_file = SetupCapsuleData(context, args, generated, export_directory)
+            results = RunBenchmarks(context, args, modules, cap_file, export_directory)
+
+    finally:
+        shutil.rmtree(export_directory, ignore_errors = True)
+
+    report = {}
+    report['blender_version'] = bpy.app.version_string
+    report['capsule_version'] = list(capsule.bl_info['version'])
+    report['parameters'] = vars(args)
+    report['scene'] = {
+        'objects': len(scene.objects),
+        'collections': len(generated['collections']),
+        'armatures': len(generated['armatures']),
+        'generation_time': generation_time,
+    }
+    report['results'] = results
+
+    output = json.dumps(report, indent = 1)
+    if args.output is not None:
+        with open(args.output, 'w', encoding = 'utf-8') as output_file:
+            output_file.write(output)
+        print("Benchmark results written to", args.output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
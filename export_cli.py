@@ -0,0 +1,212 @@
+# ///////////////////////////////////////////////////////////////////
+# Command line entry point, for exporting without the user interface.
+# ///////////////////////////////////////////////////////////////////
+
+# Capsule only reads the arguments given after "--", for example:
+#
+#   blender -b level.blend --addons Capsule --python-expr
+#       "import sys, Capsule.export_cli as cli; sys.exit(cli.main())"
+#       -- --mode ALL --output-root /builds/assets
+#
+# From Blender 4.2 the same arguments can also be given to the registered command,
+# which needs the blend file passed in as it doesn't load one itself:
+#
+#   blender -c capsule_export --blend level.blend --objects Crate Barrel
+
+import bpy, argparse, json, os, sys, traceback
+
+from . import export_operators
+from .tk_utils import profiler
+from .tk_utils import manifest
+
+# The handle returned when registering the command, if this version of Blender supports it.
+cli_command = None
+
+
+def BuildArgumentParser():
+    """
+    Creates the parser for all command line export arguments.
+    """
+
+    parser = argparse.ArgumentParser(prog = "capsule_export",
+        description = "Exports Capsule objects and collections without the user interface.")
+
+    parser.add_argument("--blend", default = None,
+        help = "The blend file to open before exporting.  If not given, the currently loaded file is used.")
+
+    parser.add_argument("--scene", default = None,
+        help = "The name of the scene to export from.  If not given, the active scene is used.")
+
+    parser.add_argument("--mode", default = 'ALL', choices = ['ALL', 'OBJECTS', 'COLLECTIONS'],
+        help = "Whether to export objects, collections or both.")
+
+    parser.add_argument("--objects", nargs = '+', default = None, metavar = "NAME",
+        help = "Only export the objects with these names.")
+
+    parser.add_argument("--collections", nargs = '+', default = None, metavar = "NAME",
+        help = "Only export the collections with these names.")
+
+    parser.add_argument("--output-root", default = None,
+        help = "The directory relative Location Preset paths are resolved against, instead of the blend file directory.")
+
+    parser.add_argument("--stats-file", default = None,
+        help = "A file to write the export statistics to as JSON.")
+
+    parser.add_argument("--ignore-export-cache", action = 'store_true',
+        help = "Exports everything even if Skip Unchanged Exports is enabled, without updating the export record.")
+
+    # Used by export workers, whose results are reported by the Blender session that started them.
+    parser.add_argument("--worker", action = 'store_true', help = argparse.SUPPRESS)
+
+    return parser
+
+
+def GetCommandArguments(argv = None):
+    """
+    Returns the arguments meant for Capsule, which are the ones after "--" when run through Blender.
+    """
+
+    if argv is None:
+        argv = sys.argv
+        if "--" in argv:
+            argv = argv[argv.index("--") + 1:]
+        else:
+            argv = []
+
+    return argv
+
+
+def FilterExportTargets(export_objects, export_collections, args):
+    """
+    Narrows the export targets down to the mode and names given on the command line.
+    Returns a list of objects, a list of collections and a list of any names that couldn't be found.
+    """
+
+    if args.mode == 'OBJECTS':
+        export_collections = []
+    elif args.mode == 'COLLECTIONS':
+        export_objects = []
+
+    missing_names = []
+
+    # If any names are given, only the named objects and collections are exported.
+    if args.objects is not None or args.collections is not None:
+        object_names = set(args.objects or [])
+        collection_names = set(args.collections or [])
+
+        export_objects = [item for item in export_objects if item.name in object_names]
+        export_collections = [item for item in export_collections if item.name in collection_names]
+
+        missing_names += sorted(object_names - set(item.name for item in export_objects))
+        missing_names += sorted(collection_names - set(item.name for item in export_collections))
+
+    return [export_objects, export_collections, missing_names]
+
+
+def WriteExportStats(file_path, export_stats):
+    """
+    Writes the export statistics to a JSON file, leaving out internal timers.
+    """
+
+    stats = {}
+    for key, value in export_stats.items():
+        if not key.startswith('_'):
+            stats[key] = value
+
+    with open(file_path, 'w', encoding = 'utf-8') as stats_file:
+        json.dump(stats, stats_file, indent = 1, sort_keys = True)
+
+
+def main(argv = None):
+    """
+    Runs a Capsule export from the command line.  Returns 0 if successful and 1 if not.
+    """
+
+    args = BuildArgumentParser().parse_args(GetCommandArguments(argv))
+
+    if args.blend is not None:
+        bpy.ops.wm.open_mainfile(filepath = os.path.abspath(args.blend))
+
+    scene = bpy.context.scene
+    if args.scene is not None:
+        scene = bpy.data.scenes.get(args.scene)
+        if scene is None:
+            print("Capsule Error - The scene", args.scene, "doesn't exist in this blend file.")
+            return 1
+
+    output_root = None
+    if args.output_root is not None:
+        output_root = os.path.abspath(args.output_root)
+        os.makedirs(output_root, exist_ok = True)
+
+    with bpy.context.temp_override(scene = scene, view_layer = scene.view_layers[0]):
+        context = bpy.context
+
+        export_targets = export_operators.GetExportTargets(context, 'ALL')
+        export_targets = FilterExportTargets(export_targets[0], export_targets[1], args)
+
+        if len(export_targets[2]) > 0:
+            print("Capsule Error - These objects or collections don't exist or aren't enabled for export:",
+                ", ".join(export_targets[2]))
+            return 1
+
+        export_stats = export_operators.CreateExportStats()
+
+        # Pruning needs every file that should exist, so it only happens when nothing was left out.
+        prune_outputs = (args.mode == 'ALL' and args.objects is None and args.collections is None 
+            and args.worker is False)
+
+        try:
+            export_info = export_operators.RunExport(context, export_targets[0], export_targets[1],
+                export_stats, output_root, not args.ignore_export_cache, prune_outputs)
+        except Exception:
+            traceback.print_exc()
+            return 1
+
+    print("Capsule", export_info[0], "-", export_info[1])
+
+    if args.stats_file is not None:
+        WriteExportStats(args.stats_file, export_stats)
+
+    addon_prefs = bpy.context.preferences.addons[__package__].preferences
+    if addon_prefs.profile_exports is True and args.worker is False:
+        profiler.WriteProfileReport(export_stats)
+    
+    if manifest.IsRecordingManifest(addon_prefs) is True and args.worker is False:
+        manifest.WriteManifest(export_stats)
+
+    if export_info[0] != 'INFO':
+        return 1
+
+    return 0
+
+
+def CommandHandler(argv):
+    """
+    The handler for the registered "capsule_export" command.
+    """
+
+    return main(argv)
+
+
+def RegisterCommand():
+    """
+    Registers the "capsule_export" command if this version of Blender supports it (4.2+).
+    """
+
+    global cli_command
+
+    if hasattr(bpy.utils, 'register_cli_command'):
+        cli_command = bpy.utils.register_cli_command("capsule_export", CommandHandler)
+
+
+def UnregisterCommand():
+    """
+    Removes the "capsule_export" command if it was registered.
+    """
+
+    global cli_command
+
+    if cli_command is not None:
+        bpy.utils.unregister_cli_command(cli_command)
+        cli_command = None
@@ -265,9 +265,10 @@ class CAP_FormatData_FBX(PropertyGroup):
 	)
 
 
-	def export(self, export_preset, filePath):
+	def export(self, export_preset, filePath, use_active_collection = False):
 		"""
 		Calls the FBX Export API to export the currently selected objects with the given settings.
+		- use_active_collection: If True, the objects in the active collection are exported instead.
 		"""
 
 		print("Exporting", "*"*70)
@@ -280,8 +281,8 @@ class CAP_FormatData_FBX(PropertyGroup):
 			# TODO: DO I need this?
 			filter_glob = "*.fbx",
 
-			use_selection = True,
-			use_active_collection = False,
+			use_selection = not use_active_collection,
+			use_active_collection = use_active_collection,
 			use_visible = False,
 
 			use_mesh_modifiers = export_preset.apply_modifiers,
@@ -475,13 +475,14 @@ class CAP_FormatData_GLTF(PropertyGroup):
 	)
 
 		
-	def export(self, context, export_preset, filePath, fileName):
+	def export(self, context, export_preset, filePath, fileName, use_active_collection = False):
 		"""
 		Calls the GLTF Export module to make the export happen.
+		- use_active_collection: If True, the objects in the active collection are exported instead of the selection.
 		"""
 
 		final_filename = ""
-		if self.export_format == 'GLTF_EMBEDDED' or 'GLTF_SEPARATE':
+		if self.export_format in ('GLTF_EMBEDDED', 'GLTF_SEPARATE'):
 			final_filename = filePath + fileName + '.gltf'
 		else:
 			final_filename = filePath + fileName + '.glb'
@@ -492,10 +493,10 @@ class CAP_FormatData_GLTF(PropertyGroup):
 			filepath=final_filename,
 			check_existing = False,
 			
-			use_selection  = True,
+			use_selection  = not use_active_collection,
 			use_visible = False,
 			use_renderable = False,
-			use_active_collection = False,
+			use_active_collection = use_active_collection,
 			use_active_scene = True,
 
 			# used to identify that the exporter is being called in code.
@@ -13,9 +13,20 @@ from .tk_utils import select as select_utils
 from .tk_utils import locations as loc_utils
 from .tk_utils import object_ops
 from .tk_utils import object_transform
+from .tk_utils import dependencies
 from .tk_utils import paths as path_utils
 from .tk_utils import record as record_utils
+from .tk_utils import fingerprint
+from .tk_utils import profiler
+from .tk_utils import staging
+from .tk_utils import manifest
+from . import export_workers
 
+# The formats whose exporters can export the objects in the active collection instead of the selected ones.
+ACTIVE_COLLECTION_FORMATS = {'FBX', 'GLTF'}
+
+# The name of the temporary collection export targets are gathered into when exporting without selecting.
+EXPORT_COLLECTION_NAME = ">> Capsule Export <<"
 
 
 class CAPSULE_OT_Export(Operator):
@@ -40,151 +51,286 @@ class CAPSULE_OT_Export(Operator):
     )
 
     def execute(self, context):
-        
-        preferences = context.preferences
-        addon_prefs = preferences.addons[__package__].preferences
-        cap_scn = context.scene.CAPScn
-        cap_file = None
 
-        # /////////////////////////////////////////////////
-        # FETCH
+        print('>> EXPORT OPERATOR <<')
 
         # Fetch objects and collections for export
         # (fetching MUST be done first to preserve selection data)
+        export_targets = GetExportTargets(context, self.set_mode)
+        export_stats = CreateExportStats()
 
-        print('>> EXPORT OPERATOR <<')
+        # Only a full export knows every file that should exist, so it's the only one that can prune.
+        export_info = RunExport(context, export_targets[0], export_targets[1], export_stats, 
+            prune_outputs = self.set_mode == 'ALL')
+        self.report({export_info[0]}, export_info[1])
 
-        export_objects = []
-        export_collections = []
-        
-        # Set baseline export statistics
-        export_stats = {}
-        export_stats['obj_exported'] = 0
-        export_stats['col_exported'] = 0
-        export_stats['obj_hidden'] = 0
-        export_stats['col_hidden'] = 0
-        # timers
-        export_stats['_last_time'] = time.time()
-        export_stats['scene_setup_time'] = 0.0
-        export_stats['export_process_time'] = 0.0
-        export_stats['export_task_process_time'] = 0.0
-        export_stats['export_pack_script_time'] = 0.0
-        export_stats['export_task_api_time'] = 0.0
-        export_stats['scene_restore_time'] = 0.0
-
-        print(">> FETCHING TARGETS <<")
-
-        if self.set_mode == 'ALL':
-            for object in context.scene.objects:
-                if object.CAPObj.enable_export is True:
-                    export_objects.append(object)
-            
-            for collection in search_utils.GetSceneCollections(context.scene, False):
-                if collection.CAPCol.enable_export is True:
-                    export_collections.append(collection)
-        
-        # this is for the pie menu!
-        elif self.set_mode == 'SELECTED_ALL':
-            for object in context.selected_objects:
-                if object.CAPObj.enable_export is True:
-                    export_objects.append(object)
-            
-            for collection in search_utils.GetSelectedCollections():
-                if collection.CAPCol.enable_export is True:
-                    export_collections.append(collection)
-        
-        # this is for the object tab of the 3D view menu
-        elif self.set_mode == 'SELECTED_OBJECTS':
-            for object in context.selected_objects:
-                if object.CAPObj.enable_export is True:
-                    export_objects.append(object)
+        if context.preferences.addons[__package__].preferences.profile_exports is True:
+            profiler.WriteProfileReport(export_stats)
+
+        if manifest.IsRecordingManifest(context.preferences.addons[__package__].preferences) is True:
+            manifest.WriteManifest(export_stats)
+
+        return {'FINISHED'}
+
+
+
+def CreateExportStats():
+    """
+    Returns a baseline set of export statistics and timers.
+    """
+
+    export_stats = {}
+    export_stats['obj_exported'] = 0
+    export_stats['col_exported'] = 0
+    export_stats['obj_hidden'] = 0
+    export_stats['col_hidden'] = 0
+    export_stats['skipped_unchanged'] = 0
+    export_stats['failed_workers'] = 0
+    export_stats['files_written'] = 0
+    export_stats['files_unchanged'] = 0
+    export_stats['files_pruned'] = 0
+    export_stats['task_profiles'] = []
+    export_stats['manifest_entries'] = []
+    # timers
+    export_stats['_last_time'] = time.time()
+    export_stats['scene_setup_time'] = 0.0
+    export_stats['export_process_time'] = 0.0
+    export_stats['export_task_process_time'] = 0.0
+    export_stats['export_pack_script_time'] = 0.0
+    export_stats['export_task_api_time'] = 0.0
+    export_stats['scene_restore_time'] = 0.0
+
+    return export_stats
+
+
+def GetExportTargets(context, set_mode):
+    """
+    Fetches the objects and collections to be exported for the given export mode.
+    Returns a list containing a list of objects and a list of collections.
+    """
+
+    cap_scn = context.scene.CAPScn
+
+    export_objects = []
+    export_collections = []
+
+    print(">> FETCHING TARGETS <<")
+
+    # The collection index and dependency graph are rebuilt once at the start of every export, 
+    # then shared by every step that needs them.
+    search_utils.GetSceneCollectionIndex(context.scene, rebuild = True)
+    dependencies.GetDependencyGraph(context.scene, rebuild = True)
+
+    if set_mode == 'ALL':
+        for object in context.scene.objects:
+            if object.CAPObj.enable_export is True:
+                export_objects.append(object)
         
-        # this is for the collections tab of the 3D view menu
-        elif self.set_mode == 'SELECTED_COLLECTIONS':
-            for collection in search_utils.GetSelectedCollections():
-                if collection.CAPCol.enable_export is True:
-                    export_collections.append(collection)
+        for collection in search_utils.GetSceneCollections(context.scene, False):
+            if collection.CAPCol.enable_export is True:
+                export_collections.append(collection)
+    
+    # this is for the pie menu!
+    elif set_mode == 'SELECTED_ALL':
+        for object in context.selected_objects:
+            if object.CAPObj.enable_export is True:
+                export_objects.append(object)
         
-        # this is for the list menu
-        elif self.set_mode == 'ACTIVE_LIST':
-            list_tab = int(str(cap_scn.list_switch))
+        for collection in search_utils.GetSelectedCollections():
+            if collection.CAPCol.enable_export is True:
+                export_collections.append(collection)
+    
+    # this is for the object tab of the 3D view menu
+    elif set_mode == 'SELECTED_OBJECTS':
+        for object in context.selected_objects:
+            if object.CAPObj.enable_export is True:
+                export_objects.append(object)
+    
+    # this is for the collections tab of the 3D view menu
+    elif set_mode == 'SELECTED_COLLECTIONS':
+        for collection in search_utils.GetSelectedCollections():
+            if collection.CAPCol.enable_export is True:
+                export_collections.append(collection)
+    
+    # this is for the list menu
+    elif set_mode == 'ACTIVE_LIST':
+        list_tab = int(str(cap_scn.list_switch))
 
-            if list_tab == 1:
-                index = cap_scn.object_list_index
-                export_objects.append(cap_scn.object_list[index].object)
+        if list_tab == 1:
+            index = cap_scn.object_list_index
+            export_objects.append(cap_scn.object_list[index].object)
 
-            elif list_tab == 2:
-                index = cap_scn.collection_list_index
-                export_collections.append(cap_scn.collection_list[index].collection)
+        elif list_tab == 2:
+            index = cap_scn.collection_list_index
+            export_collections.append(cap_scn.collection_list[index].collection)
 
-        
-        # print(export_objects)
-        # print(export_collections)
+    return [export_objects, export_collections]
 
-        # /////////////////////////////////////////////////
-        # SETUP
-    
-        # For the new pie menu, we need to see if any data exists before continuing
-        try:
-            cap_file = bpy.data.objects[addon_prefs.default_datablock].CAPFile
-        except KeyError:
-            self.report({'WARNING'}, "No Capsule Data for this blend file exists.  Please create it using the Toolshelf or Addon Preferences menu.")
-            return {'FINISHED'}
 
-        print(">> BUILDING SCENE CONTEXT <<")
+def RunExport(context, export_objects, export_collections, export_stats = None, output_root = None, 
+        use_export_cache = True, prune_outputs = False):
+    """
+    Exports the given objects and collections, preserving and restoring the scene around the export.
+    Doesn't depend on any UI context, so it's shared by the export operator and the command line.
 
-        # Make a record of the scene before we do anything
-        global_record = record_utils.BuildSceneContext(context)
+    - output_root: If defined, relative Location Preset paths are resolved against this directory 
+      instead of the blend file's directory.
+    - use_export_cache: If False, unchanged exports won't be skipped or recorded.
+    - prune_outputs: If True and Prune Old Exports is enabled, files from earlier exports that these
+      objects and collections no longer produce will be removed.  Only use this when exporting everything.
 
-        # We need to make a separate definition set for preserving and restoring scene data.
-        result = record_utils.CheckCapsuleErrors(context)
+    Returns a list containing the report type and a summary of the export.
+    """
 
-        if result is not None:
-            record_utils.RestoreSceneContext(context, global_record)
-            self.report({'WARNING'}, result)
-            return {'FINISHED'}
+    preferences = context.preferences
+    addon_prefs = preferences.addons[__package__].preferences
+
+    if export_stats is None:
+        export_stats = CreateExportStats()
+
+    # /////////////////////////////////////////////////
+    # SETUP
+
+    # For the new pie menu, we need to see if any data exists before continuing
+    try:
+        cap_file = bpy.data.objects[addon_prefs.default_datablock].CAPFile
+    except KeyError:
+        return ['WARNING', "No Capsule Data for this blend file exists.  Please create it using the Toolshelf or Addon Preferences menu."]
+
+    # This has to be checked before the scene is changed, as workers can only export what's been saved.
+    use_workers = export_workers.CanUseExportWorkers(context)
+
+    # Check for errors before anything in the scene is changed, only for what's being exported.
+    result = record_utils.CheckCapsuleErrors(context, export_objects, export_collections, output_root)
 
-        export_stats['scene_setup_time'] = time.time() - export_stats['_last_time']
-        export_stats['_last_time'] = time.time()
+    if result is not None:
+        return ['WARNING', result]
 
 
-        # /////////////////////////////////////////////////
-        # EXPORT TASK PROCESSING
+    # /////////////////////////////////////////////////
+    # EXPORT TASK PROCESSING
+
+    # Tasks are built before the scene is recorded, so the record can be limited to what they need.
+    # The hierarchy is indexed once and shared by every task.
+    hierarchy_index = search_utils.BuildHierarchyIndex(context.scene)
+
+    object_export_result = BuildObjectExportTasks(context, cap_file, export_objects, None, export_stats, hierarchy_index)
+    export_stats = object_export_result[1]
+    collection_export_result = BuildCollectionExportTasks(context, cap_file, export_collections, None, export_stats, hierarchy_index)
+    export_stats = collection_export_result[1]
+
+    export_tasks = object_export_result[0] + collection_export_result[0]
+    export_stats['export_process_time'] = time.time() - export_stats['_last_time']
+    export_stats['_last_time'] = time.time()
+
+
+    print(">> BUILDING SCENE CONTEXT <<")
+
+    # Make a record of the scene before we do anything
+    scene_scope = None
+    if addon_prefs.snapshot_mode != 'GLOBAL':
+        scene_scope = GetExportTaskScope(export_tasks)
+    
+    # In staging mode the export happens in a temporary scene holding only what's being exported, 
+    # so the scene being worked in isn't selected, unhidden or given a new view layer.
+    staging_record = None
+    staging_override = {}
+    if addon_prefs.snapshot_mode == 'STAGING':
+        staging_record = record_utils.BuildStagingScene(context, scene_scope)
+        staging_override = {'scene': staging_record['scene'], 'view_layer': staging_record['view_layer']}
+    
+    with context.temp_override(**staging_override):
+        global_record = record_utils.BuildSceneContext(context, scene_scope)
+
+    export_stats['scene_setup_time'] = time.time() - export_stats['_last_time']
+    export_stats['_last_time'] = time.time()
 
-        object_export_result = BuildObjectExportTasks(context, cap_file, export_objects, global_record, export_stats)
-        export_stats = object_export_result[1]
-        collection_export_result = BuildCollectionExportTasks(context, cap_file, export_collections, global_record, export_stats)
-        export_stats = collection_export_result[1]
+    # /////////////////////////////////////////////////
+    # EXPORT TASKS
+
+    # If enabled, tasks that haven't changed since the last export are skipped.
+    export_cache = None
+    if addon_prefs.skip_unchanged_exports is True and use_export_cache is True:
+        export_cache = fingerprint.LoadExportCache()
 
-        export_tasks = object_export_result[0] + collection_export_result[0]
-        export_stats['export_process_time'] = time.time() - export_stats['_last_time']
-        export_stats['_last_time'] = time.time()
+    if addon_prefs.profile_exports is True:
+        profiler.StartOperatorCounter()
 
-        # /////////////////////////////////////////////////
-        # EXPORT TASKS
+    # Once the scene has been prepared it must always be restored, even if an export fails.
+    exported_tasks = []
+    try:
+        # Exports move and mute objects without changing what depends on what, so the dependency graph is kept.
+        dependencies.HoldDependencyGraphs(True)
+        GetExportTaskDirectories(context, export_tasks, output_root)
 
+        pending_tasks = []
         for export_task in export_tasks:
 
-            GetExportTaskDirectory(context, export_task)
-            PerformExportTask(context, export_task, export_stats)
+            if export_cache is not None:
+                profiler.ResetPhaseTimer(export_task)
+                export_task['file_path'] = GetExportFilePath(export_task)
+                export_task['fingerprint'] = fingerprint.BuildTaskFingerprint(context, export_task, 
+                    GetFormatData(export_task['export_preset']), export_task['file_path'], export_cache)
+                profiler.MarkPhase(export_task, 'fingerprint')
+
+                if fingerprint.IsTaskUnchanged(export_cache, export_task['file_path'], export_task['fingerprint']):
+                    export_stats['skipped_unchanged'] += 1
+                    continue
+            
+            pending_tasks.append(export_task)
+
+        # Only hand tasks to workers if there's enough to go around.
+        if use_workers is True and len(pending_tasks) > addon_prefs.export_worker_chunk_size:
+            exported_tasks = export_workers.RunExportWorkers(context, pending_tasks, export_stats, output_root)
+        
+        else:
+            with context.temp_override(**staging_override):
+                for export_task in pending_tasks:
 
-        # /////////////////////////////////////////////////
-        # EXPORT SUMMARY  
+                    # A failed task undoes its own origin move and constraint muting before the scene is restored.
+                    try:
+                        PerformExportTask(context, export_task, export_stats)
+                    except Exception:
+                        EmergencySceneRestore(context, export_task)
+                        raise
+
+                    exported_tasks.append(export_task)
+        
+        if prune_outputs is True and addon_prefs.prune_exports != 'OFF':
+            PruneOrphanedOutputs(context, cap_file, export_tasks, export_stats, addon_prefs.prune_exports, output_root)
+    
+    finally:
+        profiler.StopOperatorCounter()
+        dependencies.HoldDependencyGraphs(False)
+    
+        # Tasks that finished before a failure are still recorded, so they can be skipped next time.
+        if export_cache is not None:
+            for export_task in exported_tasks:
+                fingerprint.UpdateExportCache(export_cache, export_task['file_path'], export_task['fingerprint'])
+            
+            fingerprint.SaveExportCache(export_cache)
 
         print(">> RESTORING SCENE <<")
-        export_info = GetExportSummary(export_stats)
-        self.report({export_info[0]}, export_info[1])
 
-        record_utils.RestoreSceneContext(context, global_record)
+        with context.temp_override(**staging_override):
+            record_utils.RestoreSceneContext(context, global_record)
+        
+        if staging_record is not None:
+            record_utils.RemoveStagingScene(context, staging_record)
 
-        export_stats['scene_restore_time'] += time.time() - export_stats['_last_time']
-        print(export_stats)
+    # /////////////////////////////////////////////////
+    # EXPORT SUMMARY  
 
-        return {'FINISHED'}
+    export_info = GetExportSummary(export_stats)
 
+    export_stats['scene_restore_time'] += time.time() - export_stats['_last_time']
+    print({k: v for k, v in export_stats.items() if k not in ('task_profiles', 'manifest_entries')})
 
+    return export_info
 
-def BuildObjectExportTasks(context, cap_file, object_list, global_record, export_stats):
+
+
+def BuildObjectExportTasks(context, cap_file, object_list, global_record, export_stats, hierarchy_index = None):
     """
     Builds an initial list of export tasks given a list of objects, allowing export tasks
     to contain additional data and be modified as needed.
@@ -194,38 +340,37 @@ def BuildObjectExportTasks(context, cap_file, object_list, global_record, export
 
     Returns a list of export tasks and some statistics.
     """
+    preferences = context.preferences
+    addon_prefs = preferences.addons[__package__].preferences
     export_tasks = []
 
+    if hierarchy_index is None:
+        hierarchy_index = search_utils.BuildHierarchyIndex(context.scene)
+
     for item in object_list:
         export_task = {}
         export_task['export_start_time'] = datetime.now()
+        export_task['export_type'] = 'OBJECT'
+        export_task['scene'] = context.scene.name
+        export_task['source'] = item
+
+        export_task['profile'] = None
+        if addon_prefs.profile_exports is True:
+            export_task['profile'] = profiler.CreateTaskProfile()
 
         # Get the export preset for the object
         export_preset_index = int(item.CAPObj.export_preset) - 1
         export_preset = cap_file.export_presets[export_preset_index]
-        targets = search_utils.GetObjectParentTree(context, item, item.CAPObj.object_children)
+        targets = search_utils.GetObjectParentTree(context, item, item.CAPObj.object_children, hierarchy_index)
         targets += [item]
+        profiler.MarkPhase(export_task, 'target_gathering')
 
         # Filter by rendering
         if export_preset.filter_by_rendering is True:
-            renderable = []
-
-            for target in targets:
-                object_hidden = False
-
-                if target.hide_render is True:
-                    object_hidden = True
-
-                else:
-                    for render_search_col in target.users_collection:
-                        if render_search_col.hide_render is True:
-                            object_hidden = True
-                            break
-                
-                if object_hidden == False:
-                    renderable.append(target)
-            
-            targets = renderable
+            hidden_collections = search_utils.GetRenderHiddenCollections(context, hierarchy_index)
+            targets = search_utils.FilterByRenderVisibility(targets, hidden_collections)
+        
+        profiler.MarkPhase(export_task, 'render_filtering')
         
         # If our targets list is empty this collection shouldn't be included.
         if len(targets) == 0:
@@ -253,7 +398,7 @@ def BuildObjectExportTasks(context, cap_file, object_list, global_record, export
     return [export_tasks, export_stats]
 
 
-def BuildCollectionExportTasks(context, cap_file, collection_list, global_record, export_stats):
+def BuildCollectionExportTasks(context, cap_file, collection_list, global_record, export_stats, hierarchy_index = None):
     """
     Builds an initial list of export tasks given a list of objects, allowing export tasks
     to contain additional data and be modified as needed.
@@ -264,11 +409,23 @@ def BuildCollectionExportTasks(context, cap_file, collection_list, global_record
     Returns a list of export tasks and some statistics.
     """
 
+    preferences = context.preferences
+    addon_prefs = preferences.addons[__package__].preferences
     export_tasks = []
+
+    if hierarchy_index is None:
+        hierarchy_index = search_utils.BuildHierarchyIndex(context.scene)
     
     for collection in collection_list:
         export_task = {}
         export_task['export_start_time'] = datetime.now()
+        export_task['export_type'] = 'COLLECTION'
+        export_task['scene'] = context.scene.name
+        export_task['source'] = collection
+
+        export_task['profile'] = None
+        if addon_prefs.profile_exports is True:
+            export_task['profile'] = profiler.CreateTaskProfile()
 
         # Get the export default for the object
         export_preset_index = int(collection.CAPCol.export_preset) - 1
@@ -276,30 +433,16 @@ def BuildCollectionExportTasks(context, cap_file, collection_list, global_record
 
         # Collect all objects that are applicable for this export
         collection_children = collection.CAPCol.collection_children
-        targets = search_utils.GetCollectionObjectTree(context, collection, collection_children)
+        targets = search_utils.GetCollectionObjectTree(context, collection, collection_children, hierarchy_index)
+        profiler.MarkPhase(export_task, 'target_gathering')
+
 
-        
-        # TODO : Find an efficient way to filter out objects that have rendering turned off by the collections they're in.
         # Filter by rendering
         if export_preset.filter_by_rendering is True:
-            renderable = []
-
-            for target in targets:
-                object_hidden = False
-
-                if target.hide_render is True:
-                    object_hidden = True
-
-                else:
-                    for render_search_col in target.users_collection:
-                        if render_search_col.hide_render is True:
-                            object_hidden = True
-                            break
-                
-                if object_hidden == False:
-                    renderable.append(target)
-            
-            targets = renderable
+            hidden_collections = search_utils.GetRenderHiddenCollections(context, hierarchy_index)
+            targets = search_utils.FilterByRenderVisibility(targets, hidden_collections)
+        
+        profiler.MarkPhase(export_task, 'render_filtering')
 
         # If our targets list is empty this collection shouldn't be included.
         if len(targets) == 0:
@@ -328,20 +471,151 @@ def BuildCollectionExportTasks(context, cap_file, collection_list, global_record
     return [export_tasks, export_stats]
 
 
-def GetExportTaskDirectory(context, export_task):
+def GetExportTaskScope(export_tasks):
+    """
+    Returns every object the given export tasks can affect or be affected by - their targets, origin objects
+    and anything those depend on through parents, constraints and modifiers.
+    """
+
+    scope_objects = []
+    for export_task in export_tasks:
+        scope_objects += export_task['targets']
+
+        if export_task['origin_object'] is not None:
+            scope_objects.append(export_task['origin_object'])
+    
+    return dependencies.GetDependencies(list(set(scope_objects)))
+
+
+def GetExportTaskDirectory(context, export_task, output_root = None, create_directory = True):
     """
     Gets and sets the file path using information in the export task.
+    - create_directory: If False the directory won't be created, for when it's created later alongside others.
     """
     preferences = context.preferences
     addon_prefs = preferences.addons[__package__].preferences
 
+    collection = None
+    if export_task['export_type'] == 'COLLECTION':
+        collection = export_task['source']
+
     export_directory = path_utils.CreateFilePath(export_task["location_preset"], export_task["targets"], 
-        None, addon_prefs.substitute_directories, export_task)
+        collection, addon_prefs.substitute_directories, export_task, output_root, create_directory)
 
     if addon_prefs.substitute_directories is True:
         export_task['export_name'] = path_utils.SubstituteNameCharacters(export_task['export_name'])
 
     export_task['export_directory'] = export_directory
+    export_task['output_root'] = output_root
+
+
+def GetExportTaskDirectories(context, export_tasks, output_root = None):
+    """
+    Gets and sets the file paths of every export task, then creates the directories they use together
+    so each one is only created once.
+    """
+
+    for export_task in export_tasks:
+        profiler.ResetPhaseTimer(export_task)
+        GetExportTaskDirectory(context, export_task, output_root, False)
+        profiler.MarkPhase(export_task, 'path_building')
+    
+    path_utils.CreateDirectories([export_task['export_directory'] for export_task in export_tasks])
+
+
+def PruneOrphanedOutputs(context, cap_file, export_tasks, export_stats, prune_mode, output_root = None):
+    """
+    Deletes or quarantines the files of earlier exports that the given export tasks no longer produce,
+    using the export manifest to find them.  Only exports from the current scene are considered, as the 
+    export tasks only cover the objects and collections in it.
+    """
+
+    if manifest.GetManifestPath() is None:
+        print("Capsule - The blend file hasn't been saved, so there's no record of earlier exports to prune.")
+        return
+
+    entries = manifest.LoadManifest()
+    latest = manifest.GetLatestEntries(entries)
+    current_paths = set(GetExportFilePath(export_task) for export_task in export_tasks)
+
+    # Files that belong to the current exports must be kept, even if an orphan once wrote them too.
+    keep_paths = set(current_paths)
+    for entry in export_stats['manifest_entries']:
+        keep_paths.update(f['path'] for f in entry['files'])
+    for path in current_paths:
+        if path in latest:
+            keep_paths.update(f['path'] for f in latest[path]['files'])
+
+    location_presets = set(location_preset.name for location_preset in cap_file.location_presets)
+    orphans = manifest.FindOrphanedEntries(entries, current_paths, location_presets, context.scene.name, output_root)
+
+    prune_result = manifest.PruneOrphanedEntries(orphans, prune_mode, keep_paths)
+    export_stats['files_pruned'] += prune_result[0]
+    export_stats['manifest_entries'] += prune_result[1]
+
+
+def GetFormatData(export_preset):
+    """
+    Returns the format-specific property group used by the given export preset.
+    """
+
+    if export_preset.format_type == 'FBX':
+        return export_preset.data_fbx
+
+    elif export_preset.format_type == 'OBJ':
+        return export_preset.data_obj
+
+    elif export_preset.format_type == 'GLTF':
+        return export_preset.data_gltf
+
+    elif export_preset.format_type == 'Alembic':
+        return export_preset.data_abc
+
+    elif export_preset.format_type == 'Collada':
+        return export_preset.data_dae
+    
+    elif export_preset.format_type == 'STL':
+        return export_preset.data_stl
+
+    elif export_preset.format_type == 'USD':
+        return export_preset.data_usd
+    
+    return None
+
+
+def GetExportFilePath(export_task):
+    """
+    Returns the full path of the main file an export task will write, including the file extension.
+    Must be called after GetExportTaskDirectory.
+    """
+
+    export_preset = export_task['export_preset']
+    object_file_path = export_task['export_directory'] + export_task['export_name']
+
+    if export_preset.format_type == 'FBX':
+        return object_file_path + '.fbx'
+
+    elif export_preset.format_type == 'OBJ':
+        return object_file_path + '.obj'
+
+    elif export_preset.format_type == 'GLTF':
+        if export_preset.data_gltf.export_format == 'GLB':
+            return object_file_path + '.glb'
+        return object_file_path + '.gltf'
+
+    elif export_preset.format_type == 'Alembic':
+        return object_file_path + '.abc'
+
+    elif export_preset.format_type == 'Collada':
+        return object_file_path + '.dae'
+    
+    elif export_preset.format_type == 'STL':
+        return object_file_path + '.stl'
+
+    elif export_preset.format_type == 'USD':
+        return object_file_path + export_preset.data_usd.usd_type
+    
+    return object_file_path
 
 
 
@@ -351,6 +625,7 @@ def PerformExportTask(context, export_task, export_stats):
     """
 
     print('>> FINALIZE EXPORT <<')
+    task_start_time = time.perf_counter()
 
     # TODO: This should really be shared in some manner.
     cap_scn = context.scene.CAPScn
@@ -366,19 +641,20 @@ def PerformExportTask(context, export_task, export_stats):
     # SETUP SCENE
 
     print("EXPORT TASK - Setup")
+    profiler.ResetPhaseTimer(export_task)
 
     # TODO 1.2 : Is this needed anymore?
     if export_preset.preserve_armature_constraints == True:
-        export_task['armature_record'] = record_utils.MuteArmatureConstraints(context)
+        export_task['armature_record'] = record_utils.MuteArmatureConstraints(context, export_task['targets'])
 
     origin_location = {}
     if export_task["origin_object"] is not None:
 
         export_task["origin_object_loc"] = GetOriginObjectLocation(context, export_task['export_name'], export_task['origin_object'])
         
-        # TODO - If the targets have no modifiers, constraints or parent relationships that can cause problems,
-        # only move the target objects to improve performance.
-        object_transform.MoveAllFailsafe(context, export_task["origin_object"], [0.0, 0.0, 0.0])
+        # Only the targets and the objects they depend on need to be moved.
+        export_task["origin_record"] = object_transform.RelocateObjects(context, export_task["origin_object"], 
+            [0.0, 0.0, 0.0], export_task['targets'])
     
 
     # ////////////////////////////////
@@ -388,6 +664,7 @@ def PerformExportTask(context, export_task, export_stats):
 
     export_stats['export_task_process_time'] += time.time() - export_stats['_last_time']
     export_stats['_last_time'] = time.time()
+    profiler.MarkPhase(export_task, 'origin_move')
     
     export_status = context.scene.CAPStatus
     export_status.target_name = export_task['export_name']
@@ -395,7 +672,8 @@ def PerformExportTask(context, export_task, export_stats):
     export_status['target_input'] = export_task['targets']
     export_status['target_output'] = []
 
-    bpy.ops.object.select_all(action= 'DESELECT')
+    for item in list(context.view_layer.objects.selected):
+        item.select_set(False)
 
     if addon_prefs.use_pack_scripts is True and pack_script is not None:
         code = pack_script.as_string()
@@ -418,15 +696,22 @@ def PerformExportTask(context, export_task, export_stats):
             return "A Pack Script used provided no target objects to export."
 
         # TODO: Find a robust way to test for type
-        for item in export_status['target_output']:
-            select_utils.SelectObject(item)
+        export_targets = export_status['target_output']
 
     else:
-        for item in export_task['targets']:
+        export_targets = export_task['targets']
+    
+    # Formats that can export the active collection get the targets in a temporary collection, so nothing
+    # has to be selected or unhidden.
+    export_collection_record = None
+    if addon_prefs.export_without_selecting is True and export_preset.format_type in ACTIVE_COLLECTION_FORMATS:
+        export_collection_record = CreateExportCollection(context, export_targets)
+    
+    else:
+        for item in export_targets:
             #print("Exporting: ", item.name)
             select_utils.SelectObject(item)
 
-    object_file_path = export_task['export_directory'] + export_task['export_name']
 
 
     # ////////////////////////////////
@@ -436,32 +721,41 @@ def PerformExportTask(context, export_task, export_stats):
 
     export_stats['export_pack_script_time'] += time.time() - export_stats['_last_time']
     export_stats['_last_time'] = time.time()
-
-    # based on the export location, send it to the right place
-    if export_preset.format_type == 'FBX':
-        export_preset.data_fbx.export(export_preset, object_file_path)
-
-    elif export_preset.format_type == 'OBJ':
-        export_preset.data_obj.export(export_preset, object_file_path)
-
-    elif export_preset.format_type == 'GLTF':
-        export_preset.data_gltf.export(context, export_preset, 
-            export_task['export_directory'], export_task['export_name'])
-
-    elif export_preset.format_type == 'Alembic':
-        export_preset.data_abc.export(context, export_preset, object_file_path)
-
-    elif export_preset.format_type == 'Collada':
-        export_preset.data_dae.export(export_preset, object_file_path)
+    profiler.MarkPhase(export_task, 'pack_script_before')
+
+    use_active_collection = export_collection_record is not None
+    export_task['output_files'] = None
+
+    # The temporary export collection is always removed, so a failed export can't leave it in the scene.
+    try:
+        # Files are written to a staging directory first, so any that are identical to the last export can be left alone.
+        if addon_prefs.keep_unchanged_files is True:
+            blend_directory = os.path.dirname(bpy.path.abspath(bpy.data.filepath)) if bpy.data.filepath else None
+            staging_directory = staging.CreateStagingDirectory(export_task['export_directory'], blend_directory)
+
+            try:
+                CallFormatExport(context, export_preset, staging_directory, export_task['export_name'], use_active_collection)
+                export_task['output_files'] = staging.CommitStagedFiles(staging_directory, export_task['export_directory'])
+            finally:
+                staging.RemoveStagingDirectory(staging_directory)
+        
+            for output_file in export_task['output_files']:
+                if output_file['written'] is True:
+                    export_stats['files_written'] += 1
+                else:
+                    export_stats['files_unchanged'] += 1
     
-    elif export_preset.format_type == 'STL':
-        export_preset.data_stl.export(context, export_preset, object_file_path)
+        else:
+            CallFormatExport(context, export_preset, export_task['export_directory'], export_task['export_name'], 
+                use_active_collection)
 
-    elif export_preset.format_type == 'USD':
-        export_preset.data_usd.export(context, export_preset, object_file_path)
+    finally:
+        if export_collection_record is not None:
+            RemoveExportCollection(context, export_collection_record)
     
     export_stats['export_task_api_time'] += time.time() - export_stats['_last_time']
     export_stats['_last_time'] = time.time()
+    profiler.MarkPhase(export_task, 'export_api')
 
 
     # ////////////////////////////////
@@ -486,6 +780,7 @@ def PerformExportTask(context, export_task, export_stats):
 
     export_stats['export_pack_script_time'] += time.time() - export_stats['_last_time']
     export_stats['_last_time'] = time.time()
+    profiler.MarkPhase(export_task, 'pack_script_after')
 
 
     # /////////////////////////////////////////////////
@@ -494,20 +789,97 @@ def PerformExportTask(context, export_task, export_stats):
     print("EXPORT TASK - Restore Scene")
 
     # Reverse movement and rotation
-    if export_task["origin_object"] is not None:
-
-        # TODO - If the targets have no modifiers, constraints or parent relationships that can cause problems,
-        # only move the target objects to improve performance.
-        object_transform.MoveAllFailsafe(context, export_task["origin_object"], 
-            export_task["origin_object_loc"]['location'])
+    if export_task.get("origin_record") is not None:
+        object_transform.RestoreRelocatedObjects(context, export_task["origin_record"])
+        export_task["origin_record"] = None
 
     # Cleans up any armature constraint modification (only works if Preserve Armature Constraints is off)
-    if export_preset.preserve_armature_constraints == True:
+    if export_task.get("armature_record") is not None:
         record_utils.RestoreArmatureConstraints(context, export_task["armature_record"])
+        export_task["armature_record"] = None
     
     export_stats['export_task_process_time'] += time.time() - export_stats['_last_time']
     export_stats['_last_time'] = time.time()
 
+    if export_task['profile'] is not None:
+        profiler.MarkPhase(export_task, 'restore')
+        export_stats['task_profiles'].append(profiler.FinishTaskProfile(export_task, GetExportFilePath(export_task)))
+    
+    if manifest.IsRecordingManifest(addon_prefs) is True:
+        file_path = GetExportFilePath(export_task)
+        output_files = export_task['output_files']
+        if output_files is None:
+            output_files = [file_path]
+        
+        export_stats['manifest_entries'].append(manifest.CreateManifestEntry(export_task, file_path, output_files,
+            time.perf_counter() - task_start_time))
+
+
+
+def CreateExportCollection(context, targets):
+    """
+    Links the given objects into a temporary collection and makes it the active collection, so formats
+    in ACTIVE_COLLECTION_FORMATS can export them without anything being selected.
+    Returns a record to give to RemoveExportCollection once the export is finished.
+    """
+
+    record = {}
+    record['active_layer_collection'] = context.view_layer.active_layer_collection
+
+    export_collection = bpy.data.collections.new(EXPORT_COLLECTION_NAME)
+    context.scene.collection.children.link(export_collection)
+
+    # A Pack Script could output the same object twice, but it can only be linked once.
+    for item in dict.fromkeys(targets):
+        export_collection.objects.link(item)
+    
+    context.view_layer.active_layer_collection = context.view_layer.layer_collection.children[export_collection.name]
+    record['collection'] = export_collection
+
+    return record
+
+
+def RemoveExportCollection(context, record):
+    """
+    Deletes a temporary export collection and makes the previous collection active again.
+    The objects it held are left in the collections they came from.
+    """
+
+    context.view_layer.active_layer_collection = record['active_layer_collection']
+    bpy.data.collections.remove(record['collection'])
+
+
+def CallFormatExport(context, export_preset, export_directory, export_name, use_active_collection = False):
+    """
+    Exports the currently selected objects using the format of the given export preset.
+    - use_active_collection: If True, the objects in the active collection are exported instead.  Only formats 
+      in ACTIVE_COLLECTION_FORMATS support this.
+    """
+
+    object_file_path = export_directory + export_name
+
+    # based on the export location, send it to the right place
+    if export_preset.format_type == 'FBX':
+        export_preset.data_fbx.export(export_preset, object_file_path, use_active_collection)
+
+    elif export_preset.format_type == 'OBJ':
+        export_preset.data_obj.export(export_preset, object_file_path)
+
+    elif export_preset.format_type == 'GLTF':
+        export_preset.data_gltf.export(context, export_preset, export_directory, export_name, use_active_collection)
+
+    elif export_preset.format_type == 'Alembic':
+        export_preset.data_abc.export(context, export_preset, object_file_path)
+
+    elif export_preset.format_type == 'Collada':
+        export_preset.data_dae.export(export_preset, object_file_path)
+    
+    elif export_preset.format_type == 'STL':
+        export_preset.data_stl.export(context, export_preset, object_file_path)
+
+    elif export_preset.format_type == 'USD':
+        export_preset.data_usd.export(context, export_preset, object_file_path)
+
 
 
 def EmergencySceneRestore(context, export_task):
@@ -535,17 +907,14 @@ def EmergencySceneRestore(context, export_task):
     # RESTORE SCENE
 
     # Reverse movement and rotation
-    if export_task["origin_object"] is not None:
-        
-        # TODO - If the targets have no modifiers, constraints or parent relationships that can cause problems,
-        # only move the target objects to improve performance.
-
-        object_transform.MoveAllFailsafe(context, export_task["origin_object"], 
-            export_task["origin_object_loc"]['location'])
+    if export_task.get("origin_record") is not None:
+        object_transform.RestoreRelocatedObjects(context, export_task["origin_record"])
+        export_task["origin_record"] = None
 
     # Cleans up any armature constraint modification (only works if Preserve Armature Constraints is off)
-    if export_task['export_preset'].preserve_armature_constraints == True:
+    if export_task.get('armature_record') is not None:
         record_utils.RestoreArmatureConstraints(context, export_task['armature_record'])
+        export_task['armature_record'] = None
 
 
 
@@ -559,15 +928,15 @@ def GetOriginObjectLocation(context, export_name, origin_target):
     result['location'] = [0.0, 0.0, 0.0]
     result['rotation'] = [0.0, 0.0, 0.0]
 
-    # TODO - Does this need changing in any substantial way?
-
     temp_rol = loc_utils.FindWorldSpaceObjectLocation(context, origin_target)
     result['location'] = [temp_rol[0], 
                             temp_rol[1], 
                             temp_rol[2]]
-    result['rotation'] = [origin_target.rotation_euler[0], 
-                            origin_target.rotation_euler[1], 
-                            origin_target.rotation_euler[2]]
+    
+    temp_rot = loc_utils.FindWorldSpaceObjectRotation(context, origin_target)
+    result['rotation'] = [temp_rot[0], 
+                            temp_rot[1], 
+                            temp_rot[2]]
     
     #print('found root location : ', result['location'])
     
@@ -629,6 +998,43 @@ def GetExportSummary(stats):
             output += str(total_hide_count) + " file was not"
         
         output += " exported as their contents were hidden from the Render."
+    
+    if stats['skipped_unchanged'] > 0:
+        output += "  "
+        if stats['skipped_unchanged'] > 1:
+            output += str(stats['skipped_unchanged']) + " files were skipped"
+        else:
+            output += str(stats['skipped_unchanged']) + " file was skipped"
+        
+        output += " as nothing changed since the last export."
+    
+    if stats['files_unchanged'] > 0:
+        output += "  "
+        if stats['files_unchanged'] > 1:
+            output += str(stats['files_unchanged']) + " files were"
+        else:
+            output += str(stats['files_unchanged']) + " file was"
+        
+        output += " identical to the existing file and left untouched."
+    
+    if stats['files_pruned'] > 0:
+        output += "  "
+        if stats['files_pruned'] > 1:
+            output += str(stats['files_pruned']) + " old files were"
+        else:
+            output += str(stats['files_pruned']) + " old file was"
+        
+        output += " pruned as nothing exports them anymore."
+    
+    if stats['failed_workers'] > 0:
+        output_status = 'WARNING'
+        output += "  "
+        if stats['failed_workers'] > 1:
+            output += str(stats['failed_workers']) + " export workers failed"
+        else:
+            output += str(stats['failed_workers']) + " export worker failed"
+        
+        output += ", check the console for details."
 
     return [output_status, output]
 
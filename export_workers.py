@@ -0,0 +1,142 @@
+# ///////////////////////////////////////////////////////////////////
+# Splits export tasks across background Blender processes.
+# ///////////////////////////////////////////////////////////////////
+
+import bpy, json, os, shutil, subprocess, tempfile, time
+
+# The timers and file counts that workers report back and are added to the main export statistics.
+# Export counts aren't merged as they're already counted when the tasks are built.
+WORKER_STAT_KEYS = ('export_task_process_time', 'export_pack_script_time', 'export_task_api_time',
+    'files_written', 'files_unchanged')
+
+
+def CanUseExportWorkers(context):
+    """
+    Returns True if export tasks can be sent to worker processes.  Workers open the saved
+    blend file, so it must be saved with no unsaved changes.
+    """
+
+    addon_prefs = context.preferences.addons[__package__].preferences
+
+    if addon_prefs.export_workers <= 1:
+        return False
+
+    # Workers are background processes themselves, so this prevents them from creating their own.
+    if bpy.app.background is True:
+        return False
+
+    if bpy.data.filepath == "" or bpy.data.is_dirty is True:
+        print("Capsule - The blend file has unsaved changes, exporting without workers.")
+        return False
+
+    return True
+
+
+def BuildWorkerCommand(context, export_tasks, stats_path, output_root):
+    """
+    Builds the command line that runs a background Blender process to export the given tasks.
+    """
+
+    object_names = [t['source'].name for t in export_tasks if t['export_type'] == 'OBJECT']
+    collection_names = [t['source'].name for t in export_tasks if t['export_type'] == 'COLLECTION']
+
+    command = [bpy.app.binary_path, "-b", bpy.data.filepath, "--addons", __package__,
+        "--python-expr", "import sys, " + __package__ + ".export_cli as cli; sys.exit(cli.main())",
+        "--", "--scene", context.scene.name, "--stats-file", stats_path, "--ignore-export-cache", "--worker"]
+
+    if len(object_names) > 0:
+        command += ["--objects"] + object_names
+    if len(collection_names) > 0:
+        command += ["--collections"] + collection_names
+    if output_root is not None:
+        command += ["--output-root", output_root]
+
+    return command
+
+
+def MergeWorkerStats(export_stats, stats_path):
+    """
+    Adds the statistics reported by a worker to the main export statistics.
+    """
+
+    with open(stats_path, 'r', encoding = 'utf-8') as stats_file:
+        worker_stats = json.load(stats_file)
+
+    for key in WORKER_STAT_KEYS:
+        export_stats[key] += worker_stats.get(key, 0)
+    
+    export_stats['task_profiles'] += worker_stats.get('task_profiles', [])
+    export_stats['manifest_entries'] += worker_stats.get('manifest_entries', [])
+
+
+def RunExportWorkers(context, export_tasks, export_stats, output_root = None):
+    """
+    Exports the given tasks in chunks across several background Blender processes.
+    Returns the list of tasks that were exported successfully.
+    """
+
+    addon_prefs = context.preferences.addons[__package__].preferences
+    worker_count = addon_prefs.export_workers
+    chunk_size = addon_prefs.export_worker_chunk_size
+
+    chunks = [export_tasks[i:i + chunk_size] for i in range(0, len(export_tasks), chunk_size)]
+    pending = list(enumerate(chunks))
+    running = []
+    exported_tasks = []
+    finished_count = 0
+
+    print(">> EXPORTING WITH", min(worker_count, len(chunks)), "WORKERS <<")
+
+    work_directory = tempfile.mkdtemp(prefix = "capsule_workers_")
+    window_manager = context.window_manager
+    window_manager.progress_begin(0, len(chunks))
+
+    try:
+        while len(pending) > 0 or len(running) > 0:
+
+            # Keep every worker busy while there are chunks left.
+            while len(pending) > 0 and len(running) < worker_count:
+                index, chunk = pending.pop(0)
+                stats_path = os.path.join(work_directory, "worker_%d.json" % index)
+                log_path = os.path.join(work_directory, "worker_%d.log" % index)
+
+                log_file = open(log_path, 'w', encoding = 'utf-8')
+                process = subprocess.Popen(BuildWorkerCommand(context, chunk, stats_path, output_root),
+                    stdout = log_file, stderr = subprocess.STDOUT)
+                running.append({'process': process, 'chunk': chunk, 'stats_path': stats_path,
+                    'log_path': log_path, 'log_file': log_file})
+
+            time.sleep(0.05)
+
+            for worker in [w for w in running if w['process'].poll() is not None]:
+                running.remove(worker)
+                worker['log_file'].close()
+                finished_count += 1
+                window_manager.progress_update(finished_count)
+
+                if worker['process'].returncode == 0 and os.path.isfile(worker['stats_path']):
+                    MergeWorkerStats(export_stats, worker['stats_path'])
+                    exported_tasks += worker['chunk']
+                    continue
+
+                # Failed chunks shouldn't be counted as exported.
+                export_stats['failed_workers'] += 1
+                for export_task in worker['chunk']:
+                    if export_task['export_type'] == 'OBJECT':
+                        export_stats['obj_exported'] -= 1
+                    else:
+                        export_stats['col_exported'] -= 1
+
+                print("Capsule Error - An export worker failed, here's what it reported:")
+                with open(worker['log_path'], 'r', encoding = 'utf-8', errors = 'replace') as log_file:
+                    print(log_file.read())
+
+    finally:
+        for worker in running:
+            worker['process'].kill()
+            worker['log_file'].close()
+
+        window_manager.progress_end()
+        shutil.rmtree(work_directory, ignore_errors = True)
+
+    return exported_tasks
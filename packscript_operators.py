@@ -100,17 +100,7 @@ class CAPSULE_OT_PackScript_CreateTest(Operator):
 
         
         # ////////////////////////////////////////////
-        # SEARCH DEPENDENCIES
-
-        # object_tree = search_utils.GetObjectReferenceTree(targets)
-
-        # search_utils.FindObjectDependencies(context, object_tree)
-        
-        # Another rudimentary test script?  idk what this is.
-        # print(object_tree)
-        # print([m for m in bpy.data.materials 
-        #        if target_object.user_of_id(m)])
-
+        # DUPLICATE TARGETS
         duplicates = []
         
         if self.set_mode == 'ACTIVE_OBJECT':
@@ -196,10 +186,14 @@ class CAPSULE_OT_PackScript_DestroyTest(Operator):
         purge_objects = set(o.data for o in context.selected_objects if o.data)
         purge_collections = search_utils.GetSceneCollections(context.scene)
 
+        # The test copies materials and other datablocks, which are removed if nothing outside the test uses them.
+        reference_index = search_utils.BuildReferenceIndex()
+        purge_objects |= search_utils.FindUnsharedDependencies(reference_index, test_scene.objects)
+
         # batch_remove is experimental and won't stop you from potentially destroying things.  Be careful!
-        # ISSUE - Purging doesn't clear datablocks like Materials
         bpy.data.batch_remove(purge_objects)
         bpy.data.batch_remove(purge_collections)
+        search_utils.ClearSceneCollectionIndexes()
         bpy.ops.scene.delete()
         context.window.scene = scene_before_test
 
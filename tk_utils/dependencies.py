@@ -1,199 +1,325 @@
 import bpy
 
-def SearchModifiers(target, currentList):
+# The dependency graphs of each scene, stored by scene pointer.
+dependency_graphs = {}
+
+# The names of the pointer properties that can reference objects or collections, for each type of struct.
+pointer_properties = {}
+
+# While held, scene changes don't clear the dependency graphs.  Exports hold them, as the changes they make 
+# to the scene don't change what depends on what.
+graph_state = {'held': False}
+
+
+# ////////////////////////////////////////
+# REFERENCE SEARCHING
+
+def GetPointerProperties(struct):
+    """
+    Returns the names of every property in a struct that points to an object, and every one that points to a collection.
+    These are found once for every type of struct and then reused.
+    """
+
+    identifier = struct.bl_rna.identifier
+    result = pointer_properties.get(identifier)
+    if result is not None:
+        return result
+
+    object_props = []
+    collection_props = []
+
+    for prop in struct.bl_rna.properties:
+        if prop.type != 'POINTER' or prop.fixed_type is None:
+            continue
+
+        if prop.fixed_type.identifier == 'Object':
+            object_props.append(prop.identifier)
+        elif prop.fixed_type.identifier == 'Collection':
+            collection_props.append(prop.identifier)
+
+    result = [object_props, collection_props]
+    pointer_properties[identifier] = result
+    return result
+
+
+def SearchPointers(struct, found):
+    """
+    Adds every object the struct points to, and every object in any collection it points to, to the found set.
+    """
+
+    object_props, collection_props = GetPointerProperties(struct)
+
+    for prop in object_props:
+        item = getattr(struct, prop, None)
+        if item is not None:
+            found.add(item)
+
+    for prop in collection_props:
+        collection = getattr(struct, prop, None)
+        if collection is not None:
+            found.update(collection.all_objects)
+
+
+def SearchIDValue(value, found):
+    """
+    Adds an object, or the objects in a collection, to the found set.
+    """
+
+    if isinstance(value, bpy.types.Object):
+        found.add(value)
+    elif isinstance(value, bpy.types.Collection):
+        found.update(value.all_objects)
+
+
+def SearchNodeTree(node_tree, found, searched_trees):
     """
-    Searches and returns a list of objects that were found as targets or that were linked 
-    to any of the modifiers the target object has.
+    Adds every object and collection used by the unlinked sockets of a node tree and any
+    node groups inside it to the found set.
     """
 
-    #print(">>> Searching Modifiers <<<")
-    #print(">>> Searching Modifiers <<<")
+    if node_tree is None or node_tree in searched_trees:
+        return
 
-    object_list = []
+    searched_trees.add(node_tree)
 
-    mod_types = {'ARRAY', 
-                 'BOOLEAN', 
-                 'MIRROR', 
-                 'SCREW', 
-                 'ARMATURE', 
-                 'CAST', 
-                 'CURVE', 
-                 'HOOK', 
-                 'LATTICE', 
-                 'MESH_DEFORM', 
-                 'SHRINKWRAP', 
-                 'SIMPLE_DEFORM', 
-                 'WARP', 
-                 'WAVE'}
+    for node in node_tree.nodes:
+        for socket in node.inputs:
+            if socket.type in {'OBJECT', 'COLLECTION'} and socket.is_linked is False:
+                SearchIDValue(socket.default_value, found)
 
-    # This is used to define all modifiers that share the same object location property
-    mod_normal_types = {'BOOLEAN', 'SCREW', 'ARMATURE', 'CAST', 'CURVE', 'HOOK', 'LATTICE', 'MESH_DEFORM'}
+        if node.type == 'GROUP':
+            SearchNodeTree(node.node_tree, found, searched_trees)
+
+
+def SearchModifiers(target, currentList):
+    """
+    Searches and returns a list of objects that were found as targets or that were linked
+    to any of the modifiers the target object has, including Geometry Nodes inputs.
+    Objects already in currentList are skipped, and new ones are added to it.
+    """
+
+    found = set()
+    searched_trees = set()
 
-    #Finds all the components in the object through modifiers that use objects
     for modifier in target.modifiers:
-        if modifier.type in mod_types:
-            #print("Modifier Found...", modifier)
-
-            #Normal Object Types
-            if modifier.type in mod_normal_types:
-                if modifier.object is not None:
-                    #print("Object Found In", modifier.name, ":", modifier.object.name)
-
-                    # Find out if this object matches others in the list before adding it.
-                    if (modifier.object in currentList) == False:
-                        #print("Object successfully added.")
-                        object_list.append(modifier.object)
-                        currentList.append(modifier.object)
-
-            #Array
-            elif modifier.type == 'ARRAY':
-                if modifier.start_cap is not None:
-                    #print("Object Found In", modifier.name, ":", modifier.start_cap.name)
-
-                    if (modifier.start_cap in currentList) == False:
-                        #print("Object successfully added.")
-                        object_list.append(modifier.start_cap)
-                        currentList.append(modifier.start_cap)
-
-            #Mirror
-            elif modifier.type == 'MIRROR':
-                if modifier.mirror_object is not None:
-                    #print("Object Found In", modifier.name, ":", modifier.mirror_object.name)
-
-                    if (modifier.mirror_object in currentList) == False:
-                        #print("Object successfully added.")
-                        object_list.append(modifier.mirror_object)
-                        currentList.append(modifier.mirror_object)
-
-            #Shrinkwrap
-            elif modifier.type == 'SHRINKWRAP':
-                if modifier.target is not None:
-                    #print("Object Found In", modifier.name, ":", modifier.target.name)
-
-                    if (modifier.target in currentList) == False:
-                        #print("Object successfully added.")
-                        object_list.append(modifier.target)
-                        currentList.append(modifier.target)
-
-            #Simple Deform
-            elif modifier.type == 'SIMPLE_DEFORM':
-                if modifier.origin is not None:
-                    #print("Object Found In", modifier.name, ":", modifier.origin.name)
-
-                    if (modifier.origin in currentList) == False:
-                        #print("Object successfully added.")
-                        object_list.append(modifier.origin)
-                        currentList.append(modifier.origin)
-
-            #Warp
-            elif modifier.type == 'WARP':
-                if modifier.object_from is not None:
-                    #print("Object Found In", modifier.name, ":", modifier.object_from.name)
-
-                    if (modifier.object_from in currentList) == False:
-                        #print("Object successfully added.")
-                        object_list.append(modifier.object_from)
-                        currentList.append(modifier.object_from)
-
-                if modifier.object_to is not None:
-                    #print("Object Found In", modifier.name, ":", modifier.object_to.name)
-
-                    if (modifier.object_to in currentList) == False:
-                        #print("Object successfully added.")
-                        object_list.append(modifier.object_to)
-                        currentList.append(modifier.object_to)
-
-            #Wave
-            elif modifier.type == 'WAVE':
-                if modifier.start_position_object is not None:
-                    #print("Object Found In", modifier.name, ":", modifier.start_position_object.name)
-
-                    if (modifier.start_position_object in currentList) == False:
-                        #print("Object successfully added.")
-                        object_list.append(modifier.start_position_object)
-                        currentList.append(modifier.start_position_object)
+        SearchPointers(modifier, found)
+
+        # Geometry Nodes inputs are stored as custom properties on the modifier.
+        if modifier.type == 'NODES':
+            for key in modifier.keys():
+                SearchIDValue(modifier[key], found)
 
+            SearchNodeTree(modifier.node_group, found, searched_trees)
+
+    found.discard(target)
+    object_list = [item for item in found if item not in currentList]
+    currentList += object_list
 
     return object_list
 
-def SearchConstraints(target, currentList):
+
+def SearchConstraintList(constraints, found):
     """
-    Searches and returns a list of objects that have been found as targets.
+    Adds every object targeted by a list of object or bone constraints to the found set.
     """
 
-    #print(">>> Searching Constraints <<<")
-    #print(">>> Searching Constraints <<<")
+    for constraint in constraints:
+        SearchPointers(constraint, found)
+
+        # Armature constraints store their targets in a list.
+        if constraint.type == 'ARMATURE':
+            for con_target in constraint.targets:
+                if con_target.target is not None:
+                    found.add(con_target.target)
 
-    object_list = []
 
-    con_types_target = {'COPY_LOCATION', 
-                        'COPY_ROTATION', 
-                        'COPY_SCALE', 
-                        'COPY_TRANSFORMS', 
-                        'LIMIT_DISTANCE', 
-                        'TRANSFORM', 
-                        'CLAMP_TO', 
-                        'DAMPED_TRACK', 
-                        'LOCKED_TRACK', 
-                        'STRETCH_TO', 
-                        'TRACK_TO', 
-                        'ACTION', 
-                        'FLOOR', 
-                        'FOLLOW_PATH', 
-                        'PIVOT', 
-                        'SHRINKWRAP'}
+def SearchConstraints(target, currentList):
+    """
+    Searches and returns a list of objects that have been found as targets of the object's constraints,
+    or the constraints of its pose bones.
+    Objects already in currentList are skipped, and new ones are added to it.
+    """
 
-    con_types_alt = {'RAWR'}
+    found = set()
+    SearchConstraintList(target.constraints, found)
 
-    for constraint in target.constraints:
-        #Normal Object Types
-        if constraint.type in con_types_target:
-            if constraint.target is not None:
-                #print("Object Found In", constraint.name, ":", constraint.target.name)
+    if target.pose is not None:
+        for pose_bone in target.pose.bones:
+            SearchConstraintList(pose_bone.constraints, found)
 
-                if (constraint.target in currentList) == False:
-                    #print("Object successfully added.")
-                    object_list.append(constraint.target)
-                    currentList.append(constraint.target)
+    found.discard(target)
+    object_list = [item for item in found if item not in currentList]
+    currentList += object_list
 
     return object_list
 
-def GetDependencies(object_list):
+
+def SearchDrivers(target, currentList):
     """
-    Searches and returns a list of all objects that the given objects are dependant on for modifiers or constraints.
+    Searches and returns a list of objects used as driver targets by the object, its data or its shape keys.
+    Objects already in currentList are skipped, and new ones are added to it.
     """
 
-    #print(">>> Getting Dependencies <<<")
+    found = set()
+    driven = [target, target.data]
 
-    totalFoundList = []
-    totalFoundList += object_list
+    shape_keys = getattr(target.data, 'shape_keys', None)
+    if shape_keys is not None:
+        driven.append(shape_keys)
 
-    #print("object_list...", object_list)
+    for item in driven:
+        animation_data = getattr(item, 'animation_data', None)
+        if animation_data is None:
+            continue
 
-    checkedList = []
-    currentList = []
+        for fcurve in animation_data.drivers:
+            for variable in fcurve.driver.variables:
+                for var_target in variable.targets:
+                    SearchIDValue(var_target.id, found)
+
+    found.discard(target)
+    object_list = [item for item in found if item not in currentList]
     currentList += object_list
 
-    while len(currentList) != 0:
-        item = currentList.pop()
-        #print("Checking new objects...", item.name)
+    return object_list
+
+
+def FindObjectReferences(target):
+    """
+    Returns the set of objects the target directly depends on through its parent, modifiers, constraints and drivers.
+    """
+
+    references = []
+
+    # Parents can affect the export indirectly, so it needs to be looked at.
+    if target.parent is not None:
+        references.append(target.parent)
+
+    SearchModifiers(target, references)
+    SearchConstraints(target, references)
+    SearchDrivers(target, references)
 
-        modifierOutput = SearchModifiers(item, totalFoundList)
-        constraintOutput = SearchConstraints(item, totalFoundList)
+    return set(references)
 
-        currentList += modifierOutput
-        currentList += constraintOutput
 
-        checkedList.append(item)
-        totalFoundList.append(item)
+# ////////////////////////////////////////
+# DEPENDENCY GRAPH
 
-        # Parents can affect the export indirectly, so it needs to be looked at.
-        if item.parent != None:
-            if (item.parent in totalFoundList) is False:
-                #print("Parent found in", item.name, ":", item.parent.name)
-                currentList.append(item.parent)
+def BuildDependencyGraph(scene):
+    """
+    Builds a graph of which objects in the scene depend on which, in a single pass over the scene.
+    """
+
+    graph = {}
+    graph['depends_on'] = {}
+    graph['dependants'] = {}
+
+    for item in scene.objects:
+        AddGraphObject(graph, item)
+
+    return graph
+
+
+def AddGraphObject(graph, target):
+    """
+    Adds an object and the objects it references to a dependency graph, if it isn't already in it.
+    Objects outside the scene the graph was built for are added when a closure first reaches them.
+    """
+
+    if target in graph['depends_on']:
+        return
+
+    references = FindObjectReferences(target)
+    graph['depends_on'][target] = references
+
+    for reference in references:
+        graph['dependants'].setdefault(reference, set()).add(target)
+
+
+def GetDependencyGraph(scene, rebuild = False):
+    """
+    Returns the dependency graph of a scene, building it if it doesn't exist yet or if rebuild is True.
+    """
+
+    key = scene.as_pointer()
+    graph = dependency_graphs.get(key)
+
+    if graph is None or rebuild is True:
+        graph = BuildDependencyGraph(scene)
+        dependency_graphs[key] = graph
+
+    return graph
+
+
+def ClearDependencyGraphs():
+    """
+    Removes every stored dependency graph, so they're built again the next time they're needed.
+    """
+
+    dependency_graphs.clear()
+
+
+def HoldDependencyGraphs(held):
+    """
+    Stops or allows scene changes clearing the stored dependency graphs.
+    """
+
+    graph_state['held'] = held
+
+
+def IsHoldingDependencyGraphs():
+    """
+    Returns True if scene changes shouldn't clear the stored dependency graphs.
+    """
+
+    return graph_state['held']
+
+
+def GetClosure(graph, object_list, edges):
+    """
+    Returns the given objects and every object reachable from them through the given edges of a dependency graph.
+    """
+
+    found = set(object_list)
+    result = list(found)
+    stack = list(found)
+
+    while len(stack) > 0:
+        item = stack.pop()
+
+        if edges == 'depends_on':
+            AddGraphObject(graph, item)
+
+        for linked in graph[edges].get(item, ()):
+            if linked not in found:
+                found.add(linked)
+                result.append(linked)
+                stack.append(linked)
+
+    return result
+
+
+def GetDependencies(object_list, graph = None):
+    """
+    Searches and returns a list of the given objects and all objects that they are dependant on
+    for parents, modifiers, constraints or drivers.
+    - graph: The dependency graph to search.  If None, the graph for the current scene is used.
+    """
+
+    if graph is None:
+        graph = GetDependencyGraph(bpy.context.scene)
+
+    return GetClosure(graph, object_list, 'depends_on')
+
+
+def GetDependants(object_list, graph = None):
+    """
+    Searches and returns a list of the given objects and all objects that depend on them
+    for parents, modifiers, constraints or drivers.
+    - graph: The dependency graph to search.  If None, the graph for the current scene is used.
+    """
 
-    #print("Total found objects...", len(checkedList))
-    #print("Total found objects...", len(checkedList))
+    if graph is None:
+        graph = GetDependencyGraph(bpy.context.scene)
 
-    return checkedList
\ No newline at end of file
+    return GetClosure(graph, object_list, 'dependants')
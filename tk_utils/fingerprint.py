@@ -0,0 +1,467 @@
+
+# ///////////////////////////////////////////////////////////////////
+# Fingerprints export tasks so that unchanged exports can be skipped.
+# ///////////////////////////////////////////////////////////////////
+
+import bpy, hashlib, json, os
+
+from array import array
+
+# Bump this whenever the fingerprint contents change, so old caches are ignored.
+FINGERPRINT_VERSION = 3
+
+# How each type of mesh attribute is read with foreach_get - the property name, values per item and array typecode.
+ATTRIBUTE_LAYOUTS = {
+    'FLOAT': ('value', 1, 'f'),
+    'INT': ('value', 1, 'i'),
+    'INT8': ('value', 1, 'i'),
+    'BOOLEAN': ('value', 1, 'b'),
+    'FLOAT2': ('vector', 2, 'f'),
+    'INT32_2D': ('value', 2, 'i'),
+    'FLOAT_VECTOR': ('vector', 3, 'f'),
+    'FLOAT_COLOR': ('color', 4, 'f'),
+    'BYTE_COLOR': ('color', 4, 'f'),
+    'QUATERNION': ('value', 4, 'f'),
+    'FLOAT4X4': ('value', 16, 'f'),
+}
+
+# Object types whose geometry is exported as a mesh, so they're hashed by converting them to one.
+MESH_CONVERTIBLE_TYPES = {'CURVE', 'SURFACE', 'FONT', 'META'}
+
+# Object types whose geometry can't be hashed, so tasks that export them are never skipped.
+UNHASHED_TYPES = {'CURVES', 'POINTCLOUD', 'VOLUME', 'GREASEPENCIL', 'GPENCIL'}
+
+
+def GetExportCachePath():
+    """
+    Returns the path of the export cache that sits alongside the current blend file,
+    or None if the blend file hasn't been saved yet.
+    """
+
+    if bpy.data.filepath == "":
+        return None
+
+    return os.path.splitext(bpy.data.filepath)[0] + ".capsule_cache.json"
+
+
+def LoadExportCache():
+    """
+    Loads the export cache for the current blend file.  Returns None if the blend file
+    hasn't been saved, as there is nowhere to keep the cache.
+    """
+
+    cache_path = GetExportCachePath()
+    if cache_path is None:
+        return None
+
+    cache = {}
+    cache['path'] = cache_path
+    cache['entries'] = {}
+    cache['memo'] = {}
+
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, 'r', encoding = 'utf-8') as cache_file:
+                data = json.load(cache_file)
+
+            if data.get('version') == FINGERPRINT_VERSION:
+                cache['entries'] = data.get('entries', {})
+
+        except (OSError, ValueError):
+            print("Capsule couldn't read the export cache, all tasks will be exported.")
+
+    return cache
+
+
+def SaveExportCache(cache):
+    """
+    Writes the export cache back to disk alongside the blend file.
+    """
+
+    data = {}
+    data['version'] = FINGERPRINT_VERSION
+    data['entries'] = cache['entries']
+
+    # Write to a temporary file first so a failed write can't corrupt the cache.
+    temp_path = cache['path'] + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding = 'utf-8') as cache_file:
+            json.dump(data, cache_file, indent = 1, sort_keys = True)
+        os.replace(temp_path, cache['path'])
+
+    except OSError as e:
+        print("Capsule couldn't save the export cache - ", e)
+
+
+def IsTaskUnchanged(cache, file_path, fingerprint):
+    """
+    Returns True if the given file was produced by a task with the same fingerprint
+    and hasn't been modified or removed since.
+    """
+
+    entry = cache['entries'].get(file_path)
+    if fingerprint is None or entry is None or entry['fingerprint'] != fingerprint:
+        return False
+
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return False
+
+    return stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime']
+
+
+def UpdateExportCache(cache, file_path, fingerprint):
+    """
+    Records the fingerprint of a task that has just been exported to the given file.
+    Tasks without a fingerprint aren't recorded, as they're always exported.
+    """
+
+    if fingerprint is None:
+        cache['entries'].pop(file_path, None)
+        return
+
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        cache['entries'].pop(file_path, None)
+        return
+
+    entry = {}
+    entry['fingerprint'] = fingerprint
+    entry['size'] = stat.st_size
+    entry['mtime'] = stat.st_mtime_ns
+    cache['entries'][file_path] = entry
+
+
+def BuildTaskFingerprint(context, export_task, format_data, file_path, cache):
+    """
+    Builds a hash of everything that can change the contents of an export task's file -
+    the targets and their evaluated state, the export preset, the format data,
+    the pack script and the resolved file path.
+
+    Returns None if any target can't be hashed, so the task is always exported.
+    """
+
+    hasher = hashlib.sha1()
+    memo = cache['memo']
+    export_preset = export_task['export_preset']
+
+    if 'depsgraph' not in memo:
+        memo['depsgraph'] = context.evaluated_depsgraph_get()
+        memo['materials'] = {}
+        memo['images'] = {}
+
+    HashValue(hasher, FINGERPRINT_VERSION)
+    HashValue(hasher, file_path)
+    HashValue(hasher, export_task['export_name'])
+
+    # Preset and format settings
+    HashPropertyGroup(hasher, export_preset)
+    HashPropertyGroup(hasher, format_data)
+
+    if export_task['pack_script'] is not None:
+        HashValue(hasher, export_task['pack_script'].as_string())
+
+    if export_preset.export_animation is True:
+        scene = context.scene
+        HashValue(hasher, (scene.frame_start, scene.frame_end, scene.frame_step,
+                           scene.render.fps, scene.render.fps_base))
+
+    # Origin settings move the targets before exporting, so the origin object's placement changes the file too.
+    if export_task['export_type'] == 'COLLECTION':
+        HashValue(hasher, export_task['source'].CAPCol.origin_point)
+    else:
+        HashValue(hasher, export_task['source'].CAPObj.origin_point)
+
+    origin_object = export_task['origin_object']
+    if origin_object is not None:
+        HashValue(hasher, (origin_object.name, [tuple(row) for row in origin_object.matrix_world]))
+    else:
+        HashValue(hasher, None)
+
+    # Targets
+    for target in sorted(export_task['targets'], key = lambda o: o.name):
+        if HashObject(hasher, target, export_preset, memo) is False:
+            return None
+
+    return hasher.hexdigest()
+
+
+def HashObject(hasher, target, export_preset, memo):
+    """
+    Adds the state of a single export target to the hash.
+    Returns False if the target has geometry that can't be hashed.
+    """
+
+    HashValue(hasher, (target.name, target.type))
+    HashValue(hasher, [tuple(row) for row in target.matrix_world])
+    HashValue(hasher, target.parent.name if target.parent is not None else None)
+    HashCustomProperties(hasher, target)
+
+    for modifier in target.modifiers:
+        HashPropertyGroup(hasher, modifier)
+
+    for slot in target.material_slots:
+        HashMaterial(hasher, slot.material, memo)
+
+    if export_preset.export_animation is True:
+        HashAnimation(hasher, target.animation_data)
+
+    if target.data is None:
+        return True
+
+    if target.type in UNHASHED_TYPES:
+        return False
+
+    # Use the evaluated mesh if modifiers are being applied, as that's what gets exported.
+    if target.type == 'MESH':
+        mesh = target.data
+        if export_preset.apply_modifiers is True:
+            mesh = target.evaluated_get(memo['depsgraph']).data
+        HashMesh(hasher, mesh)
+
+        if len(target.vertex_groups) > 0:
+            HashVertexWeights(hasher, target, mesh)
+
+    elif target.type == 'ARMATURE':
+        HashCollection(hasher, target.data.bones, 'head_local', 3)
+        HashCollection(hasher, target.data.bones, 'tail_local', 3)
+        HashCollection(hasher, target.pose.bones, 'matrix_basis', 16)
+
+    # Curves and text are exported as meshes, so the mesh they evaluate to is hashed along with their settings.
+    elif target.type in MESH_CONVERTIBLE_TYPES:
+        HashPropertyGroup(hasher, target.data)
+
+        evaluated = target.evaluated_get(memo['depsgraph'])
+        mesh = evaluated.to_mesh()
+        if mesh is not None:
+            HashMesh(hasher, mesh)
+        evaluated.to_mesh_clear()
+
+    else:
+        HashPropertyGroup(hasher, target.data)
+    
+    return True
+
+
+def HashMesh(hasher, mesh):
+    """
+    Adds the geometry, attributes and custom normals of a mesh to the hash.
+    """
+
+    HashValue(hasher, (len(mesh.vertices), len(mesh.edges), len(mesh.polygons), len(mesh.loops)))
+    HashCollection(hasher, mesh.vertices, 'co', 3)
+    HashCollection(hasher, mesh.loops, 'vertex_index', 1, 'i')
+    HashCollection(hasher, mesh.polygons, 'loop_total', 1, 'i')
+    HashCollection(hasher, mesh.polygons, 'material_index', 1, 'i')
+    HashCollection(hasher, mesh.polygons, 'use_smooth', 1, 'b')
+
+    for uv_layer in mesh.uv_layers:
+        HashValue(hasher, uv_layer.name)
+        HashCollection(hasher, uv_layer.data, 'uv', 2)
+
+    # Attributes starting with a dot are internal, like selection and topology that's already hashed.
+    for attribute in mesh.attributes:
+        if attribute.name.startswith('.'):
+            continue
+
+        HashValue(hasher, (attribute.name, attribute.domain, attribute.data_type))
+
+        layout = ATTRIBUTE_LAYOUTS.get(attribute.data_type)
+        if layout is not None:
+            HashCollection(hasher, attribute.data, layout[0], layout[1], layout[2])
+
+    if mesh.has_custom_normals is True:
+        HashCollection(hasher, mesh.corner_normals, 'vector', 3)
+
+    if mesh.shape_keys is not None:
+        for key_block in mesh.shape_keys.key_blocks:
+            HashValue(hasher, (key_block.name, key_block.value, key_block.mute))
+            HashCollection(hasher, key_block.data, 'co', 3)
+
+
+def HashVertexWeights(hasher, target, mesh):
+    """
+    Adds the vertex group names of an object and the vertex weights of its mesh to the hash.
+    """
+
+    HashValue(hasher, [group.name for group in target.vertex_groups])
+
+    # Each vertex can belong to any number of groups, so the end of each vertex is marked with -1.
+    groups = array('i')
+    weights = array('f')
+
+    for vertex in mesh.vertices:
+        for element in vertex.groups:
+            groups.append(element.group)
+            weights.append(element.weight)
+        groups.append(-1)
+
+    hasher.update(groups.tobytes())
+    hasher.update(weights.tobytes())
+
+
+def HashMaterial(hasher, material, memo):
+    """
+    Adds a material and the input values of its node tree to the hash.
+    Material hashes are memoized as they're commonly shared between targets.
+    """
+
+    if material is None:
+        HashValue(hasher, None)
+        return
+
+    material_hash = memo['materials'].get(material.name)
+    if material_hash is None:
+        material_hasher = hashlib.sha1()
+        HashPropertyGroup(material_hasher, material)
+
+        if material.node_tree is not None:
+            for node in material.node_tree.nodes:
+                HashValue(material_hasher, (node.name, node.bl_idname))
+                HashPropertyGroup(material_hasher, node)
+
+                if getattr(node, 'image', None) is not None:
+                    HashValue(material_hasher, HashImage(node.image, memo))
+
+                for socket in node.inputs:
+                    if hasattr(socket, 'default_value'):
+                        HashValue(material_hasher, ValueToHashable(socket.default_value))
+
+            for link in material.node_tree.links:
+                HashValue(material_hasher, (link.from_node.name, link.from_socket.identifier,
+                                            link.to_node.name, link.to_socket.identifier))
+
+        material_hash = material_hasher.hexdigest()
+        memo['materials'][material.name] = material_hash
+
+    HashValue(hasher, material_hash)
+
+
+def HashImage(image, memo):
+    """
+    Returns a hash of an image's contents, so repainting or replacing a texture changes the fingerprint.
+    Packed images hash their packed data, unsaved edits hash their pixels, and everything else hashes
+    the file on disk by its path, size and modification time.
+    Image hashes are memoized as they're commonly shared between materials.
+    """
+
+    image_hash = memo['images'].get(image.name)
+    if image_hash is not None:
+        return image_hash
+
+    image_hasher = hashlib.sha1()
+    HashValue(image_hasher, (image.name, image.source, image.filepath))
+
+    if image.packed_file is not None:
+        image_hasher.update(image.packed_file.data)
+
+    elif image.is_dirty is True:
+        pixels = array('f', [0]) * len(image.pixels)
+        image.pixels.foreach_get(pixels)
+        image_hasher.update(pixels.tobytes())
+
+    else:
+        try:
+            stat = os.stat(bpy.path.abspath(image.filepath, library = image.library))
+            HashValue(image_hasher, (stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            HashValue(image_hasher, None)
+
+    image_hash = image_hasher.hexdigest()
+    memo['images'][image.name] = image_hash
+    return image_hash
+
+
+def HashAnimation(hasher, animation_data):
+    """
+    Adds the active action and its keyframes to the hash.
+    """
+
+    if animation_data is None or animation_data.action is None:
+        HashValue(hasher, None)
+        return
+
+    action = animation_data.action
+    HashValue(hasher, action.name)
+
+    for fcurve in action.fcurves:
+        HashValue(hasher, (fcurve.data_path, fcurve.array_index, fcurve.mute))
+        HashCollection(hasher, fcurve.keyframe_points, 'co', 2)
+        HashCollection(hasher, fcurve.keyframe_points, 'handle_left', 2)
+        HashCollection(hasher, fcurve.keyframe_points, 'handle_right', 2)
+
+
+def HashCollection(hasher, collection, attribute, size, typecode = 'f'):
+    """
+    Hashes a single attribute across every item in a Blender collection using foreach_get.
+    """
+
+    buffer = array(typecode, [0]) * (len(collection) * size)
+    collection.foreach_get(attribute, buffer)
+    hasher.update(buffer.tobytes())
+
+
+def HashPropertyGroup(hasher, data):
+    """
+    Hashes every readable, non-pointer RNA property of a datablock or property group.
+    IDs referenced by pointers are hashed by name.
+    """
+
+    for prop in data.bl_rna.properties:
+        if prop.identifier == 'rna_type' or prop.type == 'COLLECTION':
+            continue
+
+        value = getattr(data, prop.identifier, None)
+
+        if prop.type == 'POINTER':
+            if isinstance(value, bpy.types.ID):
+                HashValue(hasher, (prop.identifier, value.name))
+            continue
+
+        HashValue(hasher, (prop.identifier, ValueToHashable(value)))
+
+    # Geometry Nodes inputs and other custom data are stored as ID properties.
+    if hasattr(data, 'keys'):
+        HashCustomProperties(hasher, data)
+
+
+def HashCustomProperties(hasher, data):
+    """
+    Hashes the custom (ID) properties stored on a datablock or modifier.
+    """
+
+    for key in data.keys():
+        value = data[key]
+
+        if isinstance(value, bpy.types.ID):
+            value = value.name
+        elif hasattr(value, 'to_dict'):
+            value = value.to_dict()
+        elif hasattr(value, 'to_list'):
+            value = value.to_list()
+
+        HashValue(hasher, (key, value))
+
+
+def ValueToHashable(value):
+    """
+    Converts RNA property values into something with a stable repr().
+    """
+
+    if isinstance(value, set):
+        return sorted(value)
+
+    if hasattr(value, '__len__') and not isinstance(value, str):
+        try:
+            return tuple(ValueToHashable(v) for v in value)
+        except TypeError:
+            pass
+
+    return value
+
+
+def HashValue(hasher, value):
+    hasher.update(repr(value).encode('utf-8'))
+    hasher.update(b'\0')
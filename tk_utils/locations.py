@@ -1,72 +1,95 @@
-
 import bpy
 from math import pi, radians, degrees
 from mathutils import Vector
 
-from .select import FocusObject
-from .object_ops import SwitchObjectMode, Find3DViewContext
-
 #//////////////////// - BASIC DEFINITIONS - ///////////////////////
 
+# These read the evaluated world matrices directly, so they don't need a 3D View,
+# don't touch the 3D cursor or selection, and work in background mode.
+
 def FindWorldSpaceObjectLocation(context, target):
     """
     Finds the given object location in world space, NO MATTER WHAT THE CIRCUMSTANCES.
     """
 
-    # Preserve the current 3D cursor
-    cursor_loc = bpy.data.scenes[bpy.context.scene.name].cursor.location
-    previous_cursor_loc = [cursor_loc[0], cursor_loc[1], cursor_loc[2]]
+    # Ensures any pending changes (like muted constraints) are reflected in matrix_world.
+    context.view_layer.update()
+
+    return target.matrix_world.translation.copy()
 
-    override = Find3DViewContext()
 
-    with context.temp_override(window = override['window'], area = override['area'], 
-            region = override['region']):
-        
-        # Calculate the translation vector using the 3D cursor
-        FocusObject(target)
-        bpy.ops.view3d.snap_cursor_to_selected()
-        cursor_location = bpy.data.scenes[bpy.context.scene.name].cursor.location
+def FindWorldSpaceObjectLocations(context, targets):
+    """
+    Finds the world space location of every given object at once, returning a dictionary
+    of objects and their locations.  Only updates the scene once for the whole batch.
+    """
+
+    context.view_layer.update()
+
+    locations = {}
+    for target in targets:
+        locations[target] = target.matrix_world.translation.copy()
+
+    return locations
+
+
+def FindWorldSpaceObjectRotation(context, target):
+    """
+    Finds the given object rotation in world space as an Euler, using the object's own rotation order
+    where possible.
+    """
 
-        # Because vectors are pointers, we need to keep regenerating them
-        cursor_loc_copy = Vector((cursor_location[0], cursor_location[1], cursor_location[2]))
+    context.view_layer.update()
 
-        # Restore the original cursor location and matrix
-        bpy.data.scenes[bpy.context.scene.name].cursor.location = previous_cursor_loc
+    rotation_order = target.rotation_mode
+    if rotation_order in {'QUATERNION', 'AXIS_ANGLE'}:
+        rotation_order = 'XYZ'
+
+    return target.matrix_world.to_euler(rotation_order)
+
+
+def FindWorldSpaceObjectRotations(context, targets):
+    """
+    Finds the world space rotation of every given object at once, returning a dictionary
+    of objects and their rotations.  Only updates the scene once for the whole batch.
+    """
+
+    context.view_layer.update()
+
+    rotations = {}
+    for target in targets:
+        rotation_order = target.rotation_mode
+        if rotation_order in {'QUATERNION', 'AXIS_ANGLE'}:
+            rotation_order = 'XYZ'
+
+        rotations[target] = target.matrix_world.to_euler(rotation_order)
+
+    return rotations
 
-    return cursor_loc_copy
 
 def FindWorldSpaceBoneLocation(target, context, bone):
     """
     Finds the given bone location in world space, NO MATTER WHAT THE CIRCUMSTANCES.
     """
 
-    # Preserve the current 3D cursor
-    cursor_loc = bpy.data.scenes[bpy.context.scene.name].cursor.location
-    previous_cursor_loc = [cursor_loc[0], cursor_loc[1], cursor_loc[2]]
+    context.view_layer.update()
 
-    override = Find3DViewContext()
+    # Pose bone matrices are in armature space, the bone head is the translation component.
+    pose_bone = target.pose.bones[bone.name]
+    return (target.matrix_world @ pose_bone.matrix).translation.copy()
 
-    with context.temp_override(window = override['window'], area = override['area'], 
-            region = override['region']):
 
-        # Calculate the translation vector using the 3D cursor
-        bpy.ops.object.select_all(action= 'DESELECT')
-        prev_mode = SwitchObjectMode('POSE', target)
-        bpy.data.objects[target.name].data.bones.active = bpy.data.objects[target.name].pose.bones[bone.name].bone
-        bpy.ops.view3d.snap_cursor_to_selected()
-    
-    cursor_location = Vector((0.0, 0.0, 0.0))
-    cursor_location = bpy.context.scene.cursor.location
-
-    # Because vectors are pointers, we need to keep regenerating them
-    cursor_loc_copy = Vector((0.0, 0.0, 0.0))
-    cursor_loc_copy[0] = cursor_location[0]
-    cursor_loc_copy[1] = cursor_location[1]
-    cursor_loc_copy[2] = cursor_location[2]
+def FindWorldSpaceBoneLocations(target, context, bones):
+    """
+    Finds the world space location of every given bone in an armature at once, returning
+    a dictionary of bone names and their locations.
+    """
 
-    SwitchObjectMode(prev_mode, target)
+    context.view_layer.update()
 
-    # Restore the original cursor location and matrix
-    bpy.data.scenes[bpy.context.scene.name].cursor.location = previous_cursor_loc
+    locations = {}
+    for bone in bones:
+        pose_bone = target.pose.bones[bone.name]
+        locations[bone.name] = (target.matrix_world @ pose_bone.matrix).translation.copy()
 
-    return cursor_loc_copy
+    return locations
@@ -0,0 +1,269 @@
+# ///////////////////////////////////////////////////////////////////
+# Keeps a record of every file Capsule exports, alongside the blend file.
+# ///////////////////////////////////////////////////////////////////
+
+import bpy, json, os, shutil
+
+from datetime import datetime
+from . import staging
+
+# Bump this whenever the entry contents change, so old entries can be recognised.
+MANIFEST_VERSION = 2
+
+# A summary of the manifest for the current blend file, used by the manifest panel.
+last_summary = None
+
+
+def IsRecordingManifest(addon_prefs):
+    """
+    Returns True if exports should be recorded in the manifest, which pruning also relies on.
+    """
+
+    return addon_prefs.record_manifest is True or addon_prefs.prune_exports != 'OFF'
+
+
+def GetManifestPath():
+    """
+    Returns the path of the export manifest that sits alongside the current blend file,
+    or None if the blend file hasn't been saved yet.
+    """
+
+    if bpy.data.filepath == "":
+        return None
+
+    return os.path.splitext(bpy.data.filepath)[0] + ".capsule_manifest.jsonl"
+
+
+# ////////////////////////////////////////
+# RECORDING
+
+def CreateManifestEntry(export_task, file_path, output_files, duration):
+    """
+    Creates a manifest entry for a finished export task, as a plain dictionary that can be saved.
+    - output_files: The file records returned by staging.CommitStagedFiles, or a list of file paths if the
+      files weren't staged.
+    """
+
+    files = []
+    for output_file in output_files:
+        if isinstance(output_file, str):
+            if not os.path.isfile(output_file):
+                continue
+
+            output_file = {'path': output_file, 'size': os.path.getsize(output_file),
+                'hash': staging.HashFile(output_file), 'written': True}
+
+        files.append({'path': output_file['path'], 'size': output_file['size'], 'hash': output_file['hash'],
+            'written': output_file['written']})
+
+    entry = {}
+    entry['version'] = MANIFEST_VERSION
+    entry['source'] = export_task['source'].name
+    entry['scene'] = export_task.get('scene')
+    entry['source_type'] = export_task['export_type']
+    entry['export_preset'] = export_task['export_preset'].name
+    entry['location_preset'] = export_task['location_preset'].name
+    entry['format_type'] = export_task['export_preset'].format_type
+    entry['path'] = file_path
+    entry['size'] = sum(f['size'] for f in files)
+    entry['hash'] = next((f['hash'] for f in files if f['path'] == file_path), None)
+    entry['files'] = files
+    entry['output_root'] = export_task.get('output_root')
+    entry['duration'] = duration
+    entry['timestamp'] = datetime.now().isoformat(timespec = 'seconds')
+
+    return entry
+
+
+def CreatePruneEntry(entry):
+    """
+    Creates a manifest entry recording that the files of an earlier entry were pruned, so they're no longer
+    treated as exported.
+    """
+
+    prune_entry = dict(entry)
+    prune_entry['pruned'] = True
+    prune_entry['timestamp'] = datetime.now().isoformat(timespec = 'seconds')
+
+    return prune_entry
+
+
+def WriteManifest(export_stats):
+    """
+    Adds the manifest entries gathered during an export to the end of the manifest.
+    Returns the path of the manifest, or None if there was nothing to record or nowhere to record it.
+    """
+
+    entries = export_stats.get('manifest_entries', [])
+    manifest_path = GetManifestPath()
+
+    if len(entries) == 0 or manifest_path is None:
+        return None
+
+    try:
+        with open(manifest_path, 'a', encoding = 'utf-8') as manifest_file:
+            for entry in entries:
+                manifest_file.write(json.dumps(entry, sort_keys = True) + "\n")
+
+    except OSError as e:
+        print("Capsule couldn't write the export manifest - ", e)
+        return None
+
+    UpdateManifestSummary()
+    return manifest_path
+
+
+# ////////////////////////////////////////
+# QUERIES
+
+def LoadManifest(manifest_path = None):
+    """
+    Returns every entry in the manifest, oldest first.  Lines that can't be read are skipped.
+    - manifest_path: The manifest to load.  If None, the manifest for the current blend file is used.
+    """
+
+    if manifest_path is None:
+        manifest_path = GetManifestPath()
+
+    entries = []
+    if manifest_path is None or not os.path.isfile(manifest_path):
+        return entries
+
+    with open(manifest_path, 'r', encoding = 'utf-8') as manifest_file:
+        for line in manifest_file:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+
+    return entries
+
+
+def GetLatestEntries(entries):
+    """
+    Returns the most recent entry for every exported file path, stored by path.
+    Paths whose files were pruned aren't included.
+    """
+
+    latest = {}
+    for entry in entries:
+        if entry.get('pruned') is True:
+            latest.pop(entry['path'], None)
+        else:
+            latest[entry['path']] = entry
+
+    return latest
+
+
+def FindEntries(entries, source = None, export_preset = None, location_preset = None, format_type = None):
+    """
+    Returns the entries that match all of the given values.  Values that are None aren't checked.
+    """
+
+    filters = {'source': source, 'export_preset': export_preset, 'location_preset': location_preset,
+        'format_type': format_type}
+    filters = {k: v for k, v in filters.items() if v is not None}
+
+    return [e for e in entries if all(e.get(k) == v for k, v in filters.items())]
+
+
+def FindStaleOutputs(entries):
+    """
+    Returns the latest entries whose files are missing or no longer match the size that was exported.
+    """
+
+    stale = []
+    for entry in GetLatestEntries(entries).values():
+        for output_file in entry['files']:
+            if not os.path.isfile(output_file['path']) or os.path.getsize(output_file['path']) != output_file['size']:
+                stale.append(entry)
+                break
+
+    return stale
+
+
+def FindOrphanedEntries(entries, current_paths, location_presets, scene_name, output_root = None):
+    """
+    Returns the latest entries for files that the current exports no longer produce, such as those from 
+    objects that were renamed or untagged.  Only entries from the given scene, Location Presets and output root 
+    are included.  Entries that don't record their scene are never included, as they could belong to any scene.
+    """
+
+    orphans = []
+    for entry in GetLatestEntries(entries).values():
+        if entry['path'] in current_paths or entry.get('scene') != scene_name:
+            continue
+
+        if entry['location_preset'] in location_presets and entry.get('output_root') == output_root:
+            orphans.append(entry)
+
+    return orphans
+
+
+def GetQuarantinePath(file_path, quarantine_directory):
+    """
+    Returns where a file is moved to in a quarantine directory, keeping its full original path underneath it.
+    """
+
+    drive, path = os.path.splitdrive(os.path.abspath(file_path))
+    drive = drive.replace(':', '').strip('\\/')
+
+    return os.path.join(quarantine_directory, drive, path.lstrip('\\/'))
+
+
+def PruneOrphanedEntries(orphans, prune_mode, keep_paths):
+    """
+    Deletes or quarantines the files of the given orphaned entries, apart from any in keep_paths.
+    Quarantined files are moved to a dated folder beside the blend file.
+    Returns the number of files removed and a prune entry for each orphan.
+    """
+
+    quarantine_directory = os.path.join(os.path.splitext(bpy.data.filepath)[0] + "_capsule_quarantine",
+        datetime.now().strftime('%Y-%m-%d_%H.%M.%S'))
+
+    pruned_count = 0
+    prune_entries = []
+
+    for entry in orphans:
+        for output_file in entry['files']:
+            file_path = output_file['path']
+            if file_path in keep_paths or not os.path.isfile(file_path):
+                continue
+
+            try:
+                if prune_mode == 'QUARANTINE':
+                    quarantine_path = GetQuarantinePath(file_path, quarantine_directory)
+                    os.makedirs(os.path.dirname(quarantine_path), exist_ok = True)
+                    shutil.move(file_path, quarantine_path)
+                else:
+                    os.remove(file_path)
+
+                pruned_count += 1
+
+            except OSError as e:
+                print("Capsule couldn't prune", file_path, "-", e)
+
+        prune_entries.append(CreatePruneEntry(entry))
+
+    return [pruned_count, prune_entries]
+
+
+def UpdateManifestSummary():
+    """
+    Loads the manifest for the current blend file and summarises it for the manifest panel.
+    """
+
+    global last_summary
+
+    entries = LoadManifest()
+    latest = GetLatestEntries(entries)
+
+    last_summary = {}
+    last_summary['path'] = GetManifestPath()
+    last_summary['entry_count'] = len(entries)
+    last_summary['file_count'] = len(latest)
+    last_summary['total_size'] = sum(e['size'] for e in latest.values())
+    last_summary['stale_count'] = len(FindStaleOutputs(entries))
+    last_summary['slowest_exports'] = sorted(latest.values(), key = lambda e: e['duration'], reverse = True)[:10]
+
+    return last_summary
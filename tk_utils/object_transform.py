@@ -3,6 +3,99 @@ import bpy
 from mathutils import Vector
 from .object_ops import SwitchObjectMode, Find3DViewContext
 from .select import FocusObject, SelectObject, ActivateObject
+from .dependencies import GetDependencies
+
+def RelocateObjects(context, move_target, destination, targets):
+    """
+    Moves the given targets so that the move target lands on the destination, along with every 
+    object they depend on through parents, constraints and modifiers.  Only the root objects of 
+    that set are moved, by writing their locations directly.
+
+    Returns a record that can be given to RestoreRelocatedObjects to undo the move exactly.
+    """
+
+    context.view_layer.update()
+
+    offset = Vector((destination[0], destination[1], destination[2]))
+    offset -= move_target.matrix_world.translation
+
+    record = {}
+    record['objects'] = []
+
+    if offset.length_squared == 0.0:
+        return record
+
+    # Anything parented to an object in the set will follow it, so only the roots need to move.
+    dependencies = GetDependencies(list(targets) + [move_target])
+    dependency_set = set(dependencies)
+
+    for item in dependencies:
+        if item.parent in dependency_set:
+            continue
+
+        # Keep a copy of the original location, so the move can be reversed without any drift.
+        record['objects'].append([item, item.location.copy()])
+
+        if item.parent is None:
+            item.location += offset
+        else:
+            parent_matrix = item.parent.matrix_world @ item.matrix_parent_inverse
+            item.location += parent_matrix.to_3x3().inverted_safe() @ offset
+
+    context.view_layer.update()
+
+    return record
+
+
+def RestoreRelocatedObjects(context, record):
+    """
+    Returns every object moved by RelocateObjects to its original location.
+    """
+
+    for item, location in record['objects']:
+        item.location = location
+
+    context.view_layer.update()
+
+
+def GetParentChain(target):
+    """
+    Returns every parent above the given object, starting with its direct parent.
+    """
+
+    chain = []
+    parent = target.parent
+
+    while parent is not None:
+        chain.append(parent)
+        parent = parent.parent
+    
+    return chain
+
+
+def SetWorldLocations(context, moves):
+    """
+    Moves each object in the given list of [object, location] pairs to a world space location by 
+    writing its world matrix directly.  Doesn't need a 3D View, so it works in background mode.
+    """
+
+    moved = set()
+
+    # Parents are placed before their children, so a child is never moved out of place by a later parent move.
+    for target, location in sorted(moves, key = lambda move: len(GetParentChain(move[0]))):
+
+        # If any parent was just moved, the world matrices below it need updating before the child can be placed.
+        if any(parent in moved for parent in GetParentChain(target)):
+            context.view_layer.update()
+            moved.clear()
+
+        matrix = target.matrix_world.copy()
+        matrix.translation = Vector((location[0], location[1], location[2]))
+        target.matrix_world = matrix
+        moved.add(target)
+
+    context.view_layer.update()
+
 
 def MoveAllFailsafe(context, move_target, destination):
     """
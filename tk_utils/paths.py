@@ -1,12 +1,42 @@
 
-import bpy, os, platform
+import bpy, os, platform, re
 
 from datetime import datetime
 
 
-def CreateFilePath(location_preset, targets, collection, replace_invalid_chars, export_task):
+# The tags that can be used in a Location Preset path, and how to find the text each one is replaced with.
+# Each is given the export task, its targets and the collection being exported (if any).
+PATH_TAG_RESOLVERS = {
+    'export_name': lambda export_task, targets, collection: GetExportSource(export_task, targets, collection).name,
+    'object_type': lambda export_task, targets, collection: GetExportObjectType(export_task, targets, collection),
+    'collection': lambda export_task, targets, collection: GetExportCollectionName(export_task, targets, collection),
+    'blend_file_name': lambda export_task, targets, collection: bpy.path.basename(bpy.data.filepath).replace(".blend", ""),
+    'export_preset_name': lambda export_task, targets, collection: export_task['export_preset'].name,
+    'export_date_ymd': lambda export_task, targets, collection: export_task['export_start_time'].strftime('%Y-%m-%d'),
+    'export_date_dmy': lambda export_task, targets, collection: export_task['export_start_time'].strftime('%d-%m-%Y'),
+    'export_date_mdy': lambda export_task, targets, collection: export_task['export_start_time'].strftime('%m-%d-%Y'),
+    'export_time_hm': lambda export_task, targets, collection: export_task['export_start_time'].strftime('%H.%M'),
+    'export_time_hms': lambda export_task, targets, collection: export_task['export_start_time'].strftime('%H.%M.%S'),
+}
+
+# Tags that were renamed, and the tag they now use.
+PATH_TAG_ALIASES = {'object_name': 'export_name'}
+
+# Tags filled with names, which need invalid characters replaced if enabled.
+PATH_NAME_TAGS = {'export_name', 'object_type', 'collection', 'blend_file_name', 'export_preset_name'}
+
+PATH_TAG_PATTERN = re.compile(r'\^(\w+)\^')
+
+# Location paths that have already been compiled into templates.
+compiled_templates = {}
+
+
+def CreateFilePath(location_preset, targets, collection, replace_invalid_chars, export_task, output_root = None,
+        create_directory = True):
     """
     Extracts and calculates a final path with which to export the target to.
+    - output_root: If defined, relative paths are resolved against this directory instead of the blend file's.
+    - create_directory: If False the directory won't be created, so it can be created with others using CreateDirectories.
     """
 
     # First fetch the path
@@ -16,7 +46,7 @@ def CreateFilePath(location_preset, targets, collection, replace_invalid_chars,
         raise Exception('WARNING: This location preset has no path defined, please define it!')
 
     elif location_path.find('//') != -1:
-        location_path = bpy.path.abspath(location_path)
+        location_path = bpy.path.abspath(location_path, start = output_root)
 
     # If Windows, split the drive indicator
     drive_indicator = ""
@@ -50,113 +80,153 @@ def CreateFilePath(location_preset, targets, collection, replace_invalid_chars,
         location_path = drive_indicator + "\\" + location_path
     
     # Build the file path
-    if not os.path.exists(location_path):
-        os.makedirs(location_path)
+    if create_directory is True:
+        CreateDirectories([location_path])
     
     #print("Final Location Path - ", location_path)
     
     return location_path
 
 
+def CreateDirectories(directories):
+    """
+    Creates every directory in the given list that doesn't exist yet, checking each unique one only once.
+    """
 
-def FillTags(location_path, targets, collection, replace_invalid_chars, export_task):
+    for directory in set(directories):
+        os.makedirs(directory, exist_ok = True)
+
+
+def GetBaseDirectory(location_path, output_root = None):
     """
-    Searches for and substitutes the tags in a path name.
+    Returns the absolute directory a location path starts from, which is everything before its first tag.
+    - output_root: If defined, relative paths are resolved against this directory instead of the blend file's.
     """
 
-    slash = "/"
-    if platform.system() == 'Windows':
-        slash = "\\"
+    tag_index = location_path.find('^')
+    if tag_index != -1:
+        location_path = os.path.dirname(location_path[:tag_index])
 
-    if location_path.find('^export_name^'):
+    return bpy.path.abspath(location_path, start = output_root)
 
-        if collection is not None:
-            export_name = collection.name
-        else:
-            export_name = targets[0].name
 
-        if replace_invalid_chars is True:
-            export_name = SubstituteNameCharacters(export_name)
+def FindExistingDirectory(path):
+    """
+    Returns the given directory if it exists, or the nearest parent directory that does.
+    Returns None if no part of the path exists, or if it points to a file.
+    """
+
+    path = os.path.abspath(path)
 
-        location_path = location_path.replace('^object_name^', export_name)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
     
+    if not os.path.isdir(path):
+        return None
+    
+    return path
 
-    # if location_path.find('^object_type^'):
 
-    #     type_name = targets[0].type
-    #     type_name = type_name.lower()
-    #     type_name = type_name.capitalize()
+# ////////////////////////////////////////
+# PATH TEMPLATES
 
-    #     if replace_invalid_chars is True:
-    #         type_name = SubstituteNameCharacters(type_name)
+def CompilePathTemplate(location_path):
+    """
+    Splits a location path into a list of text and tag parts, so tags can be filled without searching the path again.
+    Tag parts are stored as tuples with the tag name, unknown tags are kept as text.
+    Templates are stored and reused for every path that's the same.
+    """
 
-    #     location_path = location_path.replace('^object_type^', type_name)
-    
+    template = compiled_templates.get(location_path)
+    if template is not None:
+        return template
 
-    # if location_path.find('^collection^'):
-        
-    #     collection_name = ''
-    #     if collection != None:
-    #         collection_name = collection.name
-    #     else:
-    #         if targets[0].users_collection[0]:
-    #             collection_name = targets[0].users_collection[0].name
-    #         else:
-    #             collection_name = "Unknown Collection"
-        
-    #     if replace_invalid_chars is True:
-    #         collection_name = SubstituteNameCharacters(collection_name)
-                
-    #     location_path = location_path.replace('^collection^', collection_name)
+    template = []
+    parts = PATH_TAG_PATTERN.split(location_path)
 
-    
-    if location_path.find('^blend_file_name^'):
+    # The split alternates between text and tag names.
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            if part != "":
+                template.append(part)
+            continue
+        
+        tag = PATH_TAG_ALIASES.get(part, part)
+        if tag in PATH_TAG_RESOLVERS:
+            template.append((tag,))
+        else:
+            template.append('^' + part + '^')
 
-        blend_name = bpy.path.basename(bpy.context.blend_data.filepath)
-        blend_name = blend_name.replace(".blend", "")
+    compiled_templates[location_path] = template
+    return template
 
-        if replace_invalid_chars is True:
-            blend_name = SubstituteNameCharacters(blend_name)
 
-        location_path = location_path.replace('^blend_file_name^', blend_name)
-    
-    if location_path.find('^export_preset_name^'):
+def GetExportSource(export_task, targets, collection):
+    """
+    Returns the object or collection an export is named after.
+    """
 
-        preset_name = export_task['export_preset'].name
+    if collection is not None:
+        return collection
 
-        if replace_invalid_chars is True:
-            blend_name = SubstituteNameCharacters(preset_name)
+    return export_task.get('source') or targets[0]
 
-        location_path = location_path.replace('^export_preset_name^', preset_name)
-    
-    # DATE AND TIME
 
-    if location_path.find('export_date_ymd'):
+def GetExportObjectType(export_task, targets, collection):
+    """
+    Returns the type of object being exported as a readable name.  Collections use the type of their first object.
+    """
 
-        time = export_task['export_start_time'].strftime('%Y-%m-%d')
-        location_path = location_path.replace('^export_date_ymd^', time)
+    source = export_task.get('source')
+    if collection is not None or source is None:
+        source = targets[0]
 
-    if location_path.find('export_date_dmy'):
+    return source.type.lower().capitalize()
 
-        time = export_task['export_start_time'].strftime('%d-%m-%Y')
-        location_path = location_path.replace('^export_date_dmy^', time)
 
-    if location_path.find('export_date_mdy'):
+def GetExportCollectionName(export_task, targets, collection):
+    """
+    Returns the name of the collection being exported, or the first collection the exported object is in.
+    """
 
-        time = export_task['export_start_time'].strftime('%m-%d-%Y')
-        location_path = location_path.replace('^export_date_mdy^', time)
+    if collection is not None:
+        return collection.name
+    
+    source = GetExportSource(export_task, targets, collection)
+    if isinstance(source, bpy.types.Collection):
+        return source.name
     
-    if location_path.find('export_time_hm'):
+    if len(source.users_collection) > 0:
+        return source.users_collection[0].name
 
-        time = export_task['export_start_time'].strftime('%H.%M')
-        location_path = location_path.replace('^export_time_hm^', time)
+    return "Unknown Collection"
 
-    if location_path.find('export_time_hms'):
 
-        time = export_task['export_start_time'].strftime('%H.%M.%S')
-        location_path = location_path.replace('^export_time_hms^', time)
+def FillTags(location_path, targets, collection, replace_invalid_chars, export_task):
+    """
+    Searches for and substitutes the tags in a path name.
+    """
+
+    template = CompilePathTemplate(location_path)
+    result = []
+
+    for part in template:
+        if isinstance(part, str):
+            result.append(part)
+            continue
+        
+        tag = part[0]
+        value = PATH_TAG_RESOLVERS[tag](export_task, targets, collection)
+
+        if replace_invalid_chars is True and tag in PATH_NAME_TAGS:
+            value = SubstituteNameCharacters(value)
+        
+        result.append(value)
     
-    return location_path    
+    return "".join(result)
 
     
 def SubstituteNameCharacters(path):
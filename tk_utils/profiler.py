@@ -0,0 +1,218 @@
+# ///////////////////////////////////////////////////////////////////
+# Times each phase of an export task and writes the results to a report.
+# ///////////////////////////////////////////////////////////////////
+
+import bpy, csv, json, os, platform, time
+
+from datetime import datetime
+
+# Peak memory isn't available on every platform.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# The phases an export task goes through, in the order they're reported.
+TASK_PHASES = ('target_gathering', 'render_filtering', 'path_building', 'fingerprint', 'origin_move',
+    'pack_script_before', 'export_api', 'pack_script_after', 'restore')
+
+# The number of operators called since counting started, and the original operator call it wraps.
+operator_count = 0
+operator_call = None
+
+# A summary of the last report written, used by the profiler panel.
+last_report = None
+
+
+# ////////////////////////////////////////
+# OPERATOR COUNTING
+
+def StartOperatorCounter():
+    """
+    Starts counting every operator called through bpy.ops.
+    """
+
+    global operator_call
+
+    # This relies on the internals of bpy.ops, so skip counting if they ever change.
+    op_class = getattr(bpy.ops, '_BPyOpsSubModOp', None)
+    if op_class is None or operator_call is not None:
+        return
+
+    operator_call = op_class.__call__
+
+    def CountedCall(self, *args, **kwargs):
+        global operator_count
+        operator_count += 1
+        return operator_call(self, *args, **kwargs)
+
+    op_class.__call__ = CountedCall
+
+
+def StopOperatorCounter():
+    """
+    Stops counting operators and restores the original operator call.
+    """
+
+    global operator_call
+
+    if operator_call is not None:
+        bpy.ops._BPyOpsSubModOp.__call__ = operator_call
+        operator_call = None
+
+
+def GetPeakMemory():
+    """
+    Returns the peak memory used by this process in megabytes, or None if it can't be found.
+    """
+
+    if resource is None:
+        return None
+
+    # Linux reports this in kilobytes, macOS in bytes.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == 'Darwin':
+        return peak / (1024 * 1024)
+
+    return peak / 1024
+
+
+# ////////////////////////////////////////
+# TASK PROFILES
+
+def CreateTaskProfile():
+    """
+    Creates a new, empty profile for an export task and starts timing it.
+    """
+
+    profile = {}
+    profile['phases'] = {}
+    for phase in TASK_PHASES:
+        profile['phases'][phase] = 0.0
+
+    profile['operator_calls'] = 0
+    profile['_last_time'] = time.perf_counter()
+    profile['_operator_start'] = operator_count
+
+    return profile
+
+
+def ResetPhaseTimer(export_task):
+    """
+    Restarts the phase timer of an export task, so time spent on other tasks isn't counted.
+    """
+
+    profile = export_task.get('profile')
+    if profile is None:
+        return
+
+    profile['_last_time'] = time.perf_counter()
+    profile['_operator_start'] = operator_count
+
+
+def MarkPhase(export_task, phase):
+    """
+    Adds the time since the last mark to the given phase of an export task, if it's being profiled.
+    """
+
+    profile = export_task.get('profile')
+    if profile is None:
+        return
+
+    current_time = time.perf_counter()
+    profile['phases'][phase] += current_time - profile['_last_time']
+    profile['_last_time'] = current_time
+
+    profile['operator_calls'] += operator_count - profile['_operator_start']
+    profile['_operator_start'] = operator_count
+
+
+def FinishTaskProfile(export_task, file_path):
+    """
+    Completes the profile of an export task and returns it as a plain dictionary that can be saved.
+    """
+
+    profile = export_task['profile']
+
+    result = {}
+    result['export_name'] = export_task['export_name']
+    result['export_type'] = export_task['export_type']
+    result['export_preset'] = export_task['export_preset'].name
+    result['format_type'] = export_task['export_preset'].format_type
+    result['target_count'] = len(export_task['targets'])
+    result['export_directory'] = export_task['export_directory']
+    result['file_path'] = file_path
+    result['file_size'] = os.path.getsize(file_path) if os.path.isfile(file_path) else None
+    result['phases'] = dict(profile['phases'])
+    result['total_time'] = sum(profile['phases'].values())
+    result['operator_calls'] = profile['operator_calls']
+    result['peak_memory_mb'] = GetPeakMemory()
+
+    return result
+
+
+# ////////////////////////////////////////
+# REPORTS
+
+def WriteProfileReport(export_stats):
+    """
+    Writes the task profiles gathered during an export as JSON and CSV files, in the directory
+    all the exports share.  Returns the path of the JSON report, or None if nothing was profiled.
+    """
+
+    global last_report
+
+    task_profiles = export_stats.get('task_profiles', [])
+    if len(task_profiles) == 0:
+        return None
+
+    directories = [os.path.abspath(p['export_directory']) for p in task_profiles]
+    try:
+        report_directory = os.path.commonpath(directories)
+    except ValueError:
+        # Exports on different drives don't share a path.
+        report_directory = directories[0]
+
+    report = {}
+    report['blend_file'] = bpy.data.filepath
+    report['date'] = datetime.now().isoformat(timespec = 'seconds')
+    report['peak_memory_mb'] = GetPeakMemory()
+    report['stats'] = {k: v for k, v in export_stats.items()
+        if not k.startswith('_') and k not in ('task_profiles', 'manifest_entries')}
+    report['phase_totals'] = {}
+    for phase in TASK_PHASES:
+        report['phase_totals'][phase] = sum(p['phases'][phase] for p in task_profiles)
+    report['tasks'] = task_profiles
+
+    report_path = os.path.join(report_directory, "capsule_export_profile.json")
+    csv_path = os.path.join(report_directory, "capsule_export_profile.csv")
+
+    try:
+        with open(report_path, 'w', encoding = 'utf-8') as report_file:
+            json.dump(report, report_file, indent = 1)
+
+        columns = ['export_name', 'export_type', 'export_preset', 'format_type', 'target_count',
+            'total_time'] + list(TASK_PHASES) + ['operator_calls', 'peak_memory_mb', 'file_size', 'file_path']
+
+        with open(csv_path, 'w', encoding = 'utf-8', newline = '') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(columns)
+
+            for p in task_profiles:
+                row = []
+                for column in columns:
+                    row.append(p['phases'][column] if column in TASK_PHASES else p[column])
+                writer.writerow(row)
+
+    except OSError as e:
+        print("Capsule couldn't write the export profile - ", e)
+        return None
+
+    # Keep the slowest tasks for the profiler panel.
+    last_report = {}
+    last_report['path'] = report_path
+    last_report['phase_totals'] = report['phase_totals']
+    last_report['slowest_tasks'] = sorted(task_profiles, key = lambda p: p['total_time'], reverse = True)[:10]
+
+    print("Capsule export profile written to", report_path)
+    return report_path
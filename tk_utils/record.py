@@ -5,19 +5,197 @@
 import bpy
 
 import os.path
+from array import array
 from mathutils import Vector
 from . import search as search_utils
 from . import select as select_utils
 from . import locations as loc_utils
 from . import paths as path_utils
 
-from . import object_ops, object_transform
+from . import object_ops, object_transform, dependencies
 
 
-def BuildSceneContext(context):
+# The per-object properties recorded in an object state snapshot, with how many values each one has.
+# FIXME : hide_viewport is a global property, and isn't the same as Outliner/3D View hides.  Need to get and set that data when fixed.
+# https://devtalk.blender.org/t/view-layer-api-access-wishlist-collection-expand-set/5517
+OBJECT_STATE_COLUMNS = [
+    ('hide_viewport', 1),
+    ('hide_select', 1),
+    ('lock_location', 3),
+    ('lock_rotation', 3),
+    ('lock_scale', 3),
+]
+
+OBJECT_LOCK_COLUMNS = ['lock_location', 'lock_rotation', 'lock_scale']
+
+
+# ////////////////////////////////////////
+# OBJECT STATES
+
+def ReadObjectColumn(items, collection, attribute, size):
+    """
+    Returns the values of a boolean object property as a flat array, with size values for every item.
+    - collection: If the items are every item in a Blender collection, it's read in one go with foreach_get.
+    """
+
+    column = array('b', [0]) * (len(items) * size)
+
+    if collection is not None:
+        collection.foreach_get(attribute, column)
+
+    elif size == 1:
+        for i, item in enumerate(items):
+            column[i] = getattr(item, attribute)
+    
+    else:
+        for i, item in enumerate(items):
+            column[i * size:(i + 1) * size] = array('b', getattr(item, attribute))
+    
+    return column
+
+
+def RecordObjectStates(context, items, collection = None):
+    """
+    Records the visibility, selection and transform locks of a list of objects, storing each property 
+    as a column of values instead of keeping a record for every object.
+    - collection: The Blender collection the items came from, if they're every item in it.
+    """
+
+    states = {}
+    states['items'] = items
+    states['collection'] = collection
+    states['columns'] = {}
+
+    for attribute, size in OBJECT_STATE_COLUMNS:
+        states['columns'][attribute] = ReadObjectColumn(items, collection, attribute, size)
+
+    selected = set(context.view_layer.objects.selected)
+    states['is_selected'] = array('b', [item in selected for item in items])
+
+    return states
+
+
+def GetLockedRows(states):
+    """
+    Returns the positions of every object in an object state snapshot that had any transform locks.
+    """
+
+    columns = states['columns']
+    return [i for i in range(len(states['items'])) 
+        if any(any(columns[attribute][i * 3:i * 3 + 3]) for attribute in OBJECT_LOCK_COLUMNS)]
+
+
+def PrepareObjectStates(states):
+    """
+    Makes every recorded object selectable and removes their transform locks, ready for export.
+    """
+
+    items = states['items']
+    collection = states['collection']
+
+    hide_select = states['columns']['hide_select']
+    for i in [i for i, flag in enumerate(hide_select) if flag]:
+        items[i].hide_select = False
+
+    if collection is not None:
+        unlocked = array('b', [0]) * (len(items) * 3)
+        for attribute in OBJECT_LOCK_COLUMNS:
+            collection.foreach_set(attribute, unlocked)
+    
+    else:
+        for i in GetLockedRows(states):
+            for attribute in OBJECT_LOCK_COLUMNS:
+                setattr(items[i], attribute, (False, False, False))
+
+
+def RestoreObjectStates(states):
+    """
+    Restores the visibility and transform locks of every object in an object state snapshot.
+    Selections are restored separately with RestoreObjectSelections, once the original view layer is active again.
+    """
+
+    items = states['items']
+    collection = states['collection']
+    columns = states['columns']
+
+    # If objects were added or removed since, the columns no longer line up with the collection.
+    if collection is not None and len(collection) != len(items):
+        collection = None
+
+    if collection is not None:
+        for attribute in OBJECT_LOCK_COLUMNS:
+            collection.foreach_set(attribute, columns[attribute])
+    
+    else:
+        for i in GetLockedRows(states):
+            for attribute in OBJECT_LOCK_COLUMNS:
+                setattr(items[i], attribute, columns[attribute][i * 3:i * 3 + 3].tolist())
+
+    # Visibility changes need their update callbacks, so only the objects that changed are set individually.
+    for attribute in ['hide_viewport', 'hide_select']:
+        recorded = columns[attribute]
+        current = ReadObjectColumn(items, collection, attribute, 1)
+
+        for i in [i for i in range(len(items)) if current[i] != recorded[i]]:
+            setattr(items[i], attribute, bool(recorded[i]))
+
+
+def RestoreObjectSelections(context, states):
+    """
+    Restores the selection state of every object in an object state snapshot, only changing the ones that differ.
+    """
+
+    items = states['items']
+    is_selected = states['is_selected']
+    selected = set(context.view_layer.objects.selected)
+
+    for i, item in enumerate(items):
+        if (item in selected) != bool(is_selected[i]):
+            item.select_set(bool(is_selected[i]))
+
+
+# ////////////////////////////////////////
+# CAPSULE VIEW LAYER
+
+CAPSULE_VIEW_LAYER_NAME = ">> Capsule <<"
+
+
+def GetCapsuleViewLayer(scene):
+    """
+    Returns the view layer Capsule exports from, creating it if the scene doesn't have one yet.
+    The view layer is kept between exports, so its depsgraph doesn't have to be built every time.
+    """
+
+    capsule_view_layer = scene.view_layers.get(CAPSULE_VIEW_LAYER_NAME)
+
+    if capsule_view_layer is None:
+        capsule_view_layer = scene.view_layers.new(CAPSULE_VIEW_LAYER_NAME)
+
+        # It's only there for exporting, so it shouldn't be rendered.
+        capsule_view_layer.use = False
+    
+    return capsule_view_layer
+
+
+def ResetCapsuleViewLayer(capsule_view_layer):
+    """
+    Deselects everything in the Capsule view layer, ready for the next export.
+    Only selected objects are visited, so this doesn't depend on the size of the scene.
+    """
+
+    for item in list(capsule_view_layer.objects.selected):
+        item.select_set(False, view_layer = capsule_view_layer)
+
+
+# ////////////////////////////////////////
+# SCENE CONTEXT
+
+def BuildSceneContext(context, scope = None):
     """
     Records all selection, edit mode, object constraint and view layer properties and saves it for later.
     ALSO builds a new View Layer with which to perform edits on.
+
+    - scope: The objects to record and prepare for export.  If None, every object in the scene is used.
     """
 
     scene_records = {}
@@ -28,7 +206,10 @@ def BuildSceneContext(context):
     # //////////////////////////////////////
     # RECORD AND CHANGE REGIONS
     # If the current context isn't the 3D View, we need to change that before anything else.
-    scene_records['active_area_type'] = bpy.context.area.type
+    # In background mode there are no areas to record.
+    scene_records['active_area_type'] = None
+    if context.area is not None:
+        scene_records['active_area_type'] = context.area.type
     
 
     # //////////////////////////////////////
@@ -45,6 +226,7 @@ def BuildSceneContext(context):
             selected_record.append(sel)
 
     scene_records['active_object'] = context.active_object
+    scene_records['selected_objects'] = selected_record
     scene_records['active_layer_collection'] = context.view_layer.active_layer_collection
     print(scene_records['active_layer_collection'])
 
@@ -56,48 +238,33 @@ def BuildSceneContext(context):
     scene_records['view_mode'] = bpy.context.mode
     if scene_records['view_mode'].find('EDIT') != -1:
         scene_records['view_mode'] = 'EDIT'
-    bpy.ops.object.mode_set(mode= 'OBJECT')
+    
+    if scene_records['view_mode'] != 'OBJECT':
+        bpy.ops.object.mode_set(mode= 'OBJECT')
 
 
     # //////////////////////////////////////
     # PRESERVE OBJECT INFORMATION
     
-    object_records = []
+    # When every object is recorded, whole columns of properties can be read and written at once.
+    object_collection = None
+    if scope is None:
+        object_collection = context.scene.objects
+        scope = list(object_collection)
 
-    for item in context.scene.objects:
-        record = {}
-        record['item'] = item
-        record['item_name'] = item.name
+    object_states = RecordObjectStates(context, scope, object_collection)
+    PrepareObjectStates(object_states)
 
-        # Record object visibility
-        # FIXME : hide_viewport is a global property, and isn't the same as Outliner/3D View hides.  Need to get and set that data when fixed.
-        # https://devtalk.blender.org/t/view-layer-api-access-wishlist-collection-expand-set/5517
-
-        record['hide_viewport'] = item.hide_viewport
-        record['hide_select'] = item.hide_select
-        record['is_selected'] = item.select_get()
-
-        item.hide_select = False
-
-
-        # Record object loc/rot/scale locks if applicable
-        transform_locks = []
-        for i, x in enumerate(item.lock_location):
-            transform_locks.append(item.lock_location[i])
-
-        for i, x in enumerate(item.lock_rotation):
-            transform_locks.append(item.lock_rotation[i])
+    # Only objects with armature modes or constraints to preserve need their own record.
+    object_records = []
 
-        for i, x in enumerate(item.lock_scale):
-            transform_locks.append(item.lock_scale[i])
-        
-        if True in transform_locks:
-            record['transform_locks'] = transform_locks
-        
-        item.lock_location = (False, False, False)
-        item.lock_rotation = (False, False, False)
-        item.lock_scale = (False, False, False)
+    # Record the current location of constrained objects in one pass, before any get muted.
+    constrained_objects = [item for item in scope if len(item.constraints) > 0]
+    true_locations = loc_utils.FindWorldSpaceObjectLocations(context, constrained_objects)
 
+    for item in scope:
+        record = {}
+        record['item'] = item
 
         # If any armatures are in any non-object modes, we need to change this
         if item.type == 'ARMATURE':
@@ -113,7 +280,7 @@ def BuildSceneContext(context):
             constraint_list = []
 
             # Record the current object location for later
-            true_location = loc_utils.FindWorldSpaceObjectLocation(context, item)
+            true_location = true_locations[item]
 
             # Placeholder for later, once all constraints are isolated and muted.
             constraint_location = Vector((0.0, 0.0, 0.0))
@@ -137,19 +304,23 @@ def BuildSceneContext(context):
                 constraint.influence = 0.0
 
         # Add the new record
-        object_records.append(record)
+        if len(record) > 1:
+            object_records.append(record)
     
     
     # //////////////////////////////////////
     # PRESERVE CONSTRAINTS
      # TODO: I dont know whether this is used or how this is even used, I need to investigate
 
-    for record in object_records:
-        if 'constraint_list' in record:
-            item = record['item']
-            record['constraint_location'] = loc_utils.FindWorldSpaceObjectLocation(context, item)
-            
-            object_transform.MoveObjectFailsafe(item, context, record['true_location'])
+    constraint_records = [record for record in object_records if 'constraint_list' in record]
+    constraint_locations = loc_utils.FindWorldSpaceObjectLocations(context, 
+        [record['item'] for record in constraint_records])
+
+    for record in constraint_records:
+        record['constraint_location'] = constraint_locations[record['item']]
+    
+    object_transform.SetWorldLocations(context, 
+        [[record['item'], record['true_location']] for record in constraint_records])
     
 
     # //////////////////////////////////////
@@ -169,27 +340,39 @@ def BuildSceneContext(context):
         col.hide_select = False
     
     # //////////////////////////////////////
-    # CREATE NEW VIEW LAYER
-
-    scene_records['previous_view_layer'] = bpy.context.view_layer
+    # SWITCH TO THE CAPSULE VIEW LAYER
+
+    scene_records['previous_view_layer'] = context.view_layer
+    scene_records['capsule_view_layer'] = None
+    scene_records['hidden_objects'] = []
+
+    # Without a window showing this scene (like in background mode) the active view layer can't be switched, 
+    # so the current one is used and any hidden objects are recorded instead.
+    if context.window is not None and context.window.scene == context.scene:
+        capsule_view_layer = GetCapsuleViewLayer(context.scene)
+        context.window.view_layer = capsule_view_layer
+        scene_records['capsule_view_layer'] = capsule_view_layer
+    
+    # Objects outside the view layer can't be hidden or selected in it.
+    layer_objects = context.view_layer.objects
+    scope_layer_objects = [item for item in scope if layer_objects.get(item.name) == item]
+    hidden_objects = [item for item in scope_layer_objects if item.hide_get()]
 
-    bpy.ops.scene.view_layer_add()
-    bpy.context.view_layer.name = ">> Capsule <<"
-    scene_records['capsule_view_layer'] = bpy.context.view_layer
-    print(bpy.context.view_layer)
+    if scene_records['capsule_view_layer'] is None:
+        scene_records['hidden_objects'] = hidden_objects
 
 
-    # Now we can unhide and deselect everything
-    override = object_ops.Find3DViewContext()
-    with context.temp_override(window = override['window'], area = override['area'], 
-            region = override['region']):
-        
-        bpy.ops.object.hide_view_clear()
-        bpy.ops.object.select_all(action= 'DESELECT')
+    # Now we can unhide everything being exported and deselect everything else
+    for item in list(layer_objects.selected):
+        item.select_set(False)
+    
+    for item in hidden_objects:
+        item.hide_set(False)
 
     records = {}
     records['scene'] = scene_records
     records['object'] = object_records
+    records['object_states'] = object_states
     records['collection'] = collection_records
     return records
 
@@ -203,6 +386,7 @@ def RestoreSceneContext(context, record):
 
     scene_records = record['scene']
     object_records = record['object']
+    object_states = record['object_states']
     collection_records = record['collection']
 
     # //////////////////////////////////////
@@ -218,61 +402,53 @@ def RestoreSceneContext(context, record):
     # //////////////////////////////////////
     # RESTORE OBJECT RECORDS
 
+    # Restore constraint object positions
+    object_transform.SetWorldLocations(context, 
+        [[record['item'], record['constraint_location']] for record in object_records if 'constraint_list' in record])
+
     for record in object_records:
         item = record['item']
         
-        # Restore constraint object positions
+        # Restore Constraint Defaults
         if 'constraint_list' in record:
-            object_transform.MoveObjectFailsafe(item, context, record['constraint_location'])
-
-            # Restore Constraint Defaults
             for constraint_record in record['constraint_list']:
                 index = constraint_record['index']
                 item.constraints[index].mute = constraint_record['enabled']
                 item.constraints[index].influence = constraint_record['influence']
         
-        # Restore visibility defaults
-        item.hide_viewport = record['hide_viewport']
-        item.hide_select = record['hide_select']
-        item.select_set(record['is_selected'])
-
-        # Restore transform locks
-        if 'transform_locks' in record:
-            lock_list = record['transform_locks']
-
-            item.lock_location[0] = lock_list[0]
-            item.lock_location[1] = lock_list[1]
-            item.lock_location[2] = lock_list[2]
-            item.lock_rotation[0] = lock_list[3]
-            item.lock_rotation[1] = lock_list[4]
-            item.lock_rotation[2] = lock_list[5]
-            item.lock_scale[0] = lock_list[6]
-            item.lock_scale[1] = lock_list[7]
-            item.lock_scale[2] = lock_list[8]
-        
         # Restore armature mode
         if 'armature_mode' in record:
             mode = object_ops.SwitchObjectMode(record['armature_mode'], item)
     
+    RestoreObjectStates(object_states)
+
     # //////////////////////////////////////
-    # DELETE AND RESTORE VIEW LAYER
+    # RESTORE VIEW LAYER
 
-    context.window.view_layer = scene_records['capsule_view_layer']
-    bpy.ops.scene.view_layer_remove()
-    context.window.view_layer = scene_records['previous_view_layer']
+    # The Capsule view layer is kept for the next export, so it's left with nothing selected.
+    if scene_records['capsule_view_layer'] is not None:
+        ResetCapsuleViewLayer(scene_records['capsule_view_layer'])
+        context.window.view_layer = scene_records['previous_view_layer']
+    
+    for item in scene_records['hidden_objects']:
+        item.hide_set(True)
 
     # //////////////////////////////////////
     # RESTORE SCENE SELECTIONS
 
-    # TODO: Integrate selections with the object capture, this shouldn't be separate
+    RestoreObjectSelections(context, object_states)
 
     # Re-select the objects previously selected
     if scene_records['active_object'] is not None:
-        bpy.context.view_layer.objects.active = scene_records['active_object']
-        bpy.ops.object.select_pattern(pattern = scene_records['active_object'].name)
+        context.view_layer.objects.active = scene_records['active_object']
+        scene_records['active_object'].select_set(True)
 
     if scene_records['active_object'] is None and len(scene_records['selected_objects']) == 0:
-        bpy.ops.object.select_all(action= 'DESELECT')
+        for item in list(context.view_layer.objects.selected):
+            item.select_set(False)
+    
+    for item in scene_records['selected_objects']:
+        item.select_set(True)
 
     context.view_layer.active_layer_collection = scene_records['active_layer_collection']
 
@@ -281,7 +457,8 @@ def RestoreSceneContext(context, record):
     # RESTORE VIEW MODES
 
     # Restore the 3D view mode
-    bpy.ops.object.mode_set(mode = scene_records['view_mode'])
+    if scene_records['view_mode'] != 'OBJECT' and context.view_layer.objects.active is not None:
+        bpy.ops.object.mode_set(mode = scene_records['view_mode'])
 
     # Restore the 3D cursor
     bpy.data.scenes[bpy.context.scene.name].cursor.location = scene_records['cursor_location']
@@ -292,125 +469,221 @@ def RestoreSceneContext(context, record):
     
 
 
-# FIXME : Check if needed and/or is working.
-def MuteArmatureConstraints(context):
+# ////////////////////////////////////////
+# STAGING SCENES
+
+STAGING_SCENE_NAME = ">> Capsule Staging <<"
+
+# The scene settings copied to a staging scene, as exporters use them for units and animation ranges.
+# Settings stored directly on the scene have no path.
+STAGING_SCENE_SETTINGS = [
+    (None, ['frame_start', 'frame_end', 'frame_step', 'frame_current', 'use_preview_range', 
+        'frame_preview_start', 'frame_preview_end']),
+    ('render', ['fps', 'fps_base']),
+    ('unit_settings', ['system', 'system_rotation', 'scale_length', 'length_unit', 'mass_unit', 
+        'time_unit', 'temperature_unit', 'use_separate']),
+]
+
+
+def BuildStagingScene(context, scope):
     """
-    Performs two operations together:
-    - Records all armatures and preserves their constraints.
-    - Mutes them afterwards to prevent interference in the Capsule export.
+    Creates a temporary scene that links (but doesn't copy) the given objects, so they can be selected and
+    unhidden for export without changing the scene being worked in.  Any staging scene left behind by
+    a failed export is removed first.
+
+    Returns a record to give to RemoveStagingScene once the export is finished.
     """
 
-    # # This process may fail, so if the user doesn't want us to process the armature constraints then stop right here.
-    # if self.export_preset.preserve_armature_constraints is True:
-    #     return
+    staging_record = {}
 
-    # We need to do similar constraint evaluation for armatures
-    # Find translate constraints. mute them and move the affected bones
-    # to make the plugin movement successful.
+    # Object modes aren't stored per scene, so edit mode has to be left before exporting from anywhere.
+    staging_record['view_mode'] = context.mode
+    if staging_record['view_mode'].find('EDIT') != -1:
+        staging_record['view_mode'] = 'EDIT'
+    
+    if staging_record['view_mode'] != 'OBJECT':
+        bpy.ops.object.mode_set(mode= 'OBJECT')
 
-    record = {}
-    record['armature_constraints'] = []
-    record['armature_objects'] = []
+    previous_scene = bpy.data.scenes.get(STAGING_SCENE_NAME)
+    if previous_scene is not None:
+        bpy.data.scenes.remove(previous_scene)
 
-    for item in context.scene.objects:
-        if item.type == 'ARMATURE':
-            for bone in item.pose.bones:
-                i = 0
-                for constraint in bone.constraints:
-                    if item not in record['armature_objects']:
-                        true_location = loc_utils.FindWorldSpaceBoneLocation(item, context, bone)
-                        constraint_location = Vector((bone.location[0], bone.location[1], bone.location[2]))
+    staging_scene = bpy.data.scenes.new(STAGING_SCENE_NAME)
 
-                        entry = {'object_name': item.name, 'bone_name': bone.name, 'true_location': true_location, 'constraint_location': constraint_location}
-                        record['armature_objects'].append(entry)
+    for path, attributes in STAGING_SCENE_SETTINGS:
+        source = context.scene if path is None else getattr(context.scene, path)
+        destination = staging_scene if path is None else getattr(staging_scene, path)
 
-                    entry = {'object_name': item.name, 'bone_name': bone.name, 'index': i, 'enabled': constraint.mute, 'influence': constraint.influence}
-                    record['armature_constraints'].append(entry)
+        for attribute in attributes:
+            setattr(destination, attribute, getattr(source, attribute))
 
-                    i += 1
+    for item in scope:
+        staging_scene.collection.objects.link(item)
+    
+    staging_record['scene'] = staging_scene
+    staging_record['view_layer'] = staging_scene.view_layers[0]
+    return staging_record
 
 
-    # NOW WE CAN MUTE THEM
-    for entry in record['armature_constraints']:
-        item = context.scene.objects[entry['object_name']]
-        for bone in item.pose.bones:
-            if bone.name == entry['bone_name']:
-                constraint = bone.constraints[entry['index']]
+def RemoveStagingScene(context, staging_record):
+    """
+    Deletes a staging scene created by BuildStagingScene and returns to the previous object mode.
+    The objects it linked are left in the scene they came from.
+    """
 
-                # Mute the constraint
-                constraint.mute = True
-                constraint.influence = 0.0
+    bpy.data.scenes.remove(staging_record['scene'])
+
+    # The next scene could reuse the staging scene's pointer, so anything stored for it is cleared.
+    search_utils.ClearSceneCollectionIndexes()
+    dependencies.ClearDependencyGraphs()
+
+    if staging_record['view_mode'] != 'OBJECT' and context.view_layer.objects.active is not None:
+        bpy.ops.object.mode_set(mode = staging_record['view_mode'])
+
+
+
+def MuteArmatureConstraints(context, targets = None):
+    """
+    Performs two operations together:
+    - Records the bone constraints of every armature in the targets, along with the armatures they depend on.
+    - Mutes them afterwards to prevent interference in the Capsule export, keeping the bones where
+      the constraints had placed them.
+
+    - targets: The objects being exported.  If None, every armature in the scene is used.
+    """
+
+    if targets is None:
+        targets = context.scene.objects
+    else:
+        targets = dependencies.GetDependencies(targets)
 
-    # Reset the constraint location now we have a 'true' location
-    for entry in record['armature_objects']:
-        item = context.scene.objects[entry['object_name']]
-        for bone in item.pose.bones:
-            if bone.name == entry['bone_name']:
-                entry['constraint_location'] = loc_utils.FindWorldSpaceBoneLocation(item, context, bone)
-
-    # Now all problematic constraints have been turned off, we can safely move
-    # objects to their initial positions
-    for entry in record['armature_objects']:
-        item = context.scene.objects[entry['object_name']]
-        for bone in item.pose.bones:
-            if bone.name == entry['bone_name']:
-                object_transform.MoveBone(item, bone, context, entry['true_location'])
+    # Bone matrices are only accurate once the scene has been evaluated.
+    context.view_layer.update()
+
+    record = {}
+    record['armatures'] = []
+
+    for item in targets:
+        if item.type != 'ARMATURE' or item.pose is None:
+            continue
+
+        pose_bones = item.pose.bones
+        bone_indices = [i for i, pose_bone in enumerate(pose_bones) if len(pose_bone.constraints) > 0]
+
+        if len(bone_indices) == 0:
+            continue
+
+        # Constraint states are stored in one list for the whole armature, in bone order.
+        constraints = [constraint for i in bone_indices for constraint in pose_bones[i].constraints]
+
+        armature_record = {}
+        armature_record['item'] = item
+        armature_record['bone_indices'] = bone_indices
+        armature_record['matrix_basis'] = [pose_bones[i].matrix_basis.copy() for i in bone_indices]
+        armature_record['constrained_matrix'] = [pose_bones[i].matrix.copy() for i in bone_indices]
+        armature_record['mute'] = array('b', [constraint.mute for constraint in constraints])
+        armature_record['influence'] = array('f', [constraint.influence for constraint in constraints])
+        record['armatures'].append(armature_record)
+
+        # NOW WE CAN MUTE THEM
+        for constraint in constraints:
+            constraint.mute = True
+            constraint.influence = 0.0
+    
+    # Now all problematic constraints have been turned off, the bones can be posed where the constraints had them.
+    # Setting a bone matrix depends on every bone above it, so the pose is updated whenever any of them was just posed.
+    for armature_record in record['armatures']:
+        item = armature_record['item']
+        pose_bones = item.pose.bones
+        posed = set()
+        context.view_layer.update()
+
+        for i, matrix in zip(armature_record['bone_indices'], armature_record['constrained_matrix']):
+            pose_bone = pose_bones[i]
+
+            if any(parent.name in posed for parent in pose_bone.parent_recursive):
+                context.view_layer.update()
+                posed.clear()
+            
+            pose_bone.matrix = matrix
+            posed.add(pose_bone.name)
+    
+    context.view_layer.update()
 
     return record
 
-# FIXME : Check if needed and/or is working.
+
 def RestoreArmatureConstraints(context, record):
     """
     Restores any armature constraint changes that were made to prepare the scene for export.
     """
 
-    # if self.export_preset.preserve_armature_constraints is True:
-    #     return
+    for armature_record in record['armatures']:
+        pose_bones = armature_record['item'].pose.bones
+        constraint_index = 0
 
-    # Restore constraint object positions
-    for entry in record['armature_objects']:
-        item = context.scene.objects[entry['object_name']]
-        for bone in item.pose.bones:
-            if bone.name == entry['bone_name']:
-                object_transform.MoveBone(item, bone, context, entry['constraint_location'])
+        for i, matrix_basis in zip(armature_record['bone_indices'], armature_record['matrix_basis']):
+            pose_bone = pose_bones[i]
+            pose_bone.matrix_basis = matrix_basis
+
+            for constraint in pose_bone.constraints:
+                constraint.mute = armature_record['mute'][constraint_index]
+                constraint.influence = armature_record['influence'][constraint_index]
+                constraint_index += 1
+    
+    context.view_layer.update()
 
-    # Restore Constraint Defaults
-    for entry in record['armature_constraints']:
-        item = bpy.data.objects[entry['object_name']]
-        for bone in item.pose.bones:
-            if bone.name == entry['bone_name']:
-                index = entry['index']
-                bone.constraints[index].mute = entry['enabled']
-                bone.constraints[index].influence = entry['influence']
 
 
+# The most objects or collections named for each problem in an error report, the console shows them all.
+ERROR_REPORT_NAME_LIMIT = 5
 
-def CheckCapsuleErrors(context, target_objects = None, target_collections = None):
-    # Ensures that the scene is setup with correct settings, before proceeding
-    # with the export.
+
+def FormatErrorNames(items):
+    """
+    Returns the names of the given objects, collections or presets as a short list for an error report.
+    """
+
+    names = [item.name for item in items[:ERROR_REPORT_NAME_LIMIT]]
+    result = ", ".join(names)
+
+    if len(items) > ERROR_REPORT_NAME_LIMIT:
+        result += " and %s more" % (len(items) - ERROR_REPORT_NAME_LIMIT)
+    
+    return result
+
+
+def CheckCapsuleErrors(context, target_objects = None, target_collections = None, output_root = None):
+    """
+    Ensures that the scene is setup with correct settings, before proceeding with the export.
+    Only the given objects and collections and the Location Presets they use are checked, 
+    or everything in the scene if they aren't given.
+
+    Every problem found is reported at once, and any objects with problems are selected.
+    Returns the report, or None if no errors were found.
+    """
 
     preferences = context.preferences
     addon_prefs = preferences.addons['Capsule'].preferences
     cap_file = bpy.data.objects[addon_prefs.default_datablock].CAPFile
-    
-    # TODO: Collect all errors for all objects and select them all at the end
-    # in order to make it easier for people to correct common mistakes.
 
     # TODO: Find a better way to handle invalid enumerations.
-    
-    # TODO: Export Selected doesn't have any impact on this, we should only check
-    # items that are in the export.
 
     # Check all active file presets for valid directory names
     # These lists will be analysed later
     sub_directory_check = []
-    statement = None
 
     if target_objects == None:
         target_objects = context.scene.objects
     if target_collections == None:
         target_collections = search_utils.GetSceneCollections(context.scene, False)
     
+    exports_len = len(cap_file.export_presets)
+    locations_len = len(cap_file.location_presets)
+
+    # The Location Presets used by the targets, which will have their paths checked.
+    used_locations = set()
+    
     # The errors that will be reported back.
     error_objects = {}
     error_objects['no_export'] = []
@@ -418,7 +691,6 @@ def CheckCapsuleErrors(context, target_objects = None, target_collections = None
 
     # ////////////////////////////////////////////////
     # OBJECTS
-    
 
     # Checks for any easily-preventable errors
     for item in target_objects:
@@ -427,53 +699,13 @@ def CheckCapsuleErrors(context, target_objects = None, target_collections = None
             
             # Check for Valid Presets
             # EnumProperty types are ints when valid and empty strings when invalid
-            if cap_obj.export_preset == '':
+            if cap_obj.export_preset == '' or not (0 < int(cap_obj.export_preset) <= exports_len):
                 error_objects['no_export'].append(item)
-                continue
             
-            if cap_obj.location_preset == '':
+            if cap_obj.location_preset == '' or not (0 < int(cap_obj.location_preset) <= locations_len):
                 error_objects['no_location'].append(item)
-                continue
-            
-            cap_export_enum = int(cap_obj.export_preset)
-            cap_location_enum = int(cap_obj.location_preset)
-            exports_len = len(cap_file.export_presets)
-            locations_len = len(cap_file.location_presets)
-
-            # Check Export Key
-            if cap_export_enum == 0 or cap_export_enum > exports_len:
-                error_objects['no_export'].append(item)
-
-            # Check Location Preset
-            if cap_location_enum == 0 or cap_location_enum > locations_len:
-                error_objects['no_location'].append(item)
-
-
-    # Total up any errors found.
-    max_error_value = 0
-    max_error = ''
-    target_objects = []
-    for k, v in error_objects.items():
-        if (len(v) > max_error_value):
-            max_error_value = len(v)
-            max_error = k
-            target_objects = v
-    
-
-    # If any were found, report the biggest issue and select the objects that had it.
-    if max_error_value > 0:
-        if max_error == 'no_export':
-            statement = "The selected object(s) require a Export Preset to be defined - check the Export Lists to see all missing properties."
-
-        elif max_error == 'no_location':
-            statement = "The selected object(s) require a Location Preset to be defined - check the Export Lists to see all missing properties."
-        
-        bpy.ops.object.select_all(action= 'DESELECT')
-
-        for item in target_objects:
-            select_utils.SelectObject(item)
-        
-        return statement
+            else:
+                used_locations.add(int(cap_obj.location_preset) - 1)
 
 
     # ////////////////////////////////////////////////
@@ -481,12 +713,10 @@ def CheckCapsuleErrors(context, target_objects = None, target_collections = None
 
     # TODO: The Collection should be selected, not the objects!
     error_collections = {}
+    error_collections['no_root'] = []
     error_collections['no_export'] = []
     error_collections['no_location'] = []
-    error_collections['no_root'] = []
 
-
-    # Check all scene collections for potential errors
     for collection in target_collections:
         if collection.CAPCol.enable_export is True:
             cap_col = collection.CAPCol
@@ -497,81 +727,82 @@ def CheckCapsuleErrors(context, target_objects = None, target_collections = None
                     error_collections['no_root'].append(collection)
 
             # Check for Valid Presets
-            # EnumProperty types are ints when valid and empty strings when invalid
-            if cap_col.export_preset == '':
+            if cap_col.export_preset == '' or not (0 < int(cap_col.export_preset) <= exports_len):
                 error_collections['no_export'].append(collection)
-                continue
             
-            if cap_col.location_preset == '':
-                error_collections['no_location'].append(collection)
-                continue
-
-
-            cap_export_enum = int(cap_col.export_preset)
-            cap_location_enum = int(cap_col.location_preset)
-            exports_len = len(cap_file.export_presets)
-            locations_len = len(cap_file.location_presets)
-            
-
-            # Check Export Key
-            if cap_export_enum == 0 or cap_export_enum > exports_len:
-                error_collections['no_export'].append(collection)
-
-            # Check Export Location
-            if cap_location_enum <= 0 or cap_location_enum > locations_len:
+            if cap_col.location_preset == '' or not (0 < int(cap_col.location_preset) <= locations_len):
                 error_collections['no_location'].append(collection)
+            else:
+                used_locations.add(int(cap_col.location_preset) - 1)
+    
 
+    # ////////////////////////////////////////////////
+    # PATHS AND DIRECTORIES
 
-    # Total up any errors found.
-    max_error_value = 0
-    max_error = ''
-    target_collections = []
-    for k, v in error_collections.items():
-        if (len(v) > max_error_value):
-            max_error_value = len(v)
-            max_error = k
-            target_objects = v
-    
+    error_locations = {}
+    error_locations['no_path'] = []
+    error_locations['bad_path'] = []
 
-    # If any were found, report the biggest issue and select the objects that had it.
-    if max_error_value > 0:
-        if max_error == 'no_root':
-            statement = " % s collection(s) require a Root Object to be defined - check the Export Lists to see all missing properties." % (max_error_value)
+    # Presets can share a directory, so each one is only checked on the disk once.
+    directory_checks = {}
 
-        elif max_error == 'no_export':
-            statement = "% s collection(s) require an Export Preset to be defined - check the Export Lists to see all missing properties." % (max_error_value)
+    for location_index in sorted(used_locations):
+        location_preset = cap_file.location_presets[location_index]
 
-        elif max_error == 'no_location':
-            statement = "% s collection(s) require a Location Preset to be defined - check the Export Lists to see all missing properties." % (max_error_value)
+        if location_preset.path == "":
+            error_locations['no_path'].append(location_preset)
+            continue
+        
+        # Relative paths under an output root are created when exporting, so only the root needs to be usable.
+        if output_root is not None and location_preset.path.startswith('//'):
+            check_directory = path_utils.FindExistingDirectory(output_root)
+            if check_directory not in directory_checks:
+                directory_checks[check_directory] = check_directory is not None and os.access(check_directory, os.W_OK)
+        
+        # Tags can't be filled until export, so only the directory before the first one is checked.
+        else:
+            check_directory = path_utils.GetBaseDirectory(location_preset.path, output_root)
+            if check_directory not in directory_checks:
+                directory_checks[check_directory] = os.path.isdir(check_directory)
         
-        return statement
+        if directory_checks[check_directory] is False:
+            error_locations['bad_path'].append(location_preset)
     
 
     # ////////////////////////////////////////////////
-    # PATHS AND DIRECTORIES
-
-    # Check all Location Presets to ensure the chatacters contained are valid.
-    i = 0
-    while i < len(cap_file.location_presets):
-        enumIndex = i
-        enumIndex -= 1
-
-        default_file_path = cap_file.location_presets[enumIndex].path
+    # REPORT
 
-        if default_file_path == "":
-            statement = "The Export Location '" + cap_file.location_presets[enumIndex].name + "' has no file path.  Please set one before attempting to export."
-            return statement
-        
-        # TODO: os.path.isdir breaks on relative paths.
-        full_path = bpy.path.abspath(default_file_path)
-        print(full_path)
-        if not os.path.isdir(full_path):
-            statement = "The Export Location '" + cap_file.location_presets[enumIndex].name + "' either points to a file or is a Relative Path that is now incorrect.  Please re-assign the location path."
-            return statement
+    statements = []
 
+    if len(error_objects['no_export']) > 0:
+        statements.append("%s object(s) require an Export Preset to be defined - %s." 
+            % (len(error_objects['no_export']), FormatErrorNames(error_objects['no_export'])))
+    
+    if len(error_objects['no_location']) > 0:
+        statements.append("%s object(s) require a Location Preset to be defined - %s." 
+            % (len(error_objects['no_location']), FormatErrorNames(error_objects['no_location'])))
+    
+    if len(error_collections['no_root']) > 0:
+        statements.append("%s collection(s) require a Root Object to be defined - %s." 
+            % (len(error_collections['no_root']), FormatErrorNames(error_collections['no_root'])))
 
-        i += 1
+    if len(error_collections['no_export']) > 0:
+        statements.append("%s collection(s) require an Export Preset to be defined - %s." 
+            % (len(error_collections['no_export']), FormatErrorNames(error_collections['no_export'])))
+    
+    if len(error_collections['no_location']) > 0:
+        statements.append("%s collection(s) require a Location Preset to be defined - %s." 
+            % (len(error_collections['no_location']), FormatErrorNames(error_collections['no_location'])))
+    
+    if len(error_locations['no_path']) > 0:
+        statements.append("These Export Locations have no file path, please set one before attempting to export - %s." 
+            % FormatErrorNames(error_locations['no_path']))
+    
+    if len(error_locations['bad_path']) > 0:
+        statements.append("These Export Locations either point to a file or are a Relative Path that is now incorrect, please re-assign the location path - %s." 
+            % FormatErrorNames(error_locations['bad_path']))
     
+
     # # Check all collected sub-directory names for invalid characters if we can't replace them.
     if addon_prefs.substitute_directories is False:
 
@@ -592,8 +823,31 @@ def CheckCapsuleErrors(context, target_objects = None, target_collections = None
                     text = result.pop()
                     returnStatement += text + " "
 
-                statement = "The" + name[0] + " " + name[1] + ", belonging to the export, " + name[3] + characterlead + returnStatement + end
-                return statement
-
+                statements.append("The" + name[0] + " " + name[1] + ", belonging to the export, " + name[3] + characterlead + returnStatement + end)
+    
+    if len(statements) == 0:
+        return None
+    
 
-    return None
+    # The full list of everything with a problem is printed, as the report only shows a few names.
+    print("Capsule Error - The export can't continue until these problems are fixed:")
+    for category, items in [('Objects without an Export Preset', error_objects['no_export']),
+            ('Objects without a Location Preset', error_objects['no_location']),
+            ('Collections without a Root Object', error_collections['no_root']),
+            ('Collections without an Export Preset', error_collections['no_export']),
+            ('Collections without a Location Preset', error_collections['no_location']),
+            ('Export Locations without a path', error_locations['no_path']),
+            ('Export Locations with an invalid path', error_locations['bad_path'])]:
+        if len(items) > 0:
+            print(" -", category + ":", ", ".join(item.name for item in items))
+
+    # Select every object with a problem, so they can all be fixed at once.
+    error_selection = error_objects['no_export'] + error_objects['no_location']
+    if len(error_selection) > 0:
+        for item in list(context.view_layer.objects.selected):
+            item.select_set(False)
+
+        for item in error_selection:
+            select_utils.SelectObject(item)
+    
+    return "\n".join(statements)
@@ -16,26 +16,83 @@ def TraverseCollectionTree(t):
         yield from TraverseCollectionTree(child)
 
 
+# ////////////////////////////////////////
+# SCENE COLLECTION INDEX
+
+# The collection indexes of each scene, stored by scene pointer until the collections in any scene change.
+scene_collection_indexes = {}
+
+
+def BuildSceneCollectionIndex(scene):
+    """
+    Builds an index of every collection in a scene by walking down from the scene collection,
+    recording the depth, parent and object count of each one.
+    """
+
+    index = {}
+    index['collections'] = []
+    index['depth'] = {}
+    index['parent'] = {}
+    index['object_count'] = {}
+
+    # Collections can be linked in more than one place, the first one found is recorded.
+    stack = [(child, scene.collection, 1) for child in reversed(scene.collection.children)]
+
+    while len(stack) > 0:
+        collection, parent, depth = stack.pop()
+        if collection in index['depth']:
+            continue
+
+        index['collections'].append(collection)
+        index['depth'][collection] = depth
+        index['parent'][collection] = parent
+        index['object_count'][collection] = len(collection.objects)
+
+        stack += [(child, collection, depth + 1) for child in reversed(collection.children)]
+
+    return index
+
+
+def GetSceneCollectionIndex(scene, rebuild = False):
+    """
+    Returns the collection index for a scene, building it if it doesn't exist yet or if rebuild is True.
+    """
+
+    key = scene.as_pointer()
+    index = scene_collection_indexes.get(key)
+
+    if index is None or rebuild is True:
+        index = BuildSceneCollectionIndex(scene)
+        scene_collection_indexes[key] = index
+
+    return index
+
+
+def ClearSceneCollectionIndexes():
+    """
+    Removes every stored collection index, so they're built again the next time they're needed.
+    """
+
+    scene_collection_indexes.clear()
+
+
 def GetSceneCollections(scene, hasObjects = False):
     """
-    Returns all collections that belong to the scene, by searching through all objects belonging in it.
+    Returns all collections that belong to the scene, using the scene's collection index.
     """
 
-    # batfinger is too good at this
-    #print(bpy.data.collections)
-    collections = [
-        c for c in bpy.data.collections 
-        if bpy.context.scene.user_of_id(c) and
-        (hasObjects is False or len(c.objects) > 0)
-    ]
+    collections = GetSceneCollectionIndex(scene)['collections']
 
-    # bpy.data.collections does not include the top-level collection so we need to include it separately.
+    # The index doesn't include the top-level collection so we need to include it separately.
     # TODO: Re-enable when the top-level collection scene issue is fixed.
     # if hasObjects is False or len(scene.collection.objects > 0):
     #     collections.insert(0, scene.collection)
-    
 
-    return collections
+    # Object counts can change without the collections changing, so they're checked directly.
+    if hasObjects is True:
+        return [c for c in collections if len(c.objects) > 0]
+    
+    return list(collections)
 
 
 def GetEditableCollections(context):
@@ -138,209 +195,293 @@ def GetSelectedCollections():
     #print(collections_found)
     return collections_found
 
-def GetObjectParentTree(context, target_obj, object_children):
+# ////////////////////////////////////////
+# HIERARCHY INDEX
+
+# How many layers of the hierarchy each child setting includes.  None means every layer.
+# For objects the layers are counted below the object, for collections they include the collection itself.
+OBJECT_CHILD_DEPTHS = {'None': 0, 'Down 1': 1, 'Down 2': 2, 'Down 3': 3, 'Down 4': 4, 'Down 5': 5, 'All': None}
+COLLECTION_CHILD_DEPTHS = {'None': 1, 'Down 1': 1, 'Down 2': 2, 'Down 3': 3, 'Down 4': 4, 'Down 5': 5, 'All': None}
+
+
+def BuildHierarchyIndex(scene):
     """
-    Returns a list of objects that can be exported by the given object, based on it's child settings.
+    Builds an index of the object hierarchy in the scene, so the objects exported by any 
+    object or collection can be found without searching the scene again.
+    Object.children searches every object in the file, so this only does it once.
     """
-    # Now setup the recursive tree search.
-    def ExportTreeSearch(current_layer, max_layer, current_obj):
 
-        object_list = []
-        
-        # If we've over-extended, return
-        if current_layer >= max_layer and max_layer != -1:
-            return []
-            
-        # If not, add the current objects
-        object_list += current_obj.children
-
-        # Now search further
-        for new_obj in current_obj.children:
-            new_objects = ExportTreeSearch(current_layer + 1, max_layer, new_obj)
-            object_list += new_objects
-        
-        return object_list
+    index = {}
+    index['children'] = {}
+    index['object_descendants'] = {}
+    index['collection_objects'] = {}
 
-    object_list = []
+    for item in scene.objects:
+        if item.parent is not None:
+            index['children'].setdefault(item.parent, []).append(item)
 
-    if object_children == "All":
-        object_list += target_obj.children_recursive
-        return object_list
+    return index
 
-    elif object_children == "None":
-        return object_list
 
-    # If we get here, we need to search and cancel by layers.  First get the layer max.
-    max_layers = 0
-    if object_children == "Down 1":
-        max_layers = 1
-    elif object_children == "Down 2":
-        max_layers = 2
-    elif object_children == "Down 3":
-        max_layers = 3
-    elif object_children == "Down 4":
-        max_layers = 4
-    elif object_children == "Down 5":
-        max_layers = 5
+def GetIndexedDescendants(index, target, depth):
+    """
+    Returns the descendants of an object up to the given depth (or all of them if None) from a hierarchy index.
+    Results are cached in the index and shared between queries, so they must not be modified.
+    """
+
+    key = (target, depth)
+    result = index['object_descendants'].get(key)
+    if result is not None:
+        return result
+
+    result = []
+    children = index['children'].get(target, [])
 
+    if depth is None:
+        # Deep hierarchies could exceed the recursion limit, so walk these iteratively.
+        stack = list(reversed(children))
+        while len(stack) > 0:
+            item = stack.pop()
+            result.append(item)
+            stack += reversed(index['children'].get(item, []))
 
-    object_list = ExportTreeSearch(0, max_layers, target_obj)
-    return object_list
+    elif depth > 0:
+        result += children
+        for child in children:
+            result += GetIndexedDescendants(index, child, depth - 1)
 
+    index['object_descendants'][key] = result
+    return result
 
 
-def GetCollectionObjectTree(context, collection, collection_children):
+def GetIndexedCollectionObjects(index, collection, depth):
+    """
+    Returns the objects in a collection and its child collections up to the given depth
+    (or all of them if None) from a hierarchy index.
+    Results are cached in the index and shared between queries, so they must not be modified.
+    """
+
+    key = (collection, depth)
+    result = index['collection_objects'].get(key)
+    if result is not None:
+        return result
+
+    if depth is None:
+        result = list(collection.all_objects)
+
+    elif depth > 0:
+        result = list(collection.objects)
+        for child in collection.children:
+            result += GetIndexedCollectionObjects(index, child, depth - 1)
+
+        # Objects can be linked to more than one child collection.
+        result = list(dict.fromkeys(result))
+
+    else:
+        result = []
+
+    index['collection_objects'][key] = result
+    return result
+
+
+def GetObjectParentTree(context, target_obj, object_children, hierarchy_index = None):
+    """
+    Returns a list of objects that can be exported by the given object, based on it's child settings.
+    - hierarchy_index: A hierarchy index to search with.  If None, one will be built for the current scene.
+    """
+
+    if hierarchy_index is None:
+        hierarchy_index = BuildHierarchyIndex(context.scene)
+
+    depth = OBJECT_CHILD_DEPTHS.get(object_children, 0)
+    return list(GetIndexedDescendants(hierarchy_index, target_obj, depth))
+
+
+
+def GetCollectionObjectTree(context, collection, collection_children, hierarchy_index = None):
     """
     Returns a list of objects that can be exported by the given collection, based on it's child settings.
+    - hierarchy_index: A hierarchy index to search with.  If None, one will be built for the current scene.
+    """
+
+    if hierarchy_index is None:
+        hierarchy_index = BuildHierarchyIndex(context.scene)
+
+    depth = COLLECTION_CHILD_DEPTHS.get(collection_children, 1)
+    return list(GetIndexedCollectionObjects(hierarchy_index, collection, depth))
+
+
+# ////////////////////////////////////////
+# RENDER VISIBILITY
+
+def BuildRenderHiddenCollections(view_layer):
     """
+    Returns the set of collections in a view layer that won't render, either because they're excluded,
+    have rendering disabled or have a parent collection that does.
+    Collections linked in more than one place are only hidden if they're hidden everywhere.
+    """
+
+    visible = set()
+    hidden = set()
+    stack = [(child, False) for child in view_layer.layer_collection.children]
+
+    while len(stack) > 0:
+        layer_col, parent_hidden = stack.pop()
+        collection = layer_col.collection
+        col_hidden = parent_hidden or layer_col.exclude or collection.hide_render
+
+        if col_hidden:
+            hidden.add(collection)
+        else:
+            visible.add(collection)
+
+        stack += [(child, col_hidden) for child in layer_col.children]
 
-    # TODO: Ensure that somewhere in our export chain if Filter by Render Visibility is used,
-    # that only objects where the parent collection is not hidden will be exported.
+    return hidden - visible
 
-    # Now setup the recursive tree search.
-    def ExportTreeSearch(current_layer, max_layer, current_collection):
 
-        object_list = []
+def GetRenderHiddenCollections(context, hierarchy_index):
+    """
+    Returns the collections that won't render in the current view layer, building them the first time
+    they're needed and keeping them in the hierarchy index for the rest of the export.
+    """
+
+    hidden = hierarchy_index.get('render_hidden_collections')
+    if hidden is None:
+        hidden = BuildRenderHiddenCollections(context.view_layer)
+        hierarchy_index['render_hidden_collections'] = hidden
+
+    return hidden
+
+
+def FilterByRenderVisibility(targets, hidden_collections):
+    """
+    Returns the targets that will render, removing any that have rendering disabled 
+    or belong to a collection that won't render.
+    """
+
+    renderable = []
+
+    for target in targets:
+        if target.hide_render is True:
+            continue
         
-        # If we've over-extended, return
-        if current_layer >= max_layer and max_layer != -1:
-            return []
-            
-        # If not, add the current objects
-        object_list += current_collection.objects
-
-        # Now search further
-        for new_collection in current_collection.children:
-            new_objects = ExportTreeSearch(current_layer + 1, max_layer, new_collection)
-            object_list += new_objects
+        # Collections from other scenes aren't in the view layer, so only their own setting can be checked.
+        if any(col in hidden_collections or col.hide_render is True for col in target.users_collection):
+            continue
         
-        return object_list
+        renderable.append(target)
+    
+    return renderable
 
 
-    object_list = []
+# ////////////////////////////////////////
+# REFERENCE INDEX
 
-    if collection_children == "All":
-        object_list += collection.all_objects
-        return object_list
-    
-    elif collection_children == "None":
-        object_list += collection.objects
-        return object_list
-
-    # If we get here, we need to search and cancel by layers.  First get the layer max.
-    max_layers = 0
-    if collection_children == "Down 1":
-        max_layers = 1
-    if collection_children == "Down 2":
-        max_layers = 2
-    if collection_children == "Down 3":
-        max_layers = 3
-    if collection_children == "Down 4":
-        max_layers = 4
-    if collection_children == "Down 5":
-        max_layers = 5
+# The types of datablock the reference index records the users of.
+REFERENCE_INDEX_TYPES = {'OBJECT', 'MESH', 'CURVE', 'CURVES', 'META', 'LATTICE', 'LIGHT', 'CAMERA', 'ARMATURE',
+    'MATERIAL', 'IMAGE', 'TEXTURE', 'NODETREE', 'ACTION', 'PARTICLE'}
 
-    
-    object_list = ExportTreeSearch(0, max_layers, collection)
-    return object_list
 
+def BuildReferenceIndex():
+    """
+    Builds an index of which datablocks use which, from a single call to bpy.data.user_map().
+    """
+
+    index = {}
+    index['users'] = bpy.data.user_map(key_types = REFERENCE_INDEX_TYPES)
+    index['uses'] = {}
+
+    for datablock, users in index['users'].items():
+        for user in users:
+            index['uses'].setdefault(user, set()).add(datablock)
+
+    return index
+
+
+def GetReferenceClosure(reference_index, targets):
+    """
+    Returns a set of the given datablocks and every datablock they use, directly or through other datablocks.
+    """
+
+    found = set(targets)
+    stack = list(found)
+
+    while len(stack) > 0:
+        item = stack.pop()
+        for used in reference_index['uses'].get(item, ()):
+            if used not in found:
+                found.add(used)
+                stack.append(used)
+
+    return found
 
-def GetObjectReferenceTree(targets):
+
+def GetObjectReferenceTree(targets, reference_index = None):
     """
-    Searches recursively for all objects used by another object until all have been found.
+    Searches for all objects used by the target objects, directly or through any other datablock, 
+    and returns them after the targets.
+    - reference_index: A reference index to search with.  If None, one will be built.
     """
 
-    def recursive_search(objects):
-        for obj in objects:
-            new_objects = [
-                o for o in bpy.data.objects
-                if obj.user_of_id(o) and
-                (o not in objects)
-            ]
+    if reference_index is None:
+        reference_index = BuildReferenceIndex()
 
-            objects += recursive_search(new_objects)
-        return objects
+    targets = list(targets)
+    target_set = set(targets)
+    closure = GetReferenceClosure(reference_index, targets)
 
-    return recursive_search(targets)
+    return targets + [d for d in closure if isinstance(d, bpy.types.Object) and d not in target_set]
 
 
-def FindObjectDependencies(context, targets):
+def FindObjectDependencies(context, targets, reference_index = None):
     """
-    Returns a list of every unique non-object datablock the target objects use.
+    Returns a dictionary of every unique non-object datablock the target objects use, sorted by type.
+    - reference_index: A reference index to search with.  If None, one will be built.
     """
 
+    if reference_index is None:
+        reference_index = BuildReferenceIndex()
+
+    closure = GetReferenceClosure(reference_index, targets)
+
     # Object data includes the main datablock that defines
     # an object (mesh, light, curve, etc)
-    object_data = []
+    result = {}
+    result['mesh'] = set(o.data for o in targets if o.data is not None)
+    result['materials'] = set(d for d in closure if isinstance(d, bpy.types.Material))
+    result['images'] = set(d for d in closure if isinstance(d, bpy.types.Image))
+    result['node_groups'] = set(d for d in closure if isinstance(d, bpy.types.NodeTree))
+    result['actions'] = set(d for d in closure if isinstance(d, bpy.types.Action))
 
-    materials = []
-    actions = []
-    particles = []
-    
+    return result
 
-    # /////////////////////////
-    # GET UNIQUE OBJECT DATA
-    object_data = set(o.data for o in targets)
-    print(object_data)
 
+def FindUnsharedDependencies(reference_index, targets):
+    """
+    Returns the set of non-object datablocks used by the target objects that nothing else uses,
+    which can be safely removed with them.  Linked and fake user datablocks are never included.
+    """
 
-    # /////////////////////////
-    # GET MATERIALS
-    # The first one is a nested list comprehension, the second flattens nested arrays
-    # and gets the unique values using set()
-    materials = [[slot.material for slot in o.material_slots] 
-                 for o in targets]
-    materials = [i for j in materials for i in j]
-    print(materials)
-    
+    target_set = set(targets)
+    candidates = [d for d in GetReferenceClosure(reference_index, targets)
+        if not isinstance(d, bpy.types.Object) and d.library is None and d.use_fake_user is False]
 
-    # GET MODIFIER DEPENDENCIES
-    for target in targets:
-        for mod in target.modifiers:
-                        # This needs to intercept both inputs and outputs
-            if mod.type == "NODES":
+    # A datablock can only be removed once everything using it is being removed, so keep 
+    # checking until no more are found.
+    unshared = set()
+    found = True
 
-                if mod.node_group is None:
-                    continue
-                
-                # We first need the NodeSocket types for the input nodes.
-                # the NodeGroup won't give us the set values, just the data layout.
-                input_node = next((node for node in mod.node_group.nodes if node.type == 'GROUP_INPUT'), None)
-                input_props = [prop for prop in input_node.outputs 
-                               if prop.type is not 'GEOMETRY']
-                input_props.pop(len(input_props) - 1)
-                input_props.pop(0)
-
-                # Inputs IDs are labelled from 'Input_1' onwards
-                input_prop_ids = [prop_id for prop_id in mod.keys()
-                        if (prop_id.startswith("Input_") and prop_id[-1].isdigit())]
-
-                print([prop.type for prop in input_props])
-                
-                i = 0
-                node_mats = []
-                # print("INPUT PROPS")
-                # print(input_props)
-                # print("INPUT PROP IDS")
-                # print(input_prop_ids)
-                for i, prop in enumerate(input_props):
-                    if input_props[i].type == 'MATERIAL':
-                        if mod[input_prop_ids[i]] not in materials:
-                            materials.append(mod[input_prop_ids[i]])
-                    i += 1
-
-            # This AFAIK finds materials in any standard modifier
-            else:
-                materials += [p for p in mod.bl_rna.properties 
-                              if p.type is 'MATERIAL' and not p.is_hidden and not p.is_readonly]
-                        
-
-    # Collapse and create unique lists
-    print(materials)
-    
-    result = {}
-    result['mesh'] = object_data
-    result['materials'] = materials
+    while found is True:
+        found = False
 
+        for datablock in candidates:
+            if datablock in unshared:
+                continue
 
+            users = reference_index['users'].get(datablock, set())
+            if all(user in target_set or user in unshared for user in users):
+                unshared.add(datablock)
+                found = True
 
+    return unshared
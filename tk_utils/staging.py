@@ -0,0 +1,141 @@
+# ///////////////////////////////////////////////////////////////////
+# Stages exported files and only replaces the ones whose contents changed.
+# ///////////////////////////////////////////////////////////////////
+
+import errno, hashlib, os, shutil, tempfile
+
+# The prefix of staging directories, so any left behind by a crash can be recognised.
+STAGING_PREFIX = ".capsule_staging_"
+
+# How much of a file is read at once when hashing it.
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def HashFile(file_path):
+    """
+    Returns the SHA-1 hash of a file's contents as a hex string.
+    """
+
+    hasher = hashlib.sha1()
+
+    with open(file_path, 'rb') as hash_file:
+        for block in iter(lambda: hash_file.read(HASH_BLOCK_SIZE), b''):
+            hasher.update(block)
+
+    return hasher.hexdigest()
+
+
+def IsSameVolume(path_a, path_b):
+    """
+    Returns True if both paths are stored on the same volume, so files can be moved between them atomically.
+    """
+
+    try:
+        return os.stat(path_a).st_dev == os.stat(path_b).st_dev
+    except OSError:
+        return False
+
+
+def CreateStagingDirectory(export_directory, blend_directory = None):
+    """
+    Creates an empty staging directory and returns its path, ending in a separator.
+
+    Files are never staged inside the export directory, as anything watching it would see them being written.
+    The blend file's directory or the system temp directory are used instead, preferring whichever is on the
+    same volume as the export directory so that finished files can be moved into place atomically.
+    """
+
+    candidates = [blend_directory, tempfile.gettempdir()]
+    candidates = [directory for directory in candidates if directory and os.path.isdir(directory)]
+    staging_root = tempfile.gettempdir()
+
+    for candidate in candidates:
+        if IsSameVolume(candidate, export_directory):
+            staging_root = candidate
+            break
+
+    return tempfile.mkdtemp(prefix = STAGING_PREFIX, dir = staging_root) + os.sep
+
+
+def MoveFile(source_path, destination_path):
+    """
+    Moves a file into place, replacing any existing file at the destination.
+    If the two are on different volumes the file is copied next to the destination first, so the
+    existing file is still only replaced once the new one is complete.
+    """
+
+    try:
+        os.replace(source_path, destination_path)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+
+        destination_directory, destination_name = os.path.split(destination_path)
+        copy_handle, copy_path = tempfile.mkstemp(prefix = STAGING_PREFIX + destination_name + "_", dir = destination_directory)
+        os.close(copy_handle)
+
+        try:
+            shutil.copy2(source_path, copy_path)
+            os.replace(copy_path, destination_path)
+        except BaseException:
+            if os.path.exists(copy_path):
+                os.remove(copy_path)
+            raise
+
+        os.remove(source_path)
+
+
+def IsFileUnchanged(staged_path, destination_path, staged_hash):
+    """
+    Returns True if the destination file already exists with the same contents as the staged file.
+    """
+
+    if not os.path.isfile(destination_path):
+        return False
+
+    # Files of different sizes can't match, so only hash the destination if they could.
+    if os.path.getsize(staged_path) != os.path.getsize(destination_path):
+        return False
+
+    return HashFile(destination_path) == staged_hash
+
+
+def CommitStagedFiles(staging_directory, export_directory):
+    """
+    Moves every file written to the staging directory into the export directory, keeping any sub-directories.
+    Files whose contents are identical to the existing file are discarded, so the existing file
+    and its modification time are left alone.
+
+    Returns a list with a record for every file, containing its path, size, hash and whether it was written.
+    """
+
+    records = []
+
+    for root, directories, files in os.walk(staging_directory):
+        for file_name in files:
+            staged_path = os.path.join(root, file_name)
+            relative_path = os.path.relpath(staged_path, staging_directory)
+            destination_path = os.path.join(export_directory, relative_path)
+
+            record = {}
+            record['path'] = destination_path
+            record['size'] = os.path.getsize(staged_path)
+            record['hash'] = HashFile(staged_path)
+            record['written'] = False
+
+            if IsFileUnchanged(staged_path, destination_path, record['hash']) is False:
+                os.makedirs(os.path.dirname(destination_path), exist_ok = True)
+                MoveFile(staged_path, destination_path)
+                record['written'] = True
+
+            records.append(record)
+
+    return records
+
+
+def RemoveStagingDirectory(staging_directory):
+    """
+    Deletes a staging directory and anything left inside it.
+    """
+
+    shutil.rmtree(staging_directory, ignore_errors = True)
@@ -10,6 +10,8 @@ from bpy.props import IntProperty, BoolProperty, FloatProperty, EnumProperty, Po
 from .tk_utils import search as search_utils
 from .tk_utils import select as select_utils
 from .tk_utils import object_ops
+from .tk_utils import manifest
+from .update import update_list
 from .export_formats import CAP_ExportFormat
 from . import export_presets
 
@@ -87,8 +89,8 @@ class CAPSULE_OT_Add_File_Location_Tag(Operator):
         description = "",
         items =  (
         ('export_name', 'Export Name', 'Adds a folder with the name of the Object or Collection being exported.'),
-        # ('object_type', 'Object Type', 'Adds a folder with the object type.'),
-        # ('collection', 'Collection Name', 'Adds a folder with the collection name.'),
+        ('object_type', 'Object Type', 'Adds a folder with the object type.'),
+        ('collection', 'Collection Name', 'Adds a folder with the collection name.'),
         ('blend_file_name', 'Blend File Name', 'Adds a folder with the blend file name.'),
         # ('location_preset_name', 'Location Preset Name', 'Adds a folder with the Location Preset name used on export.'),
         ('export_preset_name', 'Export Preset Name', 'Adds a folder with the Export Preset name used on export.'),
@@ -251,6 +253,8 @@ class CAPSULE_OT_Clear_List(Operator):
                 col.in_export_list = False
             scn.collection_list.clear()
 
+        update_list.ClearListIndexes()
+
         return {'FINISHED'}
 
 class CAPSULE_OT_Refresh_List(Operator):
@@ -276,13 +280,32 @@ class CAPSULE_OT_Refresh_List(Operator):
 
         elif objectTab == 2:
             scn.collection_list.clear()
+            search_utils.GetSceneCollectionIndex(context.scene, rebuild = True)
             for collection in search_utils.GetSceneCollections(context.scene, False):
-                print(collection)
                 if collection.CAPCol.in_export_list is True:
                         entry = scn.collection_list.add()
                         entry.collection = collection
                         entry.enable_export = collection.CAPCol.enable_export
 
+        # The lists were rebuilt directly, so their indexes no longer match.
+        update_list.ClearListIndexes()
+
+        return {'FINISHED'}
+
+
+class CAPSULE_OT_Refresh_Manifest(Operator):
+    """Reload the export manifest for this blend file, and check which exported files are missing or have changed since they were exported"""
+
+    bl_idname = "scene.cap_refreshmanifest"
+    bl_label = "Refresh Manifest"
+
+    def execute(self, context):
+
+        if manifest.GetManifestPath() is None:
+            self.report({'WARNING'}, "The blend file needs to be saved before it can have an export manifest.")
+            return {'CANCELLED'}
+        
+        manifest.UpdateManifestSummary()
         return {'FINISHED'}
 
 
@@ -2,7 +2,7 @@
 import bpy, bmesh, time
 from math import *
 
-from .update_list import UpdateCollectionList
+from .update_list import UpdateCollectionList, UpdateCollectionListBulk
 from ..tk_utils import search as search_utils
 
 # COLLECTION DATA PROXY PROPERTIES
@@ -32,9 +32,9 @@ def CAP_Update_ProxyCol_EnableExport(self, context):
     # TODO: Not sure why a collection here would become invalid
     for collection in collected:
         if collection is not None:
-            # print(collection)
             collection.CAPCol.enable_export = value
-            UpdateCollectionList(context.scene, collection, value)
+    
+    UpdateCollectionListBulk(context.scene, collected, value)
 
     return None
 
@@ -1,9 +1,116 @@
-import bpy
+import bpy, re
 from math import *
 
 from ..tk_utils import select as select_utils
 from ..tk_utils import object_ops
 
+# LIST INDEXES
+# /////////////////////////////////////////////////
+# /////////////////////////////////////////////////
+
+# Maps the objects and collections in each export list to their position in it, stored by scene pointer and list.
+# These are rebuilt whenever a list changes length or an item can't be found in an index that may be out of date, 
+# and cleared when a file is loaded, an undo step is taken or a list is rebuilt.
+list_indexes = {}
+
+LIST_ITEM_PATTERN = re.compile(r'\[(\d+)\]$')
+
+
+def GetListIndex(export_list, attribute, rebuild = False):
+    """
+    Returns a dictionary mapping the pointer of every object or collection in an export list to its position.
+    - attribute: The name of the list item property holding the object or collection.
+    - rebuild: If True the index is built again even if the list is the same length.
+    """
+
+    key = (export_list.id_data.as_pointer(), attribute)
+    index = list_indexes.get(key)
+
+    if index is None or rebuild is True or index['length'] != len(export_list):
+        index = {}
+        index['length'] = len(export_list)
+        index['items'] = {}
+        index['verified'] = True
+
+        for i, item in enumerate(export_list):
+            target = getattr(item, attribute)
+            if target is not None:
+                index['items'][target.as_pointer()] = i
+        
+        list_indexes[key] = index
+
+    return index
+
+
+def ClearListIndexes():
+    """
+    Removes every stored list index, so they're built again the next time they're needed.
+    """
+
+    list_indexes.clear()
+
+
+def ExpireListIndex(export_list, attribute):
+    """
+    Marks the index of an export list as possibly out of date, as the list could have been changed elsewhere 
+    without changing length.  The next item that can't be found will rebuild it once before trusting it.
+    """
+
+    index = list_indexes.get((export_list.id_data.as_pointer(), attribute))
+    if index is not None:
+        index['verified'] = False
+
+
+def FindListItem(export_list, attribute, target):
+    """
+    Returns the export list item for the given object or collection, or None if it isn't in the list.
+    """
+
+    index = GetListIndex(export_list, attribute)
+    i = index['items'].get(target.as_pointer())
+
+    if i is not None:
+        item = export_list[i]
+        if getattr(item, attribute) == target:
+            return item
+    
+    # The list was changed without changing length, so a wrong match or a miss from an out of date index starts again.
+    if i is not None or index['verified'] is False:
+        index = GetListIndex(export_list, attribute, rebuild = True)
+        i = index['items'].get(target.as_pointer())
+        if i is not None:
+            return export_list[i]
+    
+    return None
+
+
+def AddListItem(export_list, attribute, target):
+    """
+    Adds a new item for the given object or collection to an export list, keeping the list index up to date.
+    """
+
+    index = GetListIndex(export_list, attribute)
+    entry = export_list.add()
+    setattr(entry, attribute, target)
+
+    index['items'][target.as_pointer()] = len(export_list) - 1
+    index['length'] = len(export_list)
+
+    return entry
+
+
+def GetListItemPosition(item):
+    """
+    Returns the position of an item in the list it belongs to, without searching the list.
+    """
+
+    match = LIST_ITEM_PATTERN.search(item.path_from_id())
+    if match is None:
+        return None
+
+    return int(match.group(1))
+
+
 # OBJECT LIST PROPERTIES
 # /////////////////////////////////////////////////
 # /////////////////////////////////////////////////
@@ -14,29 +121,38 @@ def UpdateObjectList(scene, object, enableExport):
     Used when properties are updated outside the scope of the Export List
     to ensure that all UI elements are kept in sync.
     """
-    scn = scene.CAPScn
-    #print("Hey, this object is %s" % object)
 
     if object is None:
         return
 
-    # Check a list entry for the object doesn't already exist.
-    for item in scene.CAPScn.object_list:
-        if item.object.name == object.name:
-            #print("Changing", object.name, "'s export from list.'")
-            item.enable_export = enableExport
-            return
+    UpdateObjectListBulk(scene, [object], enableExport)
 
-    # If an entry couldn't be found in the list, add it.
-    if enableExport is True:
-        #print("Adding", object.name, "to list.")
-        entry = scn.object_list.add()
-        entry.object = object
-        entry.enable_export = enableExport
+    return None
 
-        object.CAPObj.in_export_list = True
 
-    return None
+def UpdateObjectListBulk(scene, objects, enableExport):
+    """
+    Does the same as UpdateObjectList for a list of objects at once, so the export list is only indexed once.
+    """
+    scn = scene.CAPScn
+    ExpireListIndex(scn.object_list, 'object')
+
+    for object in objects:
+        if object is None:
+            continue
+
+        # Check a list entry for the object doesn't already exist.
+        item = FindListItem(scn.object_list, 'object', object)
+        if item is not None:
+            item.enable_export = enableExport
+            continue
+
+        # If an entry couldn't be found in the list, add it.
+        if enableExport is True:
+            entry = AddListItem(scn.object_list, 'object', object)
+            entry.enable_export = enableExport
+
+            object.CAPObj.in_export_list = True
 
 def CAP_Update_FocusObject(self, context):
     """
@@ -108,15 +224,12 @@ def CAP_Update_ObjectListRemove(self, context):
         self.object.CAPObj.enable_export = False
         self.object.CAPObj.in_export_list = False
     
-    # Find the index and remove it from the list
-    # TODO: There's probably a more efficient way right?
-    i = None
-    try:
-        i = object_list.values().index(self)
-        object_list.remove(i)
-
-    except ValueError:
+    # Find the index from the item's own path and remove it from the list
+    i = GetListItemPosition(self)
+    if i is None:
         return
+
+    object_list.remove(i)
     
     # If the index is more than the list, bring it down one
     if scn.object_list_index > i:
@@ -137,24 +250,31 @@ def UpdateCollectionList(scene, collection, enableExport):
     Used when properties are updated outside the scope of the Export List
     to ensure that all UI elements are kept in sync.
     """
+
+    UpdateCollectionListBulk(scene, [collection], enableExport)
+
+
+def UpdateCollectionListBulk(scene, collections, enableExport):
+    """
+    Does the same as UpdateCollectionList for a list of collections at once, so the export list is only indexed once.
+    """
     scn = scene.CAPScn
+    ExpireListIndex(scn.collection_list, 'collection')
 
-    # Check a list entry for the collection doesn't already exist.
+    for collection in collections:
+        if collection is None:
+            continue
 
-    for item in scene.CAPScn.collection_list:
-        if item:
-            if item.collection:
-                if item.collection.name == collection.name:
-                    #print("Changing", collection.name, "'s export from list.'")
-                    item.enable_export = enableExport
-                    return
+        # Check a list entry for the collection doesn't already exist.
+        item = FindListItem(scn.collection_list, 'collection', collection)
+        if item is not None:
+            item.enable_export = enableExport
+            continue
 
-    if enableExport is True:
-        #print("Adding", collection.name, "to list.")
-        entry = scn.collection_list.add()
-        entry.collection = collection
-        entry.enable_export = enableExport
-        collection.CAPCol.in_export_list = True
+        if enableExport is True:
+            entry = AddListItem(scn.collection_list, 'collection', collection)
+            entry.enable_export = enableExport
+            collection.CAPCol.in_export_list = True
 
 
 def CAP_Update_FocusCollection(self, context):
@@ -207,36 +327,29 @@ def CAP_Update_CollectionListRemove(self, context):
     Used in a list to remove a collection from both the export list, while disabling it's "Enable Export" status.
     """
 
-    print(self)
-    
-    i = 0
     scn = context.scene.CAPScn
     # To avoid issues within the list, the selected list item needs to be preserved.
     backupListIndex = scn.collection_list_index
     backupListLength = len(scn.collection_list)
 
-    # If the list item is dead, remove it now and forget about the rest.
-    # if self is None or self.collection is None:
-
-
-    for item in scn.collection_list:
-        if item.collection is not None:
-            if item.collection.name == self.collection.name:
-
-                self.collection.CAPCol.enable_export = False
-                self.collection.CAPCol.in_export_list = False
+    # Find the index from the item's own path, so dead list items can be removed too.
+    i = GetListItemPosition(self)
+    if i is None:
+        return
 
-                # Whether or not we find a successful match in the scene,
-                # remove it from the list
-                context.scene.CAPScn.collection_list.remove(i)
+    if self.collection is not None:
+        self.collection.CAPCol.enable_export = False
+        self.collection.CAPCol.in_export_list = False
 
-                # If the index is more than the list, bring it down one
-                # to ensure a list item gets selected
-                scn.collection_list_index = i
+    # Whether or not we find a successful match in the scene,
+    # remove it from the list
+    scn.collection_list.remove(i)
 
-                if i == (backupListLength - 1):
-                    scn.collection_list_index = i - 1
+    # If the index is more than the list, bring it down one
+    # to ensure a list item gets selected
+    scn.collection_list_index = i
 
-                return
+    if i == (backupListLength - 1):
+        scn.collection_list_index = i - 1
 
-            i += 1
\ No newline at end of file
+    return
\ No newline at end of file
@@ -2,7 +2,7 @@
 import bpy, bmesh, time
 from math import *
 
-from .update_list import UpdateObjectList
+from .update_list import UpdateObjectList, UpdateObjectListBulk
 
 # OBJECT DATA PROXY PROPERTIES
 # /////////////////////////////////////////////////
@@ -51,7 +51,8 @@ def CAP_Update_ProxyObj_EnableExport(self, context):
     # Run through any collected objects to also update them.
     for item in collected:
         item.CAPObj.enable_export = value
-        UpdateObjectList(context.scene, item, value)
+    
+    UpdateObjectListBulk(context.scene, collected, value)
 
 
     return None
@@ -6,6 +6,8 @@ from rna_prop_ui import PropertyPanel
 
 from .tk_utils import select
 from .tk_utils import search as collection_utils
+from .tk_utils import profiler
+from .tk_utils import manifest
 
 class CAPSULE_UL_Name(UIList):
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
@@ -699,6 +701,102 @@ class CAPSULE_PT_Location(Panel):
 
 
 
+class CAPSULE_PT_Profile(Panel):
+    bl_space_type = "PROPERTIES"
+    bl_region_type = "WINDOW"
+    bl_context = "scene"
+    bl_label = "Export Profile"
+    bl_parent_id = "CAPSULE_PT_Header"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(cls, context):
+        preferences = context.preferences
+        addon_prefs = preferences.addons[__package__].preferences
+        return addon_prefs.profile_exports
+
+    def draw(self, context):
+
+        layout = self.layout
+        report = profiler.last_report
+
+        if report is None:
+            layout.label(text= "Export something to see how long each part took.")
+            return
+
+        layout.label(text= report['path'], icon = "FILE_TEXT")
+        layout.separator()
+
+        # Where the time went across every export.
+        totals = layout.column(align= True)
+        for phase, phase_time in report['phase_totals'].items():
+            row = totals.row(align= True)
+            row.label(text= phase.replace('_', ' ').title())
+            row.label(text= "%.3fs" % phase_time)
+
+        layout.separator()
+        layout.label(text= "Slowest Exports")
+
+        tasks = layout.column(align= True)
+        for task in report['slowest_tasks']:
+            row = tasks.row(align= True)
+            row.label(text= task['export_name'])
+            row.label(text= task['export_preset'])
+            row.label(text= "%.3fs" % task['total_time'])
+
+
+class CAPSULE_PT_Manifest(Panel):
+    bl_space_type = "PROPERTIES"
+    bl_region_type = "WINDOW"
+    bl_context = "scene"
+    bl_label = "Export Manifest"
+    bl_parent_id = "CAPSULE_PT_Header"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(cls, context):
+        preferences = context.preferences
+        addon_prefs = preferences.addons[__package__].preferences
+        return manifest.IsRecordingManifest(addon_prefs)
+
+    def draw(self, context):
+
+        layout = self.layout
+        summary = manifest.last_summary
+
+        layout.operator("scene.cap_refreshmanifest", icon = "FILE_REFRESH")
+
+        # The manifest is only read when asked, as it can get large.
+        if summary is None or summary['path'] != manifest.GetManifestPath():
+            layout.label(text= "Refresh to see what's been exported from this file.")
+            return
+
+        layout.label(text= summary['path'], icon = "FILE_TEXT")
+        layout.separator()
+
+        totals = layout.column(align= True)
+        row = totals.row(align= True)
+        row.label(text= "Exported Files")
+        row.label(text= str(summary['file_count']))
+        row = totals.row(align= True)
+        row.label(text= "Total Size")
+        row.label(text= "%.2f MB" % (summary['total_size'] / (1024 * 1024)))
+        row = totals.row(align= True)
+        row.label(text= "Missing or Changed")
+        row.label(text= str(summary['stale_count']))
+
+        layout.separator()
+        layout.label(text= "Slowest Exports")
+
+        entries = layout.column(align= True)
+        for entry in summary['slowest_exports']:
+            row = entries.row(align= True)
+            row.label(text= entry['source'])
+            row.label(text= entry['export_preset'])
+            row.label(text= "%.3fs" % entry['duration'])
+
+
+
 def Draw_CreateCapsuleData(layout):
 
     # UI Prompt for when the .blend Capsule data can no longer be found.